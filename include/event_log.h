@@ -0,0 +1,70 @@
+#ifndef EVENT_LOG_H
+#define EVENT_LOG_H
+
+#include <cstdint>
+#include <fstream>
+#include <string>
+
+namespace psim {
+
+// a machine readable copy of the events that psim prints as log lines: job starts,
+// iteration finishes, all-reduce starts and finishes, the ends of the reps and the results.
+// the file is an 8 byte magic, then one fixed size record per event, in the order they
+// happened. everything is 8 bytes wide and little endian, like the binary flow info, so
+// it can be read with numpy directly. see processing/psim_output.py for the reader.
+
+enum class EventType : int64_t {
+    NONE = 0,
+    JOB_START = 1,
+    ITER_FINISH = 2,
+    ALLREDUCE_START = 3,
+    ALLREDUCE_FINISH = 4,
+    REP_END = 5,
+    RESULT = 6,
+};
+
+enum class ResultType : int64_t {
+    PSIM_TIME = 0,
+    CONGESTED_TIME = 1,
+    AVERAGE_FCT = 2,
+    AVERAGE_FLOW_BW = 3,
+    MACHINE_UTILIZATION = 4,
+};
+
+struct event_record {
+    int64_t type;
+    int64_t job_id;     // the rep for REP_END, the result type for RESULT
+    int64_t iter;
+    int64_t layer;
+    double time;        // the value for RESULT
+};
+
+class EventLog {
+public:
+    static EventLog& inst() {
+        static EventLog instance;
+        return instance;
+    }
+
+    EventLog(EventLog const&) = delete;
+    void operator=(EventLog const&) = delete;
+
+    void open(std::string path);
+    void close();
+    bool is_open() { return ofs.is_open(); }
+
+    void log_event(EventType type, int job_id, int iter, int layer, double time);
+    void log_rep_end(int rep);
+    void log_result(ResultType result, double value);
+
+private:
+    EventLog() {}
+
+    void write(event_record record);
+
+    std::ofstream ofs;
+};
+
+} // namespace psim
+
+#endif // EVENT_LOG_H
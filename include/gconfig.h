@@ -1,6 +1,9 @@
 #ifndef CONFIG_H
 #define CONFIG_H
 
+#include <string>
+#include <vector>
+
 enum class LoadMetric {
     DEFAULT,
     REGISTERED,
@@ -44,6 +47,11 @@ enum class RegretMode {
     NONE,
 };
 
+enum class FlowInfoFormat {
+    TEXT, 
+    BINARY,
+};
+
 enum class TimingScheme {
     Zero, 
     Random, 
@@ -59,6 +67,10 @@ public:
 
     GConf(GConf const&) = delete;
     void operator=(GConf const&) = delete;
+    GConf& operator=(GConf&&) = default;
+
+    // back to the defaults, before the next run of the server. 
+    static void reset() { inst() = GConf(); }
 
     int worker_id = 0;
     std::string workers_dir = "workers/";
@@ -92,6 +104,9 @@ public:
 
     RegretMode regret_mode = RegretMode::NONE;
 
+    FlowInfoFormat flow_info_format = FlowInfoFormat::TEXT;
+    std::string event_log_file = ""; 
+
     bool profile_core_status = true;
 
     int core_status_profiling_interval = 10;
@@ -162,6 +177,11 @@ public:
     
     double throttle_factor = -1;   
 
+    // batch profiling: each (job id, throttle factor) pair is simulated in isolation, 
+    // one after the other, in the same process. 
+    std::vector<int> isolate_job_ids; 
+    std::vector<double> throttle_factors; 
+
     double punish_oversubscribed = false;
     double punish_oversubscribed_min = 0.8;
 
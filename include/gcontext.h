@@ -46,6 +46,7 @@ public:
     static void initiate_device_shuffle_map();
     static int get_device_shuffle_map(int device_id);
     static int run_number();
+    static void reset();
 
 
     GContext(GContext const&) = delete;
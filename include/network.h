@@ -74,7 +74,8 @@ public:
     double get_total_congested_time(int tier); 
 
 private:
-
+    bool is_total_bw_cached = false;
+    double cached_total_bw = 0;
 };
 
 
@@ -5,7 +5,7 @@
 namespace po = boost::program_options;
 
 namespace psim {
-    void setup_logger(bool recreate_dir = true); 
+    void setup_logger(bool recreate_dir = true, bool truncate_log_file = true); 
 
     po::variables_map parse_arguments(int argc, char** argv); 
 
@@ -15,7 +15,8 @@ namespace psim {
 
     void change_log_path(std::string output_dir, 
                          std::string log_file_name, 
-                         bool recreate_dir = false);
+                         bool recreate_dir = false, 
+                         bool truncate_log_file = true);
 } // namespace psim
 
 #endif
\ No newline at end of file
@@ -7,6 +7,7 @@
 #include <ostream>
 #include "network.h"
 #include "gconfig.h"
+#include "event_log.h"
 
 
 namespace psim {
@@ -101,10 +102,18 @@ public:
 
     PTask* make_shallow_copy();
 
+    void set_event(EventType type, int job_id, int iter, int layer);
+
     // let's give them names so they are happy. 
     std::string name; 
     std::string print_message; 
     bool print_on_exec; 
+
+    // the same event as the print message, for the event log. 
+    EventType event_type; 
+    int event_job_id; 
+    int event_iter; 
+    int event_layer; 
 private:
 
 };
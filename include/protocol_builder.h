@@ -1,6 +1,8 @@
 #ifndef PROTOCOL_BUILDER_H
 #define PROTOCOL_BUILDER_H
 
+#include "nlohmann/json.hpp"
+
 namespace psim {
 
 
@@ -45,6 +47,7 @@ Protocol* build_all_to_all(int num_replicas, double comm_size, int chunk_count);
 Protocol* build_periodic_data_parallelism(); 
 Protocol* build_periodic_simple();
 Protocol* build_nethint_test(); 
+void set_inline_inputs(nlohmann::json inputs); 
 } // namespace psim
 
 #endif
@@ -64,7 +64,8 @@ public:
     void log_results(); 
     void measure_regret();
     void log_lb_decisions();  
-    void log_flow_info();  
+    void log_flow_info(bool append = false);  
+    void log_flow_info_binary(bool append);  
     
     Network *network;
 
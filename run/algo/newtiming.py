@@ -2,138 +2,142 @@ import numpy as np
 from pprint import pprint
 from functools import cached_property, lru_cache
 from typing import List, Dict, Tuple
-from collections import defaultdict
-import matplotlib.pyplot as plt
+from collections import defaultdict, Counter
 
 
 import os 
 import sys
 import math
+import time
+import heapq
+from bisect import bisect_left, bisect_right
+
+from utils.rle import rle_length, get_flow_progress_rle
+from utils.interval_index import IntervalIndex
+from utils.hyperperiod import get_hyperperiod_window, get_window_iter_count
+from utils.hyperperiod import get_max_hyperperiod, is_window_enough
 
 # TODO: move this function in the main class. 
 # TODO: let it create the link objects directly. Don't stick with legacy code.  
- 
-def get_link_loads(job_map, options, run_context):
+
+def get_job_link_loads(job_profile, link_bandwidth):
     """
-    receives profiles for a single iteration of a job, find the flows 
-    going through each virtual link, combines them into one signal.  
+    one pass over the flow table of a single job profile. every flow only touches 
+    two rack links, the up link of its src rack and the down link of its dst rack.
+    the flows are grouped by rack, and each group is summed on the merged run 
+    boundaries of its flows, so only the final load of each link is expanded.  
     """
+    flows = job_profile["flows"]
     
-    servers_per_rack = options["ft-server-per-rack"]
-    rack_count = options["machine-count"] // servers_per_rack   
-    link_bandwidth = options["link-bandwidth"]  
+    src_racks = np.array([flow["srcrack"] for flow in flows], dtype=int) 
+    dst_racks = np.array([flow["dstrack"] for flow in flows], dtype=int)
     
-    link_loads = [] 
-    cross_rack_jobs_set = set() 
-    cross_rack_jobs = []    
+    # the flow table, one row per run of each flow. all the histories in the profile 
+    # have the same length, so flow f, time t is at position f * history_length + t. 
+    flow_rles = [get_flow_progress_rle(flow) for flow in flows] 
+    history_length = rle_length(flow_rles[0])
+    
+    run_flows = np.repeat(np.arange(len(flows)), [len(rle) for rle in flow_rles])
+    values, counts = zip(*[run for rle in flow_rles for run in rle])
+    run_values = np.array(values, dtype=float) / link_bandwidth
+    run_counts = np.array(counts, dtype=int)
+    run_starts = np.cumsum(run_counts) - run_counts
+    assert run_starts[-1] + run_counts[-1] == len(flows) * history_length
     
-    def add_signal_to_sum(signal, sum_signal):
-        for i in range(len(signal)):
-            if i >= len(sum_signal):
-                sum_signal.append(0)
-            sum_signal[i] += signal[i]
+    # the empty runs would share their start with the next run. 
+    non_empty = run_counts > 0
+    run_flows = run_flows[non_empty]
+    run_values = run_values[non_empty]
+    run_starts = run_starts[non_empty]
+    run_local_starts = run_starts - run_flows * history_length
+    
+    job_link_loads = {} 
+    for dir, flow_racks in [("up", src_racks), ("down", dst_racks)]:
+        run_racks = flow_racks[run_flows]
+        
+        for rack in np.unique(flow_racks).tolist():
+            rack_flows = np.flatnonzero(flow_racks == rack)
+            boundaries = np.unique(run_local_starts[run_racks == rack])
             
-    for i in range(rack_count):
-        this_rack = {"up": [], "down": []}
-        link_loads.append(this_rack)
-
-        for dir in ["up", "down"]:
+            # the value of every flow in every segment between two boundaries.
+            positions = rack_flows[:, None] * history_length + boundaries[None, :]
+            segment_values = run_values[np.searchsorted(run_starts, positions, side="right") - 1]
             
-            for job_id, job in job_map.items():
-                throttled_job_profiles = {}
-                any_flow_added = False
-                
-                for throttle_factor in run_context["profiled-throttle-factors"]:
-                    if job.profiles is None:    
-                        continue    
-                    
-                    job_profile = job.profiles[throttle_factor]
-                    
-                    if len(job_profile["flows"]) == 0:
-                        continue 
+            # the rows are added one by one in the flow order, same as summing them in a loop. 
+            load = segment_values[0].copy()
+            for row in segment_values[1:]:
+                load += row
+            
+            segment_lengths = np.diff(boundaries, append=history_length)
+            job_link_loads[(rack, dir)] = np.repeat(load, segment_lengths)
+            
+    return job_link_loads
 
-                    job_period = job_profile["period"]  
-                    
-                    # this job will add some load to each of the links. 
-                    # all the flows for this job will be added up. 
-                    link_job_load_combined = [] 
-                    
-                    for flow in job_profile["flows"]:
-                        flow_src_rack = flow["srcrack"]
-                        flow_dst_rack = flow["dstrack"]
-                        
-                        flow_progress_history = flow["progress_history"].copy()    
-                        
-                        for t in range(len(flow_progress_history)): 
-                            flow_progress_history[t] /= link_bandwidth
-
-                        # print flow start and end and src and dst 
-                        if ((dir == "up" and flow_src_rack == i) or 
-                            (dir == "down" and flow_dst_rack == i)):    
-                            
-                            any_flow_added = True 
-                            if len(link_job_load_combined) > 0:
-                                assert len(link_job_load_combined) == len(flow_progress_history)
-                                
-                            # this is a flow that goes through this link
-                            add_signal_to_sum(flow_progress_history,
-                                              link_job_load_combined)
-                            
-                    if any_flow_added:
-                        throttled_job_profiles[throttle_factor] = {
-                            "load": link_job_load_combined, 
-                            "period": job_period,
-                            "max": max(link_job_load_combined),
-                        }
-                    else:                         
-                        # if there were no flows for this throttle factor, 
-                        # there won't be any flows for the other throttle factors.
-                        # so we can break out of the loop.
-                        break 
-                    
-                if any_flow_added:
-                    cross_rack_jobs_set.add(job_id)
-                    
-                    link_loads[i][dir].append({
-                        "link_id": i * 2 + (1 if dir == "up" else 0),   
-                        "job_id": job_id,
-                        "iter_count": job.iter_count,  
-                        "profiles": throttled_job_profiles
-                    })
+
+def aggregate_link_loads(job_entries, rack_count, link_bandwidth, throttle_factors):
+    """
+    job_entries: a list of (job_id, iter_count, profiles), profiles being a 
+    throttle_factor -> job profile dict, or None for the jobs without profiles.   
+    """
+    
+    link_loads = [{"up": [], "down": []} for i in range(rack_count)] 
+    cross_rack_jobs_set = set() 
+    
+    for job_id, iter_count, profiles in job_entries:
+        if profiles is None:
+            continue
+        
+        # (rack, dir) -> throttle_factor -> load profile
+        throttled_link_profiles = defaultdict(dict) 
+        
+        for throttle_factor in throttle_factors:
+            job_profile = profiles[throttle_factor]
+            
+            if len(job_profile["flows"]) == 0:
+                continue 
+            
+            job_link_loads = get_job_link_loads(job_profile, link_bandwidth)
+            
+            for link, load in job_link_loads.items():
+                throttled_link_profiles[link][throttle_factor] = {
+                    "load": load.tolist(), 
+                    "period": job_profile["period"],
+                    "max": load.max().item(),
+                }
+        
+        for (rack, dir), throttled_job_profiles in throttled_link_profiles.items():
+            cross_rack_jobs_set.add(job_id)
+            
+            link_loads[rack][dir].append({
+                "link_id": rack * 2 + (1 if dir == "up" else 0),   
+                "job_id": job_id,
+                "iter_count": iter_count,  
+                "profiles": throttled_job_profiles
+            })
     
     cross_rack_jobs = list(cross_rack_jobs_set) 
     return link_loads, cross_rack_jobs
 
-
-def find_earliest_available_time(start, end, rem, max):
-    delay = 0
-    window_sum = sum(rem[t] < max for t in range(start, end))
-    while window_sum > 0:
-        if rem[start + delay] < max:
-            window_sum -= 1  
-        if rem[end + delay] < max:
-            window_sum += 1  
-        delay += 1
-    return delay
-
-def find_earliest_available_time_all_links(start, end, rem, max, mult):
-    delay = 0 
-    window_sum = 0 
+ 
+def get_link_loads(job_map, options, run_context):
+    """
+    receives profiles for a single iteration of a job, find the flows 
+    going through each virtual link, combines them into one signal.  
+    """
     
-    all_link_ids = list(rem.keys())
+    servers_per_rack = options["ft-server-per-rack"]
+    rack_count = options["machine-count"] // servers_per_rack   
+    link_bandwidth = options["link-bandwidth"]  
     
-    for link_id in all_link_ids:
-        window_sum += sum(rem[link_id][t] < max[link_id] * mult for t in range(start, end)) 
-        
-    while window_sum > 0:
-        for link_id in all_link_ids:
-            if rem[link_id][start + delay] < max[link_id] * mult:
-                window_sum -= 1  
-            if rem[link_id][end + delay] < max[link_id] * mult:
-                window_sum += 1  
-        delay += 1
+    job_entries = [(job_id, job.iter_count, job.profiles) for job_id, job in job_map.items()]
     
-    return delay        
+    return aggregate_link_loads(job_entries, rack_count, link_bandwidth, 
+                                run_context["profiled-throttle-factors"])
+
+
+def find_earliest_available_time(start, end, rem: IntervalIndex, max):
+    # the first delay where rem doesn't go below max over [start, end) 
+    return rem.find_earliest_fit(start, end, max)
         
 def find_empty_ranges(signal):  
     empty_spaces = []
@@ -162,6 +166,166 @@ def overlap_count(start, end, ranges):
             overlap_count += 1 
     return overlap_count
 
+
+class RangeOverlapCounter(): 
+    # same as overlap_count, with two binary searches over the sorted starts and ends. 
+    # a range doesn't overlap the query if it starts after it or ends before it. 
+    def __init__(self, ranges):
+        self.ranges = ranges
+        self.starts = sorted(s for s, e in ranges)
+        self.ends = sorted(e for s, e in ranges)
+        self.well_formed = all(s <= e for s, e in ranges)
+    
+    def count(self, start, end):
+        if not self.well_formed or start > end:
+            return overlap_count(start, end, self.ranges)
+        return bisect_right(self.starts, end) - bisect_left(self.ends, start)
+
+
+class CapacityTimeline(): 
+    """
+    the remaining capacity of a set of links over time, as a link x time matrix.  
+    only a window of the time is kept in memory: the columns are allocated as the 
+    queries reach them, and the columns before drop_before are thrown away.  
+    """
+    def __init__(self, link_ids, length, capacity): 
+        self.link_index = {link_id: i for i, link_id in enumerate(link_ids)}
+        self.length = length
+        self.capacity = capacity
+        
+        # the matrix covers the times [offset, offset + width). the buffer has room 
+        # for more columns, so that growing the timeline doesn't copy it every time.
+        self.offset = 0 
+        self.width = 0
+        self.buffer = np.empty((len(link_ids), 0), dtype=float)
+        self.presence_map = np.zeros(0, dtype=int)
+        
+        # the number of chunks scanned by the earliest fit queries.
+        self.probes = 0
+    
+    @property
+    def rem(self):
+        return self.buffer[:, :self.width]
+    
+    def get_rows(self, link_ids):
+        return np.array([self.link_index[link_id] for link_id in link_ids], dtype=int)  
+        
+    def apply_bad_ranges(self, bad_ranges):
+        # if a range is present in the bad ranges more than once, 
+        # the rem is reduced by a little bit for all the links. 
+        # this is applied to the columns as they are allocated. 
+        assert self.width == 0, "bad ranges must be applied before any query"
+        
+        presence_map = np.zeros(self.length + 1, dtype=int)
+        for s, e in bad_ranges:
+            s, e = max(0, s), min(self.length, e)
+            if s < e: 
+                presence_map[s] += 1
+                presence_map[e] -= 1
+        presence_map = np.cumsum(presence_map[:-1])
+        
+        reduced_times = np.flatnonzero(presence_map > 1)
+        if len(reduced_times) > 0:
+            self.presence_map = presence_map[:reduced_times[-1] + 1]
+    
+    def ensure(self, end):
+        # make sure the matrix covers the times up to end. 
+        assert end <= self.length, f"time {end} is out of the timeline of length {self.length}"
+        
+        new_width = end - self.offset
+        if new_width <= self.width:
+            return
+        
+        if new_width > self.buffer.shape[1]:
+            new_buffer = np.empty((self.buffer.shape[0], max(new_width, 2 * self.buffer.shape[1])), dtype=float)
+            new_buffer[:, :self.width] = self.rem
+            self.buffer = new_buffer
+        
+        new_columns = self.buffer[:, self.width:new_width]
+        new_columns.fill(self.capacity)
+        
+        allocated_end = self.offset + self.width
+        times = np.arange(allocated_end, min(end, len(self.presence_map)))
+        times = times[self.presence_map[times] > 1]
+        if len(times) > 0:
+            columns = times - allocated_end
+            reduced = new_columns[:, columns] - (self.presence_map[times] - 1)
+            new_columns[:, columns] = np.maximum(1, reduced)
+        
+        self.width = new_width
+    
+    def drop_before(self, time):
+        # no query will look before this time anymore. the columns are only 
+        # moved once the dropped part is more than half of the matrix.
+        dropped = min(time, self.offset + self.width) - self.offset
+        if dropped > self.width // 2:
+            self.buffer[:, :self.width - dropped] = self.buffer[:, dropped:self.width]
+            self.width -= dropped
+            self.offset += dropped
+    
+    def subtract(self, link_ids, loads, start, end):
+        # the rem of every link is reduced by its load over [start, end). 
+        end = min(end, self.length)
+        self.ensure(end)
+        
+        rows = self.get_rows(link_ids)
+        self.buffer[rows, start - self.offset:end - self.offset] -= np.asarray(loads, dtype=float)[:, None]
+    
+    def find_earliest_fit(self, link_ids, queries):
+        """
+        queries: a list of (start, end, thresholds), thresholds being the capacity 
+        needed on each of the link_ids. for each query, returns the smallest delay such
+        that every link has at least its threshold over [start + delay, end + delay).   
+        all the queries are answered together, only looking at the given links. 
+        """
+        delays = [None] * len(queries)
+        
+        if len(link_ids) == 0:
+            return [0] * len(queries)
+        
+        rows = self.get_rows(link_ids)
+        thresholds = np.array([q[2] for q in queries], dtype=float)
+        lengths = [end - start for start, end, _ in queries]
+        
+        # the earliest window start that is not ruled out yet, for every query. 
+        candidates = [start for start, _, _ in queries] 
+        assert min(candidates) >= self.offset, f"time {min(candidates)} was already dropped from the timeline"
+        
+        # the timeline is scanned in chunks, each chunk twice as long as the last one.
+        # the queries that don't find a fit in a chunk continue from where they stopped. 
+        chunk = 2 * max(lengths) + 64 
+        
+        while True: 
+            pending = [q for q in range(len(queries)) if delays[q] is None]
+            self.probes += 1
+            
+            lo = min(candidates[q] for q in pending)
+            hi = min(self.length, max(candidates[q] + lengths[q] for q in pending) + chunk)
+            self.ensure(hi)
+            
+            rem = self.buffer[rows, lo - self.offset:hi - self.offset]
+            # bad[q, t]: some link doesn't have the capacity for query q at time lo + t.  
+            bad = (rem[None, :, :] < thresholds[pending, :, None]).any(axis=1)
+            bad_count = np.concatenate((np.zeros((len(pending), 1), dtype=int), 
+                                        np.cumsum(bad, axis=1)), axis=1)
+            
+            for i, q in enumerate(pending):
+                window_starts = np.arange(candidates[q] - lo, hi - lo - lengths[q] + 1)
+                window_counts = (bad_count[i, window_starts + lengths[q]] - 
+                                 bad_count[i, window_starts])
+                fits = np.flatnonzero(window_counts == 0)
+                
+                if len(fits) > 0:
+                    delays[q] = int(lo + window_starts[fits[0]] - queries[q][0])
+                else:
+                    candidates[q] = max(candidates[q], hi - lengths[q] + 1)
+                    
+            if all(delay is not None for delay in delays):
+                return delays
+            
+            assert hi < self.length, f"no fit found in the timeline of length {self.length}"
+            chunk *= 2
+
 ########################################################################################    
 ########################################################################################    
 ########################################################################################    
@@ -253,25 +417,56 @@ class Solution():
         self.throttle_rates = {} 
         self.job_map: dict[int, Job] = job_map
         
+        # the throttled period of every iteration, and the end time of every iteration,
+        # which is the cumulative sum of the deltas and the periods up to that iteration. 
+        # the end times are valid up to (not including) valid_until[job_id]. setting an 
+        # iteration invalidates the end times from there on, they are recomputed lazily 
+        # only up to the iteration that is asked for, so setting the iterations in order 
+        # and looking up the next one is O(1).   
+        self.periods = {} 
+        self.end_times = {}
+        self.valid_until = {}
+        
         for job_id, job in self.job_map.items():     
             iter_count = job.iter_count 
             
-            self.deltas[job_id] = [0] * iter_count
-            self.throttle_rates[job_id] = [1.0] * iter_count
+            self.deltas[job_id] = np.zeros(iter_count, dtype=int)
+            self.throttle_rates[job_id] = np.ones(iter_count, dtype=float)
+            self.periods[job_id] = np.full(iter_count, job.base_period, dtype=int)
+            self.end_times[job_id] = np.zeros(iter_count, dtype=int)
+            self.valid_until[job_id] = 0
+    
+    def set_job_iter(self, job_id, iter, delta, throttle_rate = 1.0):
+        assert job_id in self.job_map, f"Job {job_id} not in {self.job_map.keys()}"    
+        assert iter < len(self.deltas[job_id]), f"Job {job_id} has {len(self.deltas[job_id])} iters, not {iter}"
+        
+        job = self.job_map[job_id]
+        
+        self.deltas[job_id][iter] = delta
+        self.throttle_rates[job_id][iter] = throttle_rate
+        self.periods[job_id][iter] = job.periods[throttle_rate]
+        self.valid_until[job_id] = min(self.valid_until[job_id], iter)
+    
+    def update_end_times(self, job_id, iter):
+        # make the end times valid up to and including iter.
+        start = self.valid_until[job_id]
+        if start > iter:
+            return
+        
+        end_times = self.end_times[job_id]
+        prev_end_time = end_times[start - 1] if start > 0 else 0
+        
+        end_times[start:iter + 1] = prev_end_time + np.cumsum(self.deltas[job_id][start:iter + 1] + 
+                                                               self.periods[job_id][start:iter + 1])
+        self.valid_until[job_id] = iter + 1
             
     def get_job_cost(self, job_id):    
         job = self.job_map[job_id]
-        cost = 0
-        for i in range(len(self.deltas[job_id])):
-            delta = self.deltas[job_id][i]
-            
-            throttle_rate = self.throttle_rates[job_id][i]
-            period = job.periods[throttle_rate]
-            throttle_cost = period - job.base_period
-            
-            cost += delta + throttle_cost
         
-        return cost
+        throttle_costs = self.periods[job_id] - job.base_period
+        cost = np.sum(self.deltas[job_id]) + np.sum(throttle_costs)
+        
+        return cost.item()
 
     def get_average_job_cost(self):   
         total_cost = 0
@@ -289,8 +484,8 @@ class Solution():
         for job_id, job in self.job_map.items():
 
             job_timings.append({
-                "deltas": self.deltas[job_id],  
-                "throttle_rates": self.throttle_rates[job_id],     
+                "deltas": self.deltas[job_id].tolist(),  
+                "throttle_rates": self.throttle_rates[job_id].tolist(),     
                 "job_id": job_id
             })   
             
@@ -301,21 +496,18 @@ class Solution():
         assert job_id in self.job_map, f"Job {job_id} not in {self.job_map.keys()}"    
         assert iter < len(self.deltas[job_id]), f"Job {job_id} has {len(self.deltas[job_id])} iters, not {iter}"
         
-        job = self.job_map[job_id]
-
-        start_time = 0  
+        # the start time is where this iteration ends, minus its own period.
+        self.update_end_times(job_id, iter) 
+        start_time = self.end_times[job_id][iter] - self.periods[job_id][iter]
         
-        # for every iteration before this one, add the delta and the period
-        for i in range(iter):
-            delta = self.deltas[job_id][i]  
-            throttle_rate = self.throttle_rates[job_id][i]  
-            last_iter_period = job.profiles[throttle_rate]["period"]    
-            start_time += delta + last_iter_period   
-
-        # for this iteration, add the delta
-        start_time += self.deltas[job_id][iter] 
+        return start_time.item()
+    
+    def get_job_iter_end_time(self, job_id, iter):
+        assert job_id in self.job_map, f"Job {job_id} not in {self.job_map.keys()}"    
+        assert iter < len(self.deltas[job_id]), f"Job {job_id} has {len(self.deltas[job_id])} iters, not {iter}"
         
-        return start_time
+        self.update_end_times(job_id, iter) 
+        return self.end_times[job_id][iter].item()
     
     def get_job_iter_active_time(self, job_id, iter, iter_throttle_rate = 1.0, inflate = 1.0):
         assert job_id in self.job_map, f"Job {job_id} not in {self.job_map.keys()}"    
@@ -334,19 +526,25 @@ class Solution():
         assert job_id in self.job_map, f"Job {job_id} not in {self.job_map.keys()}"        
 
         # get the ranges of time that the job is waiting 
-        waiting_ranges = []
+        iter_count = len(self.deltas[job_id])
+        self.update_end_times(job_id, iter_count - 1)
+        
+        deltas = self.deltas[job_id]
+        start_times = self.end_times[job_id] - self.periods[job_id]
+        
         # for each iteration, add a tuple of (start, end) to the list
-        for i in range(len(self.deltas[job_id])):
-            start_time = self.get_job_iter_start_time(job_id, i)
-            delta = self.deltas[job_id][i]
-            if delta > 0:  
-                waiting_ranges.append((start_time - delta, start_time)) 
+        waiting_ranges = [] 
+        for i in np.flatnonzero(deltas > 0).tolist():
+            start_time = start_times[i].item() 
+            waiting_ranges.append((start_time - deltas[i].item(), start_time))
         
         return waiting_ranges
     
     # make this hashable
     def __hash__(self):
-        return hash(str(self.deltas) + str(self.throttle_rates))
+        deltas = {job_id: d.tolist() for job_id, d in self.deltas.items()}
+        throttle_rates = {job_id: r.tolist() for job_id, r in self.throttle_rates.items()}
+        return hash(str(deltas) + str(throttle_rates))
      
      
 class LinkJobLoad():  
@@ -405,11 +603,12 @@ class LinkJobLoad():
             
 
 class LinkLevelProblem(): 
-    def __init__(self, link_id, max_length, score_mode):    
+    def __init__(self, link_id, max_length, score_mode, max_hyperperiod=0):    
         self.link_id = link_id  
         self.job_loads: List[LinkJobLoad] = []  
         self.max_length: int = max_length
         self.score_mode: str = score_mode
+        self.max_hyperperiod: int = max_hyperperiod
     
     def get_total_load(self, solution: Solution) -> np.array:
         all_signals = []
@@ -433,10 +632,36 @@ class LinkLevelProblem():
         
         return sum_signal
         
+    def get_window_load(self, solution: Solution) -> np.array:
+        # the total load over the hyperperiod window only, or None if there is no such window. 
+        # see utils/hyperperiod.py for when that's enough.
+        job_schedules = [] 
+        for job_load in self.job_loads:
+            job_id = job_load.job.job_id
+            deltas = solution.deltas[job_id].tolist()
+            throttle_rates = solution.throttle_rates[job_id].tolist()
+            iter_lengths = [len(job_load.link_profiles[throttle_rate]["load"]) for throttle_rate in throttle_rates]
+            job_schedules.append((deltas, throttle_rates, iter_lengths))
+        
+        window = get_hyperperiod_window(job_schedules, self.max_hyperperiod)
+        if window is None:
+            return None
+        
+        window_signals = [] 
+        for job_load, (deltas, throttle_rates, iter_lengths) in zip(self.job_loads, job_schedules):
+            window_iter_count = get_window_iter_count(deltas, iter_lengths, window)
+            window_signals.append(job_load.get_signal(solution, end_iter=window_iter_count)[:window])
+        
+        return np.sum(window_signals, axis=0)
+    
     def get_compat_score(self, solution: Solution, 
                          capacity: float) -> float: 
         
-        sum_signal = self.get_total_load(solution)        
+        sum_signal = None 
+        if is_window_enough(self.score_mode):
+            sum_signal = self.get_window_load(solution)
+        if sum_signal is None:
+            sum_signal = self.get_total_load(solution)        
         max_util = np.max(sum_signal)
     
         compat_score = 0
@@ -451,7 +676,7 @@ class LinkLevelProblem():
                 first_overload_index = np.argmax(sum_signal > capacity)
                 compat_score = first_overload_index / self.max_length
                 
-            job_costs = [solution.get_job_cost(job_load.job["job_id"]) for job_load in self.job_loads]  
+            job_costs = [solution.get_job_cost(job_load.job.job_id) for job_load in self.job_loads]  
             solution_cost = sum(job_costs) / len(self.job_loads)
 
             compat_score = compat_score - solution_cost  
@@ -475,6 +700,7 @@ class TimingSolver():
         self.rack_count = options["machine-count"] // options["ft-server-per-rack"] 
         self.link_bandwidth = options["link-bandwidth"]
         self.capacity = options["ft-core-count"] * options["ft-agg-core-link-capacity-mult"]
+        self.max_hyperperiod = get_max_hyperperiod(run_context)
         self.job_map = {} 
 
         for job in jobs:   
@@ -499,7 +725,8 @@ class TimingSolver():
         for i in range(self.rack_count):    
             for dir in ["up", "down"]:
                 link_id = (i, dir)  
-                self.links[link_id] = LinkLevelProblem(link_id, self.max_length, self.score_mode)    
+                self.links[link_id] = LinkLevelProblem(link_id, self.max_length, self.score_mode, 
+                                                       self.max_hyperperiod)    
         
         link_loads, cross_rack_job = get_link_loads(self.job_map, self.options, self.run_context)    
         
@@ -560,6 +787,7 @@ class TimingSolver():
             job_empty_times[job_id] = find_empty_ranges(job_total_load)
         
         # let's plot this mess: 
+        import matplotlib.pyplot as plt
         fig, axes = plt.subplots(2, 1, figsize=(10, 5), sharex=True)   
         y = 0 
         
@@ -650,9 +878,9 @@ class SequentialSolver(TimingSolver):
                 
                 if i < job_iter_count:   
                     if i == 0: 
-                        sol.deltas[job_id][i] = accum_time
+                        sol.set_job_iter(job_id, i, accum_time)
                     else:
-                        sol.deltas[job_id][i] = accum_time - job_accum[job_id] - job_period 
+                        sol.set_job_iter(job_id, i, accum_time - job_accum[job_id] - job_period) 
                     
                     job_accum[job_id] = accum_time                        
                     accum_time += job_period    
@@ -719,6 +947,8 @@ class LegoSolver(TimingSolver):
                 
         ##############################################
         
+        rem = IntervalIndex(rem)
+        
         service_attained = {job_id: 0 for job_id in job_ids}        
         current_iters = {job_id: 0 for job_id in job_ids} 
         not_done_jobs = set(job_ids) 
@@ -776,12 +1006,10 @@ class LegoSolver(TimingSolver):
                     best_max_load = max_load
 
 
-            for t in range(best_active_start + best_delay, best_active_end + best_delay):
-                rem[t] -= best_max_load
+            rem.add(best_active_start + best_delay, best_active_end + best_delay, -best_max_load)
                 
             # update the solution
-            sol.deltas[job_id][current_iter] = best_delay
-            sol.throttle_rates[job_id][current_iter] = best_throttle_rate   
+            sol.set_job_iter(job_id, current_iter, best_delay, best_throttle_rate)
             
             # update the current iter
             current_iters[job_id] += 1    
@@ -809,143 +1037,376 @@ class LegoV2Solver(TimingSolver):
     
     def __init__(self, jobs, run_context, options, job_profiles, scheme):
         super().__init__(jobs, run_context, options, job_profiles, scheme)
+        
+        # the counters and the time spent in each phase of the last make_solution call.
+        self.solve_stats = {} 
+        
+        # the inputs and the logged steps of the last make_solution call. 
+        self.last_solve = None 
+
+    def get_job_records(self, throttle_rates, base_inflate):
+        """
+        everything about the next iteration of a job that doesn't depend on the 
+        iteration itself, for every throttle rate. only the placement in time and 
+        the overlaps with the bad ranges change from one iteration to the next.
+        """
+        # the links that each job actually loads, with the job's max load on them
+        # for every throttle rate. the rest of the links never limit the job. 
+        job_links = {job_id: [] for job_id in self.job_map.keys()}
+        job_max_load = {throttle_rate: defaultdict(dict) for throttle_rate in throttle_rates}
+        
+        for link in self.links.values():  
+            for job_load in link.job_loads: 
+                job_id = job_load.job.job_id    
+                
+                for throttle_rate in throttle_rates:
+                    max_load = job_load.link_profiles[throttle_rate]["max"] 
+                    job_max_load[throttle_rate][job_id][link.link_id] = max_load  
+                
+                if any(job_max_load[throttle_rate][job_id][link.link_id] > 0 for throttle_rate in throttle_rates):
+                    job_links[job_id].append(link.link_id)
+        
+        job_records = {} 
+        
+        for job_id, job in self.job_map.items():
+            loaded_links = job_links[job_id]
+            job_records[job_id] = {"links": loaded_links, "candidates": []}
+            
+            for throttle_rate in throttle_rates:
+                max_loads = [job_max_load[throttle_rate][job_id].get(link_id, 0) for link_id in loaded_links]
+                max_max_load = max(max_loads, default=0) 
+                
+                load_mult = 1 
+                inflate = base_inflate
 
+                if "inflate" in self.run_context:   
+                    inflate *= self.run_context["inflate"]
+                    
+                if max_max_load > self.capacity:                    
+                    result_type = "overload"    
+                    inflate *= math.ceil(max_max_load / self.capacity)
+                    load_mult = self.capacity / max_max_load     
+                else: 
+                    result_type = "regular"          
+                
+                job_records[job_id]["candidates"].append({
+                    "throttle_rate": throttle_rate,
+                    "result_type": result_type,
+                    "inflate": inflate, 
+                    "thresholds": [max_load * load_mult for max_load in max_loads],
+                    # inflate -> the active range relative to the start of the iteration.
+                    "active_ranges": {inflate: job.get_active_range(throttle_rate, inflate)},
+                })
+                
+        return job_records
+    
+    def get_resume_steps(self, bad_ranges, solve_key):
+        """
+        the steps of the last solve that can be replayed as they are. a step only depends on
+        the bad ranges and the timeline up to its horizon, the last time it looked at. 
+        if nothing before the first changed bad range was looked at, the step would make 
+        the same decision again, and so would all the steps before it. 
+        """
+        if not self.run_context.get("timing-warm-start", True): 
+            return []
+        
+        last_solve = self.last_solve
+        if last_solve is None or last_solve["key"] != solve_key:
+            return []
+        
+        # the ranges that were added or removed since the last solve.
+        changed_ranges = Counter(tuple(r) for r in bad_ranges)
+        changed_ranges.subtract(Counter(last_solve["bad_ranges"]))
+        changed_starts = [s for (s, e), count in changed_ranges.items() if count != 0]
+        first_changed_time = min(changed_starts, default=math.inf)
+        
+        resume_steps = [] 
+        for step in last_solve["steps"]:
+            if step["horizon"] >= first_changed_time:
+                break
+            resume_steps.append(step)
+        
+        return resume_steps
+    
     def make_solution(self, bad_ranges = [], base_inflate = 1.0):
+        solve_start_time = time.time()
+        stats = {"steps": 0, "probes": 0, "resumed_steps": 0, 
+                 "select_time": 0, "query_time": 0, "commit_time": 0}
+        
         links = list(self.links.values())   
         
         sol = Solution(self.job_map)    
         
         job_ids = list(self.job_map.keys())    
-        job_max_load = {}
         
         throttle_rates = [1.0]
         if "throttle-search" in self.run_context and self.run_context["throttle-search"]:
             throttle_rates = self.run_context["profiled-throttle-factors"]
-            
-        for throttle_rate in throttle_rates: 
-            job_max_load[throttle_rate] = {}
-            
-            for job_id in job_ids:
-                job_max_load[throttle_rate][job_id] = {}
-                for link in links:  
-                    job_max_load[throttle_rate][job_id][link.link_id] = 0 
-                      
-            for link in links:  
-                for job_load in link.job_loads: 
-                    job_id = job_load.job.job_id    
-
-                    max_load = job_load.link_profiles[throttle_rate]["max"] 
-                    job_max_load[throttle_rate][job_id][link.link_id] = max_load  
-        
-        # pprint(job_max_load, stream=sys.stderr)
         
-        rem = {}
-        for link in links:  
-            rem[link.link_id] = [self.capacity] * self.max_length
+        job_records = self.get_job_records(throttle_rates, base_inflate)
         
-        ##############################################
-        # I want to do something interesting. 
-        # if a range is present in the bad ranges, more than once, 
-        # I want to reduce the rem by a little bit 
+        timeline = CapacityTimeline([link.link_id for link in links], self.max_length, self.capacity)
+        timeline.apply_bad_ranges(bad_ranges)
+        bad_range_overlaps = RangeOverlapCounter(bad_ranges)
         
-        # find the ranges that are present more than once
-        presence_map = [0] * self.max_length    
-
-        for s, e in bad_ranges:
-            for t in range(s, e):
-                presence_map[t] += 1
-        
-        for t in range(self.max_length):
-            if presence_map[t] > 1:
-                for link in links:
-                    rem[link.link_id][t] -= (presence_map[t] - 1)   
-                    rem[link.link_id][t] = max(1, rem[link.link_id][t])
-                    
-        ##############################################
-        
-        service_attained = {job_id: 0 for job_id in job_ids}        
+        job_next_start = {job_id: 0 for job_id in job_ids}
         current_iters = {job_id: 0 for job_id in job_ids} 
         not_done_jobs = set(job_ids) 
         
-        while len(not_done_jobs) > 0:
+        # the jobs by the service they have attained so far. the ties go to the smaller job id.
+        job_heap = [(0, job_id) for job_id in job_ids]
+        heapq.heapify(job_heap)
+        
+        # every step is logged, so that the next solve can start from where this one diverges.  
+        solve_key = (base_inflate, tuple(throttle_rates), self.run_context.get("inflate"))
+        resume_steps = self.get_resume_steps(bad_ranges, solve_key)
+        steps_log = [] 
+        
+        def commit_step(step):
+            job_id = step["job_id"]
+            current_iter = current_iters[job_id]
+            job: Job = self.job_map[job_id]
+            
+            timeline.subtract(job_records[job_id]["links"], step["thresholds"], 
+                              step["start"], step["end"])
+                    
+            # update the solution
+            sol.set_job_iter(job_id, current_iter, step["delay"], step["throttle_rate"])
+            
+            # update the current iter
+            current_iters[job_id] += 1    
+            job_next_start[job_id] = sol.get_job_iter_end_time(job_id, current_iter)
+            
+            if current_iters[job_id] >= job.iter_count: 
+                not_done_jobs.remove(job_id)    
+            else: 
+                heapq.heappush(job_heap, (step["service_attained"] + job.base_period, job_id))
+            
+            # the next iteration of every job starts after its last one finished,
+            # the timeline before the earliest of those is not needed anymore.  
+            # this is only checked once every round of jobs. 
+            steps_log.append(step)
+            if len(steps_log) % len(job_ids) == 0 and len(not_done_jobs) > 0:
+                timeline.drop_before(min(job_next_start[j] for j in not_done_jobs))
+        
+        # the steps that are the same as the last solve are replayed without any queries.
+        for step in resume_steps:
+            service_attained, job_id = heapq.heappop(job_heap)
+            assert job_id == step["job_id"], f"replayed step for job {step['job_id']}, expected job {job_id}"
+            commit_step(step)
+            stats["resumed_steps"] += 1
+        
+        while len(job_heap) > 0:
+            phase_start_time = time.time()
+            
             # pick the job with the least service attained among the not done jobs
-            job_id = min(not_done_jobs, key=lambda x: service_attained[x])
+            service_attained, job_id = heapq.heappop(job_heap)
             job: Job = self.job_map[job_id]
             current_iter = current_iters[job_id]    
+            record = job_records[job_id]
+            loaded_links = record["links"]
+            
+            iter_start_time = sol.get_job_iter_start_time(job_id, current_iter)
+            
+            query_start_time = time.time()
+            stats["select_time"] += query_start_time - phase_start_time
 
-            best_finish_time = 1e9 
-            best_throttle_rate = 1.0     
-            best_delay = 0 
-            best_active_start = 0 
-            best_active_end = 0
-            best_result_type = None
-            best_load_mult = 1 
+            candidates = [] 
+            # the last time this step looks at, in the bad ranges or in the timeline.
+            horizon = 0 
             
-            for throttle_rate in throttle_rates:
-                max_loads = job_max_load[throttle_rate][job_id] 
-                max_max_load = max(max_loads.values()) 
+            for candidate in record["candidates"]:
+                inflate = candidate["inflate"]
+                active_start, active_end = candidate["active_ranges"][inflate]
+                active_start += iter_start_time
+                active_end += iter_start_time
                 
-                load_mult = 1 
-                inflate = base_inflate
-
-                if "inflate" in self.run_context:   
-                    inflate *= self.run_context["inflate"]
-                    
-                if max_max_load > self.capacity:                    
-                    result_type = "overload"    
-                    inflate *= math.ceil(max_max_load / self.capacity)
-                    load_mult = self.capacity / max_max_load     
-                else: 
-                    result_type = "regular"          
-
-                active_start, active_end = sol.get_job_iter_active_time(job_id, current_iter, 
-                                                                        throttle_rate, inflate)   
-                
-                overlaps = overlap_count(active_start, active_end, bad_ranges)
+                overlaps = bad_range_overlaps.count(active_start, active_end)
+                horizon = max(horizon, active_end)
                 
                 if overlaps > 0:
                     inflate *= (1 + overlaps * 0.01 * (5 + job_id))
-                    active_start, active_end = sol.get_job_iter_active_time(job_id, current_iter, 
-                                                                            throttle_rate, inflate)
-                    
-                    
-                delay = find_earliest_available_time_all_links(active_start, active_end, 
-                                                               rem, max_loads, load_mult) 
+                    if inflate not in candidate["active_ranges"]:
+                        candidate["active_ranges"][inflate] = job.get_active_range(candidate["throttle_rate"], inflate)
+                    active_start, active_end = candidate["active_ranges"][inflate]
+                    active_start += iter_start_time
+                    active_end += iter_start_time
+                    horizon = max(horizon, active_end)
+                
+                candidates.append((candidate, active_start, active_end))
+            
+            # the earliest fit for all the throttle rates in one go.
+            queries = [(active_start, active_end, candidate["thresholds"]) 
+                       for candidate, active_start, active_end in candidates]
+            probes_before = timeline.probes
+            delays = timeline.find_earliest_fit(loaded_links, queries)
+            stats["probes"] += timeline.probes - probes_before
+            
+            commit_start_time = time.time()
+            stats["query_time"] += commit_start_time - query_start_time
+            
+            best_finish_time = 1e9 
+            best_candidate = None
+            best_delay = 0 
+            best_active_start = 0 
+            best_active_end = 0
+            
+            for (candidate, active_start, active_end), delay in zip(candidates, delays):
                 finish_time = active_end + delay     
+                horizon = max(horizon, finish_time - 1)
                 
                 if (finish_time < best_finish_time or 
-                    best_result_type == "overload" and result_type == "regular"):
+                    best_candidate is not None and 
+                    best_candidate["result_type"] == "overload" and candidate["result_type"] == "regular"):
                      
                     best_finish_time = finish_time
-                    best_throttle_rate = throttle_rate
+                    best_candidate = candidate
                     best_delay = delay  
                     best_active_start = active_start    
                     best_active_end = active_end
-                    best_result_type = result_type
-                    best_load_mult = load_mult
 
-            for link in links: 
-                for t in range(best_active_start + best_delay, best_active_end + best_delay):
-                    # rem[t] -= best_max_load
-                    rem[link.link_id][t] -= job_max_load[best_throttle_rate][job_id][link.link_id] * best_load_mult
-                    
-            # update the solution
-            sol.deltas[job_id][current_iter] = best_delay
-            sol.throttle_rates[job_id][current_iter] = best_throttle_rate   
-            
-            # update the current iter
-            current_iters[job_id] += 1    
-            service_attained[job_id] += job.base_period
-            
-            if current_iters[job_id] >= job.iter_count: 
-                not_done_jobs.remove(job_id)    
+            commit_step({
+                "job_id": job_id,
+                "service_attained": service_attained,
+                "delay": best_delay,
+                "throttle_rate": best_candidate["throttle_rate"],
+                "thresholds": best_candidate["thresholds"],
+                "start": best_active_start + best_delay,
+                "end": best_active_end + best_delay,
+                "horizon": horizon,
+            })
             
+            stats["steps"] += 1
+            stats["commit_time"] += time.time() - commit_start_time
             # print("---------------------------------------", file=sys.stderr)
         
+        self.last_solve = {
+            "key": solve_key,
+            "bad_ranges": [tuple(r) for r in bad_ranges],
+            "steps": steps_log,
+        }
+        
+        stats["solve_time"] = time.time() - solve_start_time
+        self.solve_stats = stats
+        
         if self.run_context["plot-link-empty-times"]:
             timing_plots_dir = f"{self.run_context['timings-dir']}/"
             os.makedirs(timing_plots_dir, exist_ok=True)
             plot_path = f"{timing_plots_dir}/link_empty_times.png"    
             self.plot_empty_ranges(sol, plot_path)  
         
-        return sol
\ No newline at end of file
+        return sol            
+
+
+########################################################################################   
+########################################################################################   
+########################################################################################
+
+class XCorrSolver(TimingSolver): 
+    """
+    every job gets a single shift before its first iteration, then runs its iterations
+    back to back at the base rate, so its load on every link repeats with its base period. 
+    the jobs are placed one by one, the heaviest first. for every link of a job, the times 
+    that would become overloaded are folded over the period of the job, and the cross 
+    correlation of that with the load of the job gives the cost of every shift at once, 
+    with an fft. the times that are already overloaded somewhere don't add to the 
+    cost, the bad ranges are the times that any link is overloaded. 
+    the bad ranges and the inflation from the caller are not used.  
+    """
+    
+    def __init__(self, jobs, run_context, options, job_profiles, scheme):
+        super().__init__(jobs, run_context, options, job_profiles, scheme)
+        
+        # the loads of a job that take more distinct values than this on a link are 
+        # checked against the capacity with their max value instead. 
+        self.max_load_levels = run_context.get("xcorr-max-load-levels", 8)
+        self.solve_stats = {} 
+        
+    def get_job_order(self):
+        # the jobs with more load go first, they have the least room to move around.
+        job_total_loads = {} 
+        for job_id, job in self.job_map.items():
+            job_total_loads[job_id] = sum(np.sum(link_load.get_base_signal(1.0)) 
+                                          for link_load in job.link_loads.values())
+        
+        return sorted(self.job_map.keys(), key=lambda job_id: (-job_total_loads[job_id], job_id))
+    
+    def fold(self, signal, period, iter_count):
+        # folded[x] = sum over the iterations i of signal[x + i * period], for x in [0, 2 * period).
+        # an iteration that starts at shift s covers [s, s + period) of the folded signal.
+        rows = signal[:period * (iter_count + 1)].reshape(-1, period)
+        return np.concatenate((rows[:-1].sum(axis=0), rows[1:].sum(axis=0)))
+    
+    def correlate(self, folded, job_signal):
+        # result[s] = sum over t of folded[s + t] * job_signal[t], for s in [0, period).
+        # s + t never wraps around the circle of length 2 * period. 
+        period = len(job_signal)
+        correlation = np.fft.irfft(np.fft.rfft(folded) * np.conj(np.fft.rfft(job_signal, n=2 * period)), 
+                                   n=2 * period)
+        return correlation[:period]
+    
+    def get_best_shift(self, job, link_totals, bad_times):
+        period = job.base_period
+        iter_count = job.iter_count 
+        
+        overloads = np.zeros(period)
+        overlaps = np.zeros(period)
+        good_times = ~bad_times
+        
+        for link_id, link_load in job.link_loads.items():
+            placed_load = link_totals[link_id]
+            
+            job_signal = np.zeros(period)
+            base_signal = link_load.get_base_signal(1.0)[:period]
+            job_signal[:len(base_signal)] = base_signal
+            
+            # the number of new bad time steps: for every value that the job takes, the
+            # times it takes that value, against the good times that can't fit it.
+            load_levels = np.unique(job_signal[job_signal > 0])
+            if len(load_levels) > self.max_load_levels:
+                load_levels = load_levels[-1:]
+                level_masks = [job_signal > 0]
+            else: 
+                level_masks = [job_signal == level for level in load_levels]
+            
+            for level, level_mask in zip(load_levels, level_masks):
+                no_room = ((placed_load + level > self.capacity) & good_times).astype(float)
+                overloads += self.correlate(self.fold(no_room, period, iter_count), 
+                                            level_mask.astype(float))
+            
+            # with the same overloads, the shift that overlaps the least with the others. 
+            overlaps += self.correlate(self.fold(placed_load, period, iter_count), job_signal)
+        
+        # the fft leaves some noise on the exact ties, the smallest shift among them is taken.
+        overloads = np.round(overloads)
+        candidates = np.flatnonzero(overloads == np.min(overloads))
+        tolerance = 1e-9 * max(1.0, np.max(np.abs(overlaps)))
+        best_overlap = np.min(overlaps[candidates])
+        return int(candidates[overlaps[candidates] <= best_overlap + tolerance][0]) 
+    
+    def make_solution(self, bad_ranges=[], base_inflate=1.0): 
+        solve_start_time = time.time()
+        sol = Solution(self.job_map)
+        
+        # the shift is less than a period, so every job ends before its (iter_count + 1)th period. 
+        horizon = max(job.base_period * (job.iter_count + 1) for job in self.job_map.values())
+        link_totals = defaultdict(lambda: np.zeros(horizon))
+        bad_times = np.zeros(horizon, dtype=bool)
+        
+        for job_id in self.get_job_order():
+            job = self.job_map[job_id]
+            
+            if len(job.link_loads) == 0: 
+                continue
+            
+            shift = self.get_best_shift(job, link_totals, bad_times)
+            sol.set_job_iter(job_id, 0, shift)
+            
+            for link_id, link_load in job.link_loads.items():
+                job_signal = np.tile(link_load.get_base_signal(1.0), job.iter_count)[:horizon - shift]
+                link_totals[link_id][shift:shift + len(job_signal)] += job_signal
+                bad_times |= link_totals[link_id] > self.capacity
+        
+        self.solve_stats = {"solve_time": time.time() - solve_start_time}
+        
+        return sol
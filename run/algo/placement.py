@@ -5,11 +5,19 @@ from algo.placement_sim import get_job_placement_info
 from pprint import pprint
 import os 
 import copy
-from processing.flowprogress import get_job_profiles
-from processing.sim_finish import get_simulation_finish_time
+from processing.flowprogress import get_batch_job_profiles
 import pickle as pkl    
+import subprocess
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 import math 
-from utils.util import rage_quit
+from utils.util import rage_quit, make_cmd
+from utils.profile_store import ProfileStore, get_binary_hash, get_job_signature
+
+# the pool that runs the profiling tasks. created on first use.
+profiling_pool = None
+profiling_pool_lock = threading.Lock()
 
 
 def perturb_placement(jobs): 
@@ -528,64 +536,208 @@ def generate_manual_4_placement_file(options, run_context):
     
     return jobs, 1.0
 
+def get_profile_store(run_context, config_sweeper):
+    # the store is shared between all the sweeps, unless told otherwise.
+    store_dir = run_context.get("profile-store-dir", config_sweeper.run_path + "/profile-store/")
+    if store_dir is None:
+        return None
+    return ProfileStore(store_dir)
+
+            
+def run_profiling_task(cmd, run_path, pairs):
+    # runs in one of the profiling pool threads. 
+    # runs psim once for a batch of (job id, throttle factor) pairs in its own worker dir, 
+    # and returns the profiles in the same order as the pairs. 
+    # it's a new psim for every batch, not a psim server: the servers belong to the sweep 
+    # threads, and the batches run on the threads of the profiling pool. 
+    subprocess.check_output(cmd, shell=True)
+    
+    profiles_path = "{}/profiles.bin".format(run_path)    
+    # only the run-length encoded histories are kept in the profiles. 
+    batch_profiles = get_batch_job_profiles(profiles_path, only_summary=True)
+    
+    assert len(batch_profiles) == len(pairs), "expected {} profiles, got {}".format(len(pairs), len(batch_profiles))
+    
+    profiles = [] 
+    for (job_id, throttle_factor), batch_profile in zip(pairs, batch_profiles):
+        assert batch_profile["job_id"] == job_id, "job ids do not match"
+        
+        job_prof = batch_profile["job_profiles"] 
+        psim_finish_time = batch_profile["psim_time"]
+        
+        # job_prof might be empty.
+        if job_id in job_prof:
+            assert job_prof[job_id]["period"] == psim_finish_time, "periods do not match" 
+            profiles.append(job_prof[job_id]) 
+        else: 
+            profiles.append({
+                "period": psim_finish_time,
+                "flows": []
+            })
+            
+    return profiles 
+
+
+def get_profiling_pool(run_context, config_sweeper):
+    # one pool for the whole process, shared between all the sweep threads, 
+    # so the total number of profiling psim instances stays bounded.
+    # threads are enough, the work is waiting for psim and reading its output. 
+    # by default there are as many as the sweep threads, so there's at most one 
+    # profiling psim per sweep thread, like before the pool.
+    global profiling_pool
+    
+    with profiling_pool_lock:
+        if profiling_pool is None:
+            worker_count = run_context.get("profiling-worker-count", config_sweeper.worker_thread_count)
+            profiling_pool = ThreadPoolExecutor(max_workers=worker_count)
+            
+        return profiling_pool
+    
+    
 def profile_all_jobs(jobs, options, run_context, config_sweeper, placement_path, stretch_factor=1):
-    for job in jobs:
-        if "profiled-throttle-factors" not in run_context:  
-            rage_quit("Error: profiled-throttle-factors not in run_context.")
+    profiling_start_time = time.time() 
+    
+    if "profiled-throttle-factors" not in run_context:  
+        rage_quit("Error: profiled-throttle-factors not in run_context.")
         
+    profile_store = get_profile_store(run_context, config_sweeper)
+    if profile_store is not None:
+        binary_hash = get_binary_hash(config_sweeper.run_executable)
+    
+    worker_id = run_context["worker-id-for-profiling"]
+    
+    profiling_job_options = copy.deepcopy(options)  
+    profiling_job_options["print-flow-progress-history"] = True
+    profiling_job_options["flow-info-format"] = "binary"
+    profiling_job_options["timing-file"] = None  
+    profiling_job_options["ft-core-count"] = 1  
+    profiling_job_options["ft-agg-core-link-capacity-mult"] = run_context["profiling-core-count"]
+    profiling_job_options["lb-scheme"] = "random"   
+    profiling_job_options["worker-id"] = worker_id
+    profiling_job_options["stretch-factor"] = stretch_factor 
+    profiling_job_options["placement-file"] = placement_path
+    profiling_job_options["subflows"] = 1 
+    
+    profiling_tasks = [] 
+    psim_tasks = [] 
+    pending_signatures = set() 
+    
+    for job in jobs:
         job["period"] = {}
 
         for throttle_factor in run_context["profiled-throttle-factors"]:
-            profiling_job_options = copy.deepcopy(options)  
-            profiling_job_options["isolate-job-id"] = job["job_id"]
-            profiling_job_options["print-flow-progress-history"] = True
-            profiling_job_options["timing-file"] = None  
-            profiling_job_options["ft-core-count"] = 1  
-            profiling_job_options["ft-agg-core-link-capacity-mult"] = run_context["profiling-core-count"]
-            profiling_job_options["lb-scheme"] = "random"   
-            profiling_job_options["worker-id"] = run_context["worker-id-for-profiling"]
-            profiling_job_options["stretch-factor"] = stretch_factor 
-            profiling_job_options["placement-file"] = placement_path
-            profiling_job_options["throttle_factor"] = throttle_factor
-            profiling_job_options["subflows"] = 1 
+            task = {
+                "job": job, 
+                "throttle_factor": throttle_factor,
+                "profile": None,
+                "source": "psim", 
+            }
             
-            output = config_sweeper.only_run_command_with_options(run_context, profiling_job_options)
-            
-            run_path = "{}/worker-{}/run-1".format(config_sweeper.workers_dir,
-                                                   run_context["worker-id-for-profiling"])
-            
-            flow_info_path = "{}/flow-info.txt".format(run_path)    
-            results_path = "{}/results.txt".format(run_path)    
+            if profile_store is not None:
+                # the signature is computed for the same options as a single isolated run.   
+                single_run_options = copy.deepcopy(profiling_job_options)
+                single_run_options["isolate-job-id"] = job["job_id"]
+                single_run_options["throttle_factor"] = throttle_factor
+                
+                signature_hash, signature, rack_map = get_job_signature(job, single_run_options, run_context, 
+                                                                        throttle_factor, binary_hash)
+                task["store_key"] = (signature_hash, signature, rack_map)
+                task["profile"] = profile_store.get(signature_hash, signature, rack_map, job["job_id"])
+                
+            if task["profile"] is not None:
+                task["source"] = "store"
+            elif profile_store is not None and signature_hash in pending_signatures:
+                # an equivalent job in this placement is already being profiled. 
+                # it will be in the store by the time we get to this task.
+                task["source"] = "dedup"
+            else: 
+                psim_tasks.append(task)
+                if profile_store is not None:
+                    pending_signatures.add(signature_hash)
             
-            job_prof, _, _ = get_job_profiles(flow_info_path)
-            psim_finish_time = get_simulation_finish_time(results_path)
+            profiling_tasks.append(task)
+    
+    # all the pairs that need psim are profiled in one psim run per batch. 
+    # by default there's one batch for the whole placement. 
+    batch_size = run_context.get("profiling-batch-size", None)
+    if batch_size is None or batch_size <= 0:
+        batch_size = max(len(psim_tasks), 1)
+    
+    batches = [psim_tasks[i:i + batch_size] for i in range(0, len(psim_tasks), batch_size)]
+    
+    for batch_index, batch in enumerate(batches):
+        pairs = [(task["job"]["job_id"], task["throttle_factor"]) for task in batch]
+        
+        batch_options = copy.deepcopy(profiling_job_options)
+        batch_options["isolate-job-ids"] = ",".join([str(job_id) for job_id, _ in pairs])
+        batch_options["throttle-factors"] = ",".join([str(throttle_factor) for _, throttle_factor in pairs])
+        
+        # every batch gets its own workers dir, so the batches can run at the same time.  
+        batch_workers_dir = "{}/profiling-{}/batch-{}".format(config_sweeper.workers_dir, worker_id, batch_index)
+        batch_options["workers-dir"] = batch_workers_dir
+        
+        cmd = make_cmd(config_sweeper.run_executable, batch_options)
+        run_path = "{}/worker-{}/run-1".format(batch_workers_dir, worker_id)
+        
+        config_sweeper.log_for_thread(run_context, "Going to run the command ..." + cmd)
+        
+        pool = get_profiling_pool(run_context, config_sweeper)
+        future = pool.submit(run_profiling_task, cmd, run_path, pairs)
+        
+        for index_in_batch, task in enumerate(batch):
+            task["future"] = future
+            task["index_in_batch"] = index_in_batch
             
-            # job_prof might be empty.
-            job_id = job["job_id"]
-            this_job_prof = None 
+    for task in profiling_tasks: 
+        job = task["job"] 
+        job_id = job["job_id"]
+        throttle_factor = task["throttle_factor"]
+        
+        if task["source"] == "dedup":
+            signature_hash, signature, rack_map = task["store_key"]
+            task["profile"] = profile_store.get(signature_hash, signature, rack_map, job_id)
             
-            if job_id in job_prof:
-                assert job_prof[job_id]["period"] == psim_finish_time, "periods do not match" 
-                this_job_prof = job_prof[job_id] 
-            else: 
-                this_job_prof = {
-                    "period": psim_finish_time,
-                    "flows": []
-                }
+        elif task["profile"] is None:
+            try: 
+                task["profile"] = task["future"].result()[task["index_in_batch"]]
+            except Exception as e:
+                traceback.print_exc()
+                rage_quit("error in profiling job {} with throttle factor {}: {}".format(job_id, throttle_factor, e))
                 
-            profile_file_path = f"{run_context['profiles-dir']}/{job_id}_{throttle_factor}.pkl" 
-            with open(profile_file_path, "wb") as f:
-                pkl.dump(this_job_prof, f)    
+            if profile_store is not None:
+                signature_hash, signature, rack_map = task["store_key"]
+                profile_store.put(signature_hash, signature, rack_map, task["profile"])
+        
+        this_job_prof = task["profile"]
+        psim_finish_time = this_job_prof["period"]
+        
+        profile_file_path = f"{run_context['profiles-dir']}/{job_id}_{throttle_factor}.pkl" 
+        with open(profile_file_path, "wb") as f:
+            pkl.dump(this_job_prof, f)    
+        
+        # profile_file_path_json = f"{run_context['profiles-dir']}/{job_id}_{throttle_factor}.json"   
+        # with open(profile_file_path_json, "w") as f:    
+        #     json.dump(this_job_prof, f, indent=4) 
             
-            # profile_file_path_json = f"{run_context['profiles-dir']}/{job_id}_{throttle_factor}.json"   
-            # with open(profile_file_path_json, "w") as f:    
-            #     json.dump(this_job_prof, f, indent=4) 
-                
-            job["period"][str(throttle_factor)] = psim_finish_time
-            if throttle_factor == 1.0:  
-                job["base_period"] = psim_finish_time
-                
-            print("profiled job: ", job_id, " with throttle factor: ", throttle_factor, " period: ", psim_finish_time)
+        job["period"][str(throttle_factor)] = psim_finish_time
+        if throttle_factor == 1.0:  
+            job["base_period"] = psim_finish_time
+            
+        print("profiled job: ", job_id, " with throttle factor: ", throttle_factor, 
+              " period: ", psim_finish_time, " from: ", task["source"])
+    
+    profiling_time = time.time() - profiling_start_time
+    
+    profiling_stats = {
+        "profiling_time": profiling_time,
+        "profiling_task_count": len(profiling_tasks),
+        "profiling_psim_runs": len(batches),
+        "profiling_psim_pairs": len(psim_tasks),
+        "profile_store_hits": len([task for task in profiling_tasks if task["source"] == "store"]),
+    }
+    print("profiling stats for {}: ".format(placement_path), profiling_stats)
+    
+    return profiling_stats 
             
             
 def handle_rings(jobs, placement_mode, ring_mode): 
@@ -682,7 +834,7 @@ def generate_placement_file(placement_path, placement_seed,
         f.flush()
 
     # we want to do the profiling here. 
-    profile_all_jobs(jobs, options, run_context, config_sweeper, placement_path) 
+    profiling_stats = profile_all_jobs(jobs, options, run_context, config_sweeper, placement_path) 
     set_iter_counts(jobs, run_context)
     
     # now we save the jobs with the iter count.       
@@ -694,6 +846,7 @@ def generate_placement_file(placement_path, placement_seed,
         "cmmcmp_ratio": cmmcmp_ratio,
         "final_entropy": measure_entropy(jobs, options["ft-server-per-rack"]),
     }
+    add_to_context.update(profiling_stats)
     return jobs, add_to_context
 
 
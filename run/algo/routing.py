@@ -1,14 +1,10 @@
 from pprint import pprint 
-import matplotlib.pyplot as plt
 import numpy as np  
 import os
 from copy import deepcopy
 import random 
 import sys 
 import itertools
-import networkx as nx
-import matplotlib.pyplot as plt
-from networkx.algorithms.flow import maximum_flow
 from collections import deque, defaultdict
 import hashlib
 from itertools import chain
@@ -29,6 +25,7 @@ from algo.routing_logics.coloring_v6 import route_flows_graph_coloring_v6
 from algo.routing_logics.coloring_v7 import route_flows_graph_coloring_v7
 from algo.routing_logics.coloring_v8 import route_flows_graph_coloring_v8
 from algo.routing_logics.simple_routing import route_flows_one_by_one
+from algo.routing_logics.coloring_util import color_bipartite_multigraph
     
 ############################################################################################################
 ############################################################################################################
@@ -46,23 +43,77 @@ def log_results(run_context, key, value):
 
 
 
-def route_flows(jobs, options, run_context, job_profiles, job_timings, 
-                suffix=1, highlighted_ranges=[], early_return=False, 
-                override_routing_strategy=None): 
+class RoutingSession():
+    # the state of the previous round of routing, for the rounds of the farid schedulers. 
+    # the flows of a job are only made again if its timing changed, and a component 
+    # is only colored again if it wasn't in the previous round. the coloring of a 
+    # component only depends on its edges, which are fixed by its component key. 
+    # a session belongs to one workload, the job profiles shouldn't change between rounds.
     
-    servers_per_rack = options["ft-server-per-rack"]
-    num_leaves = options["machine-count"] // servers_per_rack   
-    num_spines = options["ft-core-count"]
-    link_bandwidth = options["link-bandwidth"]  
-    max_subflow_count = options["subflows"]
+    def __init__(self):
+        self.job_flows = {} 
+        self.fit_strategy = None 
+        self.colorings = {}
+        self.round_colorings = {}
+        self.stats = {} 
+        
+    def start_round(self, fit_strategy):
+        self.stats = {"reused_jobs": 0, "remade_jobs": 0, 
+                      "reused_components": 0, "colored_components": 0}
+        
+        if fit_strategy != self.fit_strategy:
+            # the component keys of the different strategies don't mean the same thing. 
+            self.colorings = {}
+        elif len(self.round_colorings) > 0:
+            # a round that returned early before coloring anything doesn't replace the last one. 
+            self.colorings = self.round_colorings
+        
+        self.fit_strategy = fit_strategy
+        self.round_colorings = {}
+        
+    def get_all_flows(self, job_profiles, job_deltas, 
+                      job_throttle_rates, job_periods, job_iterations):
+        # same as get_all_flows, with the flows of the jobs with the same timing reused. 
+        all_flows = [] 
+        job_flows = {} 
+        
+        for job_id, job_profile in job_profiles.items():
+            timing_key = (tuple(job_deltas[job_id]), tuple(job_throttle_rates[job_id]), 
+                          tuple(job_periods[job_id]), job_iterations[job_id])
+            
+            if job_id in self.job_flows and self.job_flows[job_id][0] == timing_key:
+                flows = self.job_flows[job_id][1]
+                self.stats["reused_jobs"] += 1
+            else: 
+                flows = get_job_flows(job_profile, job_deltas[job_id], job_throttle_rates[job_id], 
+                                      job_periods[job_id], job_iterations[job_id])
+                self.stats["remade_jobs"] += 1
+                
+            job_flows[job_id] = (timing_key, flows)
+            all_flows.extend(flows)
+        
+        self.job_flows = job_flows
+        return all_flows
     
+    def get_coloring(self, component_key, edges): 
+        if component_key in self.colorings:
+            coloring = self.colorings[component_key]
+            self.stats["reused_components"] += 1
+        else: 
+            coloring = color_bipartite_multigraph(edges)
+            self.stats["colored_components"] += 1
+            
+        self.round_colorings[component_key] = coloring
+        return coloring
+    
+    
+def get_job_schedules(jobs, job_timings):
+    # the deltas, throttle rates, periods and iteration counts of the jobs, by job id. 
     job_deltas = {} 
     job_throttle_rates = {} 
     job_periods = {} 
     job_iterations = {} 
     
-    all_job_ids = [job["job_id"] for job in jobs]   
-    
     for job_timing in job_timings:
         job_id = job_timing["job_id"]
         job_deltas[job_id] = job_timing["deltas"]
@@ -75,6 +126,44 @@ def route_flows(jobs, options, run_context, job_profiles, job_timings,
         for i in range(job["iter_count"]):
             iter_throttle_rate = job_throttle_rates[job["job_id"]][i]
             job_periods[job["job_id"]].append(job["period"][str(iter_throttle_rate)])
+    
+    return job_deltas, job_throttle_rates, job_periods, job_iterations
+
+
+def get_routing_lower_bound_bad_ranges(jobs, options, job_profiles, job_timings):
+    # a cheap feasibility check for a timing, before the full routing: the ranges of time 
+    # where some rack has more subflows going in or out than all the spines can carry, 
+    # whatever the coloring. these are the ranges that the coloring strategies return 
+    # early with. no ranges doesn't mean that the routing will work out.
+    num_spines = options["ft-core-count"]
+    link_bandwidth = options["link-bandwidth"]  
+    max_subflow_count = options["subflows"]
+    
+    job_deltas, job_throttle_rates, job_periods, job_iterations = get_job_schedules(jobs, job_timings)
+    
+    all_flows = get_all_flows(job_profiles, job_deltas, job_throttle_rates, 
+                              job_periods, job_iterations)
+    
+    if len(all_flows) == 0:
+        return [] 
+    
+    max_edge_count = get_max_edge_count(all_flows, link_bandwidth / max_subflow_count, max_subflow_count)
+    return get_edge_count_bad_ranges(max_edge_count, num_spines * max_subflow_count)
+
+
+def route_flows(jobs, options, run_context, job_profiles, job_timings, 
+                suffix=1, highlighted_ranges=[], early_return=False, 
+                override_routing_strategy=None, session=None): 
+    
+    servers_per_rack = options["ft-server-per-rack"]
+    num_leaves = options["machine-count"] // servers_per_rack   
+    num_spines = options["ft-core-count"]
+    link_bandwidth = options["link-bandwidth"]  
+    max_subflow_count = options["subflows"]
+    
+    all_job_ids = [job["job_id"] for job in jobs]   
+    
+    job_deltas, job_throttle_rates, job_periods, job_iterations = get_job_schedules(jobs, job_timings)
             
     
     routing_plot_dir = "{}/routing/".format(run_context["routings-dir"])  
@@ -90,58 +179,67 @@ def route_flows(jobs, options, run_context, job_profiles, job_timings,
         this_job_time = total_productive_time + total_time_delay 
         routing_time = max(routing_time, this_job_time)     
     
-    rem = initialize_rem(num_leaves, num_spines, link_bandwidth, routing_time)
-    usage = initialize_usage(all_job_ids, num_leaves, num_spines, routing_time)
-    
-    all_flows = get_all_flows(job_profiles, job_deltas, job_throttle_rates, 
-                              job_periods, job_iterations)
-                    
-    lb_decisions = {} 
-    # for flow in all_flows:
+    # the link state is only allocated if something uses it. 
+    link_state = LinkState(all_job_ids, num_leaves, num_spines, link_bandwidth, routing_time)
     
     fit_strategy = run_context["routing-fit-strategy"] 
     if override_routing_strategy is not None:
         fit_strategy = override_routing_strategy
+    
+    if session is not None and not run_context.get("routing-incremental", True):
+        session = None 
+        
+    if session is not None:
+        session.start_round(fit_strategy)
+        all_flows = session.get_all_flows(job_profiles, job_deltas, job_throttle_rates, 
+                                          job_periods, job_iterations)
+    else: 
+        all_flows = get_all_flows(job_profiles, job_deltas, job_throttle_rates, 
+                                  job_periods, job_iterations)
+                    
+    lb_decisions = {} 
+    # for flow in all_flows:
         
     # TODO: the times ranges can be calculated in here, instead of copying in each of the functions. 
     ############################################################################################################  
     # experimental code for graph coloring.
     ############################################################################################################  
     if fit_strategy == "graph-coloring-v2":  
-        times_range = route_flows_graph_coloring_v2(all_flows, rem, usage, num_spines, 
+        times_range = route_flows_graph_coloring_v2(all_flows, link_state, num_spines, 
                                                       lb_decisions, run_context)
         
     elif fit_strategy == "graph-coloring-v3":
-        times_range = route_flows_graph_coloring_v3(all_flows, rem, usage, num_spines, 
+        times_range = route_flows_graph_coloring_v3(all_flows, link_state, num_spines, 
                                                     lb_decisions, run_context)
             
     elif fit_strategy == "graph-coloring-v4":
-        times_range = route_flows_graph_coloring_v4(all_flows, rem, usage, num_spines, 
+        times_range = route_flows_graph_coloring_v4(all_flows, link_state, num_spines, 
                                                     lb_decisions, run_context)
                     
     elif fit_strategy == "graph-coloring-v5":
-        times_range = route_flows_graph_coloring_v5(all_flows, rem, usage, num_spines, 
+        times_range = route_flows_graph_coloring_v5(all_flows, link_state, num_spines, 
                                                     lb_decisions, run_context, 
                                                     max_subflow_count, link_bandwidth, suffix, 
                                                     highlighted_ranges, early_return)
         
     elif fit_strategy == "graph-coloring-v7":
-        times_range = route_flows_graph_coloring_v7(all_flows, rem, usage, num_spines, 
+        times_range = route_flows_graph_coloring_v7(all_flows, link_state, num_spines, 
                                                     lb_decisions, run_context, 
                                                     max_subflow_count, link_bandwidth, suffix, 
-                                                    highlighted_ranges, early_return) 
+                                                    highlighted_ranges, early_return, session) 
     elif fit_strategy == "graph-coloring-v8":   
-        times_range = route_flows_graph_coloring_v8(all_flows, rem, usage, num_spines, 
+        times_range = route_flows_graph_coloring_v8(all_flows, link_state, num_spines, 
                                                     lb_decisions, run_context, 
                                                     max_subflow_count, link_bandwidth, suffix, 
-                                                    highlighted_ranges, early_return)   
+                                                    highlighted_ranges, early_return, session)   
     else: # regular execution path 
-        times_range = route_flows_one_by_one(all_flows, rem, usage, num_spines,   
+        times_range = route_flows_one_by_one(all_flows, link_state, num_spines,   
                                              lb_decisions, run_context, max_subflow_count)
         
     min_affected_time, max_affected_time, bad_ranges = times_range
         
     if run_context["plot-routing-assignment"]: 
+        rem, usage = link_state.materialize()
         plot_routing(run_context, rem, usage, all_job_ids, 
                      num_leaves, num_spines, routing_time, 
                      min_affected_time, max_affected_time, 
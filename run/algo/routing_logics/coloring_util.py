@@ -1,5 +1,9 @@
-from collections import deque, defaultdict
+from collections import deque, defaultdict, OrderedDict
 import random 
+import hashlib
+import os
+import pickle as pkl
+import threading
 
 def compute_max_degree(edges):
     degree = defaultdict(int)
@@ -110,28 +114,220 @@ def color_bipartite_multigraph_helper(input_edges):
 ############################################################################################################
 ############################################################################################################
 
-# apparently the greedy coloring algorithm is not working well for the bipartite multigraph coloring problem
-# sometimes it uses more colors than the maximum degree of the graph
+# the greedy coloring above sometimes uses more colors than the maximum degree, and was retried 
+# up to 10 times with new random shuffles to get down to it. by König's theorem a bipartite 
+# multigraph can always be colored with exactly max degree colors. the edges are colored one 
+# by one. for an edge (u, v), let a be a color free at u and b a color free at v. if a is also free
+# at v, the edge takes a. otherwise the path from v that alternates a and b is flipped, which 
+# frees a at v. in a bipartite graph that path can never reach u, so u keeps a free.
+# there's no randomness and no recursion, and the result is the same every time. 
+# the colors it picks are not the ones the greedy coloring picked, so the routings built on 
+# the coloring (graph-coloring-v5, v7 and v8) make different lb decisions than before, e.g. 
+# a flow can get a different number of spines, and so do the results of those runs. 
+
+def color_bipartite_multigraph_konig(input_edges):
+    if not input_edges:
+        return {}, 0
+    
+    vertex_ids = {} 
+    endpoints = [] 
+    for r in input_edges:
+        u = vertex_ids.setdefault(r[0], len(vertex_ids))
+        v = vertex_ids.setdefault(r[1], len(vertex_ids))
+        endpoints.append((u, v))
+    
+    degree = [0] * len(vertex_ids)
+    for u, v in endpoints:
+        degree[u] += 1
+        degree[v] += 1
+    max_degree = max(degree)
+    
+    # edge_at[x][c] is the edge with color c at vertex x, or -1. color 0 is never used. 
+    edge_at = [[-1] * (max_degree + 1) for _ in range(len(vertex_ids))]
+    colors = [0] * len(endpoints)
+    
+    for edge, (u, v) in enumerate(endpoints):
+        a = edge_at[u].index(-1, 1)
+        
+        if edge_at[v][a] != -1:
+            b = edge_at[v].index(-1, 1)
+            
+            if edge_at[u][b] == -1:
+                a = b
+            else: 
+                # walk the a/b path from v, then swap the two colors along it. 
+                path = [] 
+                x = v 
+                c = a 
+                while edge_at[x][c] != -1:
+                    path_edge = edge_at[x][c]
+                    path.append(path_edge)
+                    path_u, path_v = endpoints[path_edge]
+                    x = path_v if x == path_u else path_u
+                    c = b if c == a else a
+                
+                for path_edge in path:
+                    path_u, path_v = endpoints[path_edge]
+                    edge_at[path_u][colors[path_edge]] = -1
+                    edge_at[path_v][colors[path_edge]] = -1
+                    
+                for path_edge in path:
+                    path_u, path_v = endpoints[path_edge]
+                    colors[path_edge] = a + b - colors[path_edge]
+                    edge_at[path_u][colors[path_edge]] = path_edge
+                    edge_at[path_v][colors[path_edge]] = path_edge
+                
+                assert edge_at[u][a] == -1, "the graph is not bipartite"
+        
+        colors[edge] = a
+        edge_at[u][a] = edge
+        edge_at[v][a] = edge
+    
+    edge_color_map = {} 
+    for i in range(len(endpoints)):  
+        edge_color_map[i + 1] = colors[i]
+        
+    return edge_color_map, max_degree   
 
-# this is just a wrapper function to call the helper function multiple times until the number of colors used 
-# is <= maximum degree. this is probably an astoundingly stupid way to do this, but it works most of the time
 
-# I tested it a couple of times and it seems to work, within a couple of attempts. 
-# I should probably try adding more randomness to the base algorithm, but I'm not sure how to do that.
-# now I just shuffle the edges before coloring them, but not sure if that's enough.
+############################################################################################################
+############################################################################################################
+############################################################################################################
 
-# seriously, though, why isn't there a proper algorithm for this available? I'm pretty sure this is a well-known problem
-# I found papers on it, but I'm not going to implement a proper algorithm from scratch.
+# the same rack to rack edge multisets keep coming back, in every iteration of a job, in every 
+# round of the farid schedulers and across the placements. the colorings are cached by the 
+# shape of the multigraph: the vertices are renamed in the order they are first seen, with the 
+# vertex pairs sorted by their multiplicity and the degrees of their ends first. two graphs 
+# with the same key are the same graph up to the renaming, so the cached colors of each pair 
+# can be given to the matching pair of the new graph. the parallel edges of a pair are 
+# interchangeable, they just take the pair's colors in order. 
+# on a miss it's the renamed graph that is colored, not the input, so a graph gets the same 
+# coloring whether it was in the cache or not. 
+# the hits and misses are counted per thread, so that runs on different threads each get 
+# their own counts. 
 
-def color_bipartite_multigraph(input_edges):
+class ColoringCache():
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict() 
+        self.lock = threading.Lock()
+        self.counts = threading.local()
+        
+    def clear(self):
+        # drops the entries and the counts of this thread.
+        with self.lock:
+            self.entries.clear()
+        self.counts.__dict__.clear()
+        
+    def get_canonical_pairs(self, input_edges):
+        # the vertex pairs in canonical order, with the edge indices of each pair, 
+        # the renamed pairs with their multiplicities, and the key. 
+        pair_edges = {} 
+        degree = defaultdict(int)
+        for i, r in enumerate(input_edges):
+            pair_edges.setdefault((r[0], r[1]), []).append(i)
+            degree[r[0]] += 1
+            degree[r[1]] += 1
+        
+        pairs = sorted(pair_edges.keys(), 
+                       key=lambda p: (-len(pair_edges[p]), -degree[p[0]], -degree[p[1]]))
+        
+        vertex_ids = {} 
+        canonical = [] 
+        for u, v in pairs:
+            canonical.append((vertex_ids.setdefault(u, len(vertex_ids)), 
+                              vertex_ids.setdefault(v, len(vertex_ids)), 
+                              len(pair_edges[(u, v)])))
+        
+        key = hashlib.sha1(repr(canonical).encode()).hexdigest()
+        return [pair_edges[p] for p in pairs], canonical, key 
     
-    edge_color_map, max_degree = color_bipartite_multigraph_helper(input_edges) 
-    colors_used_count = len(set(edge_color_map.values()) ) 
-
-    round = 1
-    while colors_used_count > max_degree and round < 10:
-        edge_color_map, max_degree = color_bipartite_multigraph_helper(input_edges) 
-        colors_used_count = len(set(edge_color_map.values()) ) 
-        round += 1  
+    def count(self, name):
+        setattr(self.counts, name, getattr(self.counts, name, 0) + 1)
+    
+    def get_coloring(self, input_edges):
+        if not input_edges:
+            return {}, 0
+        
+        pairs, canonical, key = self.get_canonical_pairs(input_edges)
         
-    return edge_color_map, max_degree
\ No newline at end of file
+        with self.lock:
+            entry = self.entries.get(key, None)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        
+        if entry is not None:
+            self.count("hits")
+        else:
+            self.count("misses")
+            canonical_edges = [(u, v) for u, v, multiplicity in canonical for _ in range(multiplicity)]
+            canonical_color_map, max_degree = color_bipartite_multigraph_konig(canonical_edges)
+            
+            pair_colors = [] 
+            edge = 1 
+            for u, v, multiplicity in canonical:
+                pair_colors.append(tuple(canonical_color_map[edge + i] for i in range(multiplicity)))
+                edge += multiplicity
+            entry = (pair_colors, max_degree)
+            
+            with self.lock:
+                self.entries[key] = entry
+                if len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        
+        pair_colors, max_degree = entry
+        edge_color_map = {} 
+        for edge_indices, colors in zip(pairs, pair_colors):
+            for i, color in zip(edge_indices, colors):
+                edge_color_map[i + 1] = color
+        return edge_color_map, max_degree
+    
+    def get_stats(self, since=None): 
+        # the lookups of this thread since an earlier get_stats, or since the start. 
+        hits = getattr(self.counts, "hits", 0)
+        misses = getattr(self.counts, "misses", 0)
+        if since is not None:
+            hits -= since["coloring_cache_hits"]
+            misses -= since["coloring_cache_misses"]
+            
+        lookups = hits + misses
+        return {
+            "coloring_cache_hits": hits,
+            "coloring_cache_misses": misses,
+            "coloring_cache_hit_rate": hits / lookups if lookups > 0 else 0,
+        }
+    
+    def load(self, path):
+        # the entries saved by an earlier process, if there are any. 
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                entries = pkl.load(f)
+            with self.lock:
+                self.entries.update(entries)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+    
+    def save(self, path):
+        # merged with what the other processes saved in the meantime, and written to a 
+        # temp file first, since they might be reading it. 
+        entries = OrderedDict() 
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                entries.update(pkl.load(f))
+        with self.lock:
+            entries.update(self.entries)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            pkl.dump(entries, f)
+        os.replace(temp_path, path)
+        
+
+# one cache for the whole process. 
+coloring_cache = ColoringCache() 
+
+
+def color_bipartite_multigraph(input_edges):
+    return coloring_cache.get_coloring(input_edges)
@@ -8,7 +8,7 @@ import sys
 import hashlib
 
 
-def route_flows_graph_coloring_v3(all_flows, rem, usage, num_spines, 
+def route_flows_graph_coloring_v3(all_flows, link_state, num_spines, 
                                   lb_decisions, run_context):
     min_affected_time = 1e9   
     max_affected_time = 0 
@@ -120,7 +120,7 @@ def route_flows_graph_coloring_v3(all_flows, rem, usage, num_spines,
         min_affected_time = min(min_affected_time, start_time)  
         max_affected_time = max(max_affected_time, end_time)
         
-        update_time_range(start_time, end_time, flow, selected_spines, rem, usage, 
+        update_time_range(start_time, end_time, flow, selected_spines, link_state, 
                             src_leaf, dst_leaf)     
         
     return min_affected_time, max_affected_time, []
\ No newline at end of file
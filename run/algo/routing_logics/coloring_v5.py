@@ -11,7 +11,7 @@ import sys
 import hashlib
 import math
 
-def route_flows_graph_coloring_v5(all_flows, rem, usage, num_spines, 
+def route_flows_graph_coloring_v5(all_flows, link_state, num_spines, 
                                   lb_decisions, run_context, max_subflow_count, link_bandwidth, 
                                   suffix=1, highlighted_ranges=[], early_return=False): 
 
@@ -216,7 +216,7 @@ def route_flows_graph_coloring_v5(all_flows, rem, usage, num_spines,
         max_affected_time = max(max_affected_time, end_time)
         
         if run_context["plot-routing-assignment"]:
-            update_time_range(start_time, end_time, flow, selected_spines, rem, usage, 
+            update_time_range(start_time, end_time, flow, selected_spines, link_state, 
                               src_leaf, dst_leaf)
         
     bad_ranges.sort()
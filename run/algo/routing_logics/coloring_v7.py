@@ -1,4 +1,5 @@
 from algo.routing_logics.routing_util import update_time_range
+from algo.routing_logics.routing_util import get_max_edge_count, get_edge_count_bad_ranges
 from algo.routing_logics.coloring_util import color_bipartite_multigraph
 # from algo.routing_logics.routing_util import merge_overlapping_ranges
 # from algo.routing_logics.routing_util import find_value_in_range
@@ -10,7 +11,8 @@ from collections import defaultdict
 import sys 
 import hashlib
 import math
-import networkx as nx
+import bisect
+import itertools
 
 
 
@@ -18,13 +20,6 @@ def merge_overlapping_ranges_v7(ranges_dict,
                                 traffic_pattern_to_src_racks, 
                                 traffic_pattern_to_dst_racks):
 
-    def racks_overlap(src_a, dst_a, src_b, dst_b):
-        if src_a & src_b:
-            return True
-        if dst_a & dst_b:
-            return True
-        return False
-
     # Flatten all intervals with their corresponding key and rack sets
     intervals = []
     for key, ranges in ranges_dict.items():
@@ -62,17 +57,24 @@ def merge_overlapping_ranges_v7(ranges_dict,
             parent[root_y] = root_x
             rank[root_x] += 1
 
-    active = []
+    # sweep over the intervals in the order of their start. for every rack, the active 
+    # interval that ends last is kept. all the intervals on a rack that are active at a 
+    # point in time overlap each other, so they are already in one component, and 
+    # joining the new interval with the one that ends last joins it with all of them. 
+    last_on_rack = {} 
 
     for idx, (start, end, _, src_racks, dst_racks) in enumerate(intervals):
-        active = [i for i in active if intervals[i][1] >= start]
-
-        for active_idx in active:
-            active_start, active_end, _, active_src, active_dst = intervals[active_idx]
-            if active_end >= start and racks_overlap(active_src, active_dst, src_racks, dst_racks):
-                union(idx, active_idx)
-
-        active.append(idx)
+        rack_keys = [("src", rack) for rack in src_racks] + [("dst", rack) for rack in dst_racks]
+        
+        for rack_key in rack_keys:
+            if rack_key in last_on_rack:
+                last_end, last_idx = last_on_rack[rack_key]
+                if last_end >= start:
+                    union(idx, last_idx)
+                    
+        for rack_key in rack_keys:
+            if rack_key not in last_on_rack or last_on_rack[rack_key][0] < end:
+                last_on_rack[rack_key] = (end, idx)
 
     component_ranges = defaultdict(list)
     component_keys = defaultdict(set)
@@ -127,11 +129,50 @@ def find_value_in_range_v7(entries, value, pattern_hash):
     return None
 
 
+def index_solutions_v7(entries):
+    # the time ranges of the entries of each pattern, sorted by start, with the 
+    # running max of the ends, for the lookups in find_value_in_range_indexed_v7.
+    pattern_ranges = defaultdict(list)
+    for entry_index, entry in enumerate(entries):
+        start, end = entry["time_range"]
+        for pattern_hash in entry["patterns"]:
+            pattern_ranges[pattern_hash].append((start, end, entry_index))
+    
+    index = {} 
+    for pattern_hash, ranges in pattern_ranges.items():
+        ranges.sort()
+        max_ends = list(itertools.accumulate([end for start, end, entry_index in ranges], max))
+        index[pattern_hash] = ([start for start, end, entry_index in ranges], ranges, max_ends)
+    return index
+
+
+def find_value_in_range_indexed_v7(entries, index, value, pattern_hash):
+    # same as find_value_in_range_v7. the ranges that start after the value are skipped with 
+    # a bisect, and the walk back stops once no earlier range reaches the value. 
+    if pattern_hash not in index:
+        return None
+    
+    starts, ranges, max_ends = index[pattern_hash]
+    first_entry_index = None 
+    
+    i = bisect.bisect_right(starts, value) - 1
+    while i >= 0 and max_ends[i] >= value:
+        start, end, entry_index = ranges[i]
+        if end >= value and (first_entry_index is None or entry_index < first_entry_index):
+            first_entry_index = entry_index
+        i -= 1
+    
+    if first_entry_index is None:
+        return None
+    return entries[first_entry_index]["coloring"]
+
+
 def plot_rack_dependencies(hash_to_time_ranges, 
                            traffic_pattern_to_src_racks, 
                            traffic_pattern_to_dst_racks, 
                            plot_path):
     import matplotlib.pyplot as plt
+    import networkx as nx
 
     G = nx.Graph()
     hashes = list(hash_to_time_ranges.keys())
@@ -161,9 +202,10 @@ def plot_rack_dependencies(hash_to_time_ranges,
     plt.close()
 
 
-def route_flows_graph_coloring_v7(all_flows, rem, usage, num_spines, 
+def route_flows_graph_coloring_v7(all_flows, link_state, num_spines, 
                                   lb_decisions, run_context, max_subflow_count, link_bandwidth, 
-                                  suffix=1, highlighted_ranges=[], early_return=False): 
+                                  suffix=1, highlighted_ranges=[], early_return=False, 
+                                  routing_session=None): 
 
     log_stuff = run_context["plot-merged-ranges"]
     
@@ -195,51 +237,15 @@ def route_flows_graph_coloring_v7(all_flows, rem, usage, num_spines,
     # by the timing solver. Is this really needed?   
     ##############################    
     
-    flows_max_time = max([f["eff_end_time"] for f in all_flows])
-    edge_count_in = []
-    edge_count_out = []
     for f in all_flows:
-        start_time = f["eff_start_time"]
-        end_time = f["eff_end_time"]
-        
-        src_rack = f["srcrack"]
-        dst_rack = f["dstrack"]
-        
-        needed_subflows = int(math.ceil(f["max_load"] / subflow_capacity))    
-
-        min_affected_time = min(min_affected_time, start_time)  
-        max_affected_time = max(max_affected_time, end_time)
+        min_affected_time = min(min_affected_time, f["eff_start_time"])  
+        max_affected_time = max(max_affected_time, f["eff_end_time"])
 
-        while src_rack >= len(edge_count_in) or dst_rack >= len(edge_count_out):
-            edge_count_in.append([0] * (flows_max_time + 1))
-            edge_count_out.append([0] * (flows_max_time + 1))   
-        
-        for t in range(start_time, end_time + 1):
-            edge_count_in[dst_rack][t] += needed_subflows   
-            edge_count_out[src_rack][t] += needed_subflows  
-
-    max_edge_count = [0] * (flows_max_time + 1)
-    for r in range(len(edge_count_in)):
-        for t in range(flows_max_time):
-            max_edge_count[t] = max(max_edge_count[t], edge_count_in[r][t] / max_subflow_count)
-            max_edge_count[t] = max(max_edge_count[t], edge_count_out[r][t] / max_subflow_count)
+    max_edge_count = get_max_edge_count(all_flows, subflow_capacity, max_subflow_count)
             
     if early_return:
         # find all the ranges where the max_edge_count exceeds available_colors_max
-        bad_ranges = []
-        in_bad_range = False
-        range_start = None
-        for t in range(len(max_edge_count)):
-            if max_edge_count[t] > available_colors_max:
-                if not in_bad_range:
-                    in_bad_range = True
-                    range_start = t
-            else:
-                if in_bad_range:
-                    in_bad_range = False
-                    bad_ranges.append((range_start, t - 1)) 
-        if in_bad_range:
-            bad_ranges.append((range_start, len(max_edge_count) - 1))
+        bad_ranges = get_edge_count_bad_ranges(max_edge_count, available_colors_max)
         
         if len(bad_ranges) > 0: 
             return min_affected_time, max_affected_time, bad_ranges
@@ -349,7 +355,10 @@ def route_flows_graph_coloring_v7(all_flows, rem, usage, num_spines,
                 edges.append((f"{src_leaf}_l", f"{dst_leaf}_r", subflow_counter))    
             
         
-        edge_color_map, max_degree = color_bipartite_multigraph(edges)
+        if routing_session is not None:
+            edge_color_map, max_degree = routing_session.get_coloring(overlapping_keys, edges)
+        else: 
+            edge_color_map, max_degree = color_bipartite_multigraph(edges)
         color_id_to_color = defaultdict(list)
             
         all_colors_used = set(edge_color_map.values()) 
@@ -400,7 +409,7 @@ def route_flows_graph_coloring_v7(all_flows, rem, usage, num_spines,
         plot_path = "{}/routing/merged_ranges_{}.png".format(run_context["routings-dir"], suffix)  
         plot_time_ranges(hash_to_time_ranges, dict(merged_ranges), 
                          needed_color_count, max_degrees, num_spines,
-                         highlighted_ranges, None, plot_path, max_edge_count)
+                         highlighted_ranges, None, plot_path, max_edge_count.tolist())
     
     # use pprint to stderr 
     # pprint(solutions, stream=sys.stderr)
@@ -408,6 +417,8 @@ def route_flows_graph_coloring_v7(all_flows, rem, usage, num_spines,
     if early_return and len(bad_ranges) > 0:
         return min_affected_time, max_affected_time, bad_ranges
     
+    solutions_index = index_solutions_v7(solutions)
+    
     for flow in all_flows:
         src_leaf = flow["srcrack"]
         dst_leaf = flow["dstrack"]
@@ -420,7 +431,8 @@ def route_flows_graph_coloring_v7(all_flows, rem, usage, num_spines,
         color_id = flow["traffic_pattern_hash"] + "_" + flow["traffic_member_id"]
         
         pattern_hash = flow["traffic_pattern_hash"]
-        time_range_coloring = find_value_in_range_v7(solutions, start_time, pattern_hash)
+        time_range_coloring = find_value_in_range_indexed_v7(solutions, solutions_index, 
+                                                             start_time, pattern_hash)
         if time_range_coloring is None:
             print(f"Time range not found for flow: {flow}")
             exit(f"Time range not found for flow: {flow}")
@@ -461,7 +473,7 @@ def route_flows_graph_coloring_v7(all_flows, rem, usage, num_spines,
         max_affected_time = max(max_affected_time, end_time)
         
         if run_context["plot-routing-assignment"]:
-            update_time_range(start_time, end_time, flow, selected_spines, rem, usage, 
+            update_time_range(start_time, end_time, flow, selected_spines, link_state, 
                               src_leaf, dst_leaf)
         
     bad_ranges.sort()
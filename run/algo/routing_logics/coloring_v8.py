@@ -1,4 +1,5 @@
 from algo.routing_logics.routing_util import update_time_range
+from algo.routing_logics.routing_util import get_max_edge_count, get_edge_count_bad_ranges
 from algo.routing_logics.coloring_util import color_bipartite_multigraph
 # from algo.routing_logics.routing_util import merge_overlapping_ranges
 # from algo.routing_logics.routing_util import find_value_in_range
@@ -10,7 +11,6 @@ from collections import defaultdict
 import sys 
 import hashlib
 import math
-import networkx as nx
 
 import time as timesleep 
 
@@ -125,6 +125,7 @@ def plot_rack_dependencies(hash_to_time_ranges,
                            traffic_pattern_to_dst_racks, 
                            plot_path):
     import matplotlib.pyplot as plt
+    import networkx as nx
 
     G = nx.Graph()
     hashes = list(hash_to_time_ranges.keys())
@@ -154,9 +155,10 @@ def plot_rack_dependencies(hash_to_time_ranges,
     plt.close()
 
 
-def route_flows_graph_coloring_v8(all_flows, rem, usage, num_spines, 
+def route_flows_graph_coloring_v8(all_flows, link_state, num_spines, 
                                   lb_decisions, run_context, max_subflow_count, link_bandwidth, 
-                                  suffix=1, highlighted_ranges=[], early_return=False): 
+                                  suffix=1, highlighted_ranges=[], early_return=False, 
+                                  routing_session=None): 
 
 
     # open a file to log the decisions.
@@ -188,53 +190,16 @@ def route_flows_graph_coloring_v8(all_flows, rem, usage, num_spines,
     # by the timing solver. Is this really needed?   
     ##############################    
     
-    flows_max_time = max([f["eff_end_time"] for f in all_flows])
-    edge_count_in = []
-    edge_count_out = []
     for f in all_flows:
-        start_time = f["eff_start_time"]
-        end_time = f["eff_end_time"]
-        
-        src_rack = f["srcrack"]
-        dst_rack = f["dstrack"]
-        
-        needed_subflows = int(math.ceil(f["max_load"] / subflow_capacity))    
-
-        min_affected_time = min(min_affected_time, start_time)  
-        max_affected_time = max(max_affected_time, end_time)
+        min_affected_time = min(min_affected_time, f["eff_start_time"])  
+        max_affected_time = max(max_affected_time, f["eff_end_time"])
+        rack_count = max(rack_count, f["srcrack"] + 1, f["dstrack"] + 1) 
 
-        rack_count = max(rack_count, src_rack + 1, dst_rack + 1) 
-           
-        while src_rack >= len(edge_count_in) or dst_rack >= len(edge_count_out):
-            edge_count_in.append([0] * (flows_max_time + 1))
-            edge_count_out.append([0] * (flows_max_time + 1))   
-        
-        for t in range(start_time, end_time + 1):
-            edge_count_in[dst_rack][t] += needed_subflows   
-            edge_count_out[src_rack][t] += needed_subflows  
-
-    max_edge_count = [0] * (flows_max_time + 1)
-    for r in range(len(edge_count_in)):
-        for t in range(flows_max_time):
-            max_edge_count[t] = max(max_edge_count[t], edge_count_in[r][t] / max_subflow_count)
-            max_edge_count[t] = max(max_edge_count[t], edge_count_out[r][t] / max_subflow_count)
+    max_edge_count = get_max_edge_count(all_flows, subflow_capacity, max_subflow_count)
             
     if early_return:
         # find all the ranges where the max_edge_count exceeds available_colors_max
-        bad_ranges = []
-        in_bad_range = False
-        range_start = None
-        for t in range(len(max_edge_count)):
-            if max_edge_count[t] > available_colors_max:
-                if not in_bad_range:
-                    in_bad_range = True
-                    range_start = t
-            else:
-                if in_bad_range:
-                    in_bad_range = False
-                    bad_ranges.append((range_start, t - 1)) 
-        if in_bad_range:
-            bad_ranges.append((range_start, len(max_edge_count) - 1))
+        bad_ranges = get_edge_count_bad_ranges(max_edge_count, available_colors_max)
         
         if len(bad_ranges) > 0: 
             return min_affected_time, max_affected_time, bad_ranges
@@ -413,7 +378,10 @@ def route_flows_graph_coloring_v8(all_flows, rem, usage, num_spines,
 
                         coloring_edges.append((f"{r}_l", f"{c}_r", (r, c, i)))
             
-            edge_color_map, max_degree = color_bipartite_multigraph(coloring_edges)            
+            if routing_session is not None:
+                edge_color_map, max_degree = routing_session.get_coloring(tuple(time_ranges), coloring_edges)
+            else: 
+                edge_color_map, max_degree = color_bipartite_multigraph(coloring_edges)            
             
             # pprint(edge_color_map, stream=sys.stderr)
             # input("above is the coloring. press enter to continue...")
@@ -461,7 +429,7 @@ def route_flows_graph_coloring_v8(all_flows, rem, usage, num_spines,
                 
         plot_time_ranges(hash_to_time_ranges, dict(merged_ranges_for_plot), 
                          needed_color_count, max_degrees, num_spines,
-                         highlighted_ranges, None, plot_path, max_edge_count, 
+                         highlighted_ranges, None, plot_path, max_edge_count.tolist(), 
                          plot_vertical_lines=False, height_multiplier=2)
         
     # input("above is the highest color used. press enter to continue...")
@@ -530,7 +498,7 @@ def route_flows_graph_coloring_v8(all_flows, rem, usage, num_spines,
         lb_decisions[(job_id, flow_id, iteration)] = selected_spines 
                 
         if run_context["plot-routing-assignment"]:
-            update_time_range(start_time, end_time, flow, selected_spines, rem, usage, 
+            update_time_range(start_time, end_time, flow, selected_spines, link_state, 
                               src_leaf, dst_leaf)
 
         
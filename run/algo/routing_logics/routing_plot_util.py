@@ -1,4 +1,3 @@
-import matplotlib.pyplot as plt
 import numpy as np  
 from collections import defaultdict 
 
@@ -8,11 +7,12 @@ from pprint import pprint
 import os
 import sys 
 
-import networkx as nx
-
+# matplotlib and networkx are imported in the functions, so the routing doesn't 
+# load them unless it's plotting.
 
 
 def get_color(job_id):  
+    import matplotlib.pyplot as plt
     return plt.cm.tab20.colors[job_id % 20] 
 
 def plot_link_usage(ax, time_range, 
@@ -46,6 +46,7 @@ def plot_link_usage(ax, time_range,
 def plot_routing(run_context, rem, usage, all_job_ids, num_leaves, 
                num_spines, routing_time, min_affected_time, 
                max_affected_time, plots_dir, smoothing_window=1, suffix=""): 
+    import matplotlib.pyplot as plt
     
     sys.stderr.write("plotting for smoothing window {} ...\n".format(smoothing_window)) 
     
@@ -155,6 +156,7 @@ def highlight_ranges(ax, ranges):
 def plot_time_ranges(ranges_dict, merged_ranges_dict, needed_color_count, max_degrees, 
                      available_colors_max, highlighted_ranges, hash_to_traffic_id, plot_path, max_edge_count=None, 
                      plot_vertical_lines=False, height_multiplier=1):
+    import matplotlib.pyplot as plt
     
     
     # two plots on top of each other with the height multiplier.
@@ -244,6 +246,9 @@ def plot_edge_coloring(edges, edge_color_map, plot_path):
     Plots a bipartite MultiGraph with potential parallel edges.
     Each pair of parallel edges is drawn with a different curvature (rad).
     """
+    import matplotlib.pyplot as plt
+    import networkx as nx
+    
     # Create a MultiGraph to keep parallel edges
     G = nx.MultiGraph()
     
@@ -1,37 +1,58 @@
 
-import matplotlib.pyplot as plt
 from collections import defaultdict
 
 from copy import deepcopy   
 
 import sys 
+import math
 
-def update_time_range(start_time, end_time, flow, selected_spines, rem, usage, src_leaf, dst_leaf): 
-    for t in range(start_time, end_time + 1):
+import numpy as np
+
+from utils.rle import rle_slice, rle_max, rle_runs, get_flow_progress_rle
+
+def get_flow_progress_range(flow, start_time, end_time):
+    # the dense progress of the flow for [start_time, end_time], in the shifted time. 
+    shift = flow["progress_shift"]
+    return rle_slice(get_flow_progress_rle(flow), start_time - shift, end_time - shift).tolist()
+
+
+def get_flow_progress_runs(flow, start_time, end_time):
+    # the runs of constant progress of the flow in [start_time, end_time], in the shifted time. 
+    shift = flow["progress_shift"]
+    runs = rle_runs(get_flow_progress_rle(flow), start_time - shift, end_time - shift)
+    return [(value, run_start + shift, run_end + shift) for value, run_start, run_end in runs]
+
+
+def update_time_range(start_time, end_time, flow, selected_spines, link_state, src_leaf, dst_leaf): 
+    # the progress is constant over each run, so each run is a single range update.
+    for value, run_start, run_end in get_flow_progress_runs(flow, start_time, end_time):
         for s, mult in selected_spines:
-            time_req = flow["progress_history"][t - flow["progress_shift"]] * mult
-            rem[src_leaf][s]["up"][t]   -= time_req
-            rem[dst_leaf][s]["down"][t] -= time_req    
-            
-            job_id = flow["job_id"]
-            usage[job_id][src_leaf][s]["up"][t] += time_req 
-            usage[job_id][dst_leaf][s]["down"][t] += time_req
+            time_req = value * mult
+            link_state.add_load(flow["job_id"], src_leaf, dst_leaf, s, run_start, run_end, time_req)
             
 
-def get_spine_availablity(flow, rem, num_spines, start_time, end_time, src_leaf, dst_leaf):
+def get_spine_availablity(flow, link_state, num_spines, start_time, end_time, src_leaf, dst_leaf):
+    # the smallest rem / progress over the flow, for every spine, capped at 1. over a run 
+    # of constant progress, that's the smallest rem divided by the progress, so each run 
+    # is one numpy min over the rem of all the spines. for windows like these the numpy 
+    # min is faster than an interval index, see bench-interval-index.py.
     spine_availablity = []  
+    rem = link_state.get_rem()
+    runs = [] 
+    for req, run_start, run_end in get_flow_progress_runs(flow, start_time, end_time):
+        up_rems = rem[src_leaf, :num_spines, 0, run_start:run_end + 1].min(axis=1).tolist()
+        down_rems = rem[dst_leaf, :num_spines, 1, run_start:run_end + 1].min(axis=1).tolist()
+        runs.append((req, up_rems, down_rems))
     
     for s in range(num_spines): 
         spine_min_max_availble_mult = 1.0   
         
-        for t in range(start_time, end_time + 1): 
-            up_req = flow["progress_history"][t - flow["progress_shift"]]
-            up_rem = rem[src_leaf][s]["up"][t] 
-            down_req = flow["progress_history"][t - flow["progress_shift"]]
-            down_rem = rem[dst_leaf][s]["down"][t]
+        for req, up_rems, down_rems in runs:
+            up_rem = up_rems[s]
+            down_rem = down_rems[s]
             
-            up_max_available_mult = min(1, up_rem / up_req)
-            down_max_available_mult = min(1, down_rem / down_req)   
+            up_max_available_mult = min(1, up_rem / req)
+            down_max_available_mult = min(1, down_rem / req)   
             this_time_max_available_mult = min(up_max_available_mult, down_max_available_mult)  
 
             spine_min_max_availble_mult = min(spine_min_max_availble_mult, this_time_max_available_mult)    
@@ -97,54 +118,151 @@ def find_value_in_range(d, value):
 
 
 
+def get_max_edge_count(all_flows, subflow_capacity, max_subflow_count):
+    # the edge count on the ingress and egress of each rack at each time point, the most 
+    # of them over all the racks, divided by max_subflow_count. the edge count is a lower 
+    # bound on the number of colors needed at that time. 
+    # each rack's count is a cumsum over a difference array of the flows that touch it. 
+    flows_max_time = max([f["eff_end_time"] for f in all_flows])
+    
+    start_times = np.array([f["eff_start_time"] for f in all_flows], dtype=np.int64)
+    end_times = np.array([f["eff_end_time"] for f in all_flows], dtype=np.int64)
+    needed_subflows = np.array([int(math.ceil(f["max_load"] / subflow_capacity)) for f in all_flows], 
+                               dtype=np.int64)
+    
+    active = start_times <= end_times
+    max_count = np.zeros(flows_max_time + 1, dtype=np.int64)
+    
+    for rack_key in ["dstrack", "srcrack"]:
+        racks = np.array([f[rack_key] for f in all_flows], dtype=np.int64)
+        order = np.argsort(racks, kind="stable")
+        order = order[active[order]]
+        rack_starts = np.flatnonzero(np.diff(racks[order])) + 1
+        
+        for rack_flows in np.split(order, rack_starts):
+            diff = np.zeros(flows_max_time + 2, dtype=np.int64)
+            np.add.at(diff, start_times[rack_flows], needed_subflows[rack_flows])
+            np.add.at(diff, end_times[rack_flows] + 1, -needed_subflows[rack_flows])
+            np.maximum(max_count, np.cumsum(diff[:-1]), out=max_count)
+    
+    max_edge_count = max_count / max_subflow_count
+    # the last time point was never counted. 
+    max_edge_count[flows_max_time] = 0
+    return max_edge_count
+
+
+def get_edge_count_bad_ranges(max_edge_count, available_colors_max):
+    # the runs of time where the max_edge_count exceeds available_colors_max, as inclusive ranges.
+    over = np.concatenate(([False], max_edge_count > available_colors_max, [False]))
+    changes = np.diff(over.astype(np.int8))
+    range_starts = np.flatnonzero(changes == 1)
+    range_ends = np.flatnonzero(changes == -1) - 1
+    return [(int(start), int(end)) for start, end in zip(range_starts, range_ends)]
+
+
 def get_all_flows(job_profiles, job_deltas, 
                   job_throttle_rates, job_periods, job_iterations):
     all_flows = [] 
     
     for job_id, job_profile in job_profiles.items():
-        shift = 0 
-            
-        for iter in range(job_iterations[job_id]):
-            shift += job_deltas[job_id][iter]
-            iter_throttle_rate = job_throttle_rates[job_id][iter]  
-    
-            for flow in job_profile[iter_throttle_rate]["flows"]: 
-                # f = deepcopy(flow)
-                f = flow.copy() 
-                                
-                f["eff_start_time"] = f["start_time"] + shift
-                f["eff_end_time"] = f["end_time"] + shift
-                f["progress_shift"] = shift 
-                f["iteration"] = iter  
-                
-                f["throttle_rate"] = iter_throttle_rate 
-                f["max_load"] = max(f["progress_history"])
-                
-                all_flows.append(f)  
-            
-            shift += job_periods[job_id][iter] 
+        all_flows.extend(get_job_flows(job_profile, job_deltas[job_id], job_throttle_rates[job_id], 
+                                       job_periods[job_id], job_iterations[job_id]))
 
     return all_flows
 
 
-def initialize_rem(num_leaves, num_spines, link_bandwidth, routing_time):
-    rem = []
-    for i in range(num_leaves):
-        rem.append([])
-        for j in range(num_spines):
-            rem[i].append({"up": [link_bandwidth] * routing_time, 
-                            "down": [link_bandwidth] * routing_time})
-    return rem
-
-def initialize_usage(all_job_ids, num_leaves, num_spines, routing_time):
-    usage = {}
-    for job in all_job_ids:
-        usage[job] = []
-        for i in range(num_leaves):
-            usage[job].append([])
-            for j in range(num_spines):
-                usage[job][i].append({"up": [0] * routing_time, 
-                                        "down": [0] * routing_time})
-    return usage
+def get_job_flows(job_profile, deltas, throttle_rates, periods, iterations):
+    # the flows of all the iterations of one job, shifted to their place in time. 
+    job_flows = [] 
+    shift = 0 
+        
+    for iter in range(iterations):
+        shift += deltas[iter]
+        iter_throttle_rate = throttle_rates[iter]  
+
+        for flow in job_profile[iter_throttle_rate]["flows"]: 
+            # f = deepcopy(flow)
+            f = flow.copy() 
+                            
+            f["eff_start_time"] = f["start_time"] + shift
+            f["eff_end_time"] = f["end_time"] + shift
+            f["progress_shift"] = shift 
+            f["iteration"] = iter  
+            
+            f["throttle_rate"] = iter_throttle_rate 
+            f["max_load"] = rle_max(get_flow_progress_rle(f))
             
-            
\ No newline at end of file
+            job_flows.append(f)  
+        
+        shift += periods[iter] 
+
+    return job_flows
+
+
+class LinkState():
+    # the remaining capacity of every leaf-spine link over [0, routing_time), and how much 
+    # of it each job uses. nothing is allocated until it's used: the coloring strategies 
+    # only touch it for the plots. the rem is one array for all the links, the usage is 
+    # kept per job and per link, only for the links that the job has used. 
+    
+    directions = ["up", "down"]
+    
+    def __init__(self, job_ids, num_leaves, num_spines, link_bandwidth, routing_time):
+        self.job_ids = list(job_ids) 
+        self.num_leaves = num_leaves
+        self.num_spines = num_spines
+        self.link_bandwidth = link_bandwidth
+        self.routing_time = routing_time
+        
+        self.rem = None 
+        self.usage = {job_id: {} for job_id in self.job_ids} 
+        
+    def get_rem(self):
+        if self.rem is None:
+            self.rem = np.full((self.num_leaves, self.num_spines, 2, self.routing_time), 
+                               float(self.link_bandwidth))
+        return self.rem
+    
+    def get_rem_signal(self, leaf, spine, direction):
+        return self.get_rem()[leaf, spine, self.directions.index(direction)]
+    
+    def get_usage_signal(self, job_id, leaf, spine, direction, allocate=False):
+        # the usage of the link by the job, zeros if the job never used it. 
+        key = (leaf, spine, direction)
+        job_usage = self.usage[job_id]
+        if key in job_usage:
+            return job_usage[key]
+        
+        signal = np.zeros(self.routing_time)
+        if allocate:
+            job_usage[key] = signal
+        return signal
+        
+    def add_load(self, job_id, src_leaf, dst_leaf, spine, start_time, end_time, load):
+        # the load goes up from src_leaf and down to dst_leaf over [start_time, end_time]. 
+        rem = self.get_rem()
+        rem[src_leaf, spine, 0, start_time:end_time + 1] -= load
+        rem[dst_leaf, spine, 1, start_time:end_time + 1] -= load
+        
+        self.get_usage_signal(job_id, src_leaf, spine, "up", allocate=True)[start_time:end_time + 1] += load
+        self.get_usage_signal(job_id, dst_leaf, spine, "down", allocate=True)[start_time:end_time + 1] += load
+        
+    def materialize(self):
+        # the rem and the usage as rem[leaf][spine][direction] and 
+        # usage[job_id][leaf][spine][direction], for the plots. 
+        rem = []
+        for i in range(self.num_leaves):
+            rem.append([])
+            for j in range(self.num_spines):
+                rem[i].append({direction: self.get_rem_signal(i, j, direction) 
+                               for direction in self.directions})
+        
+        usage = {} 
+        for job_id in self.job_ids:
+            usage[job_id] = [] 
+            for i in range(self.num_leaves):
+                usage[job_id].append([])
+                for j in range(self.num_spines):
+                    usage[job_id][i].append({direction: self.get_usage_signal(job_id, i, j, direction) 
+                                             for direction in self.directions})
+        return rem, usage
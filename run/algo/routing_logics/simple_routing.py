@@ -125,13 +125,13 @@ def route_flows_useall(num_spines):
     selected_spines = [(s, min_subflow_mult) for s in range(num_spines)]
     return selected_spines  
 
-def route_one_flow(flow, selection_strategy, rem, max_subflow_count, num_spines): 
+def route_one_flow(flow, selection_strategy, link_state, max_subflow_count, num_spines): 
     src_leaf = flow["srcrack"]
     dst_leaf = flow["dstrack"]
     start_time = flow["eff_start_time"] 
     end_time = flow["eff_end_time"]   
     
-    spine_availablity = get_spine_availablity(flow, rem, num_spines, 
+    spine_availablity = get_spine_availablity(flow, link_state, num_spines, 
                                               start_time, end_time, 
                                               src_leaf, dst_leaf)   
     selected_spines = []    
@@ -153,7 +153,7 @@ def route_one_flow(flow, selection_strategy, rem, max_subflow_count, num_spines)
 
 
 # based on some heuristic, we can route the flows one by one.
-def route_flows_one_by_one(all_flows, rem, usage, num_spines, 
+def route_flows_one_by_one(all_flows, link_state, num_spines, 
                            lb_decisions, run_context, max_subflow_count):
     
     strategy = run_context["routing-fit-strategy"]
@@ -172,7 +172,7 @@ def route_flows_one_by_one(all_flows, rem, usage, num_spines,
         flow_id = flow["flow_id"]
         iteration = flow["iteration"]
 
-        selected_spines = route_one_flow(flow, strategy, rem,
+        selected_spines = route_one_flow(flow, strategy, link_state,
                                          max_subflow_count, num_spines)
 
         lb_decisions[(job_id, flow_id, iteration)] = selected_spines 
@@ -181,7 +181,7 @@ def route_flows_one_by_one(all_flows, rem, usage, num_spines,
         max_affected_time = max(max_affected_time, end_time)
         
         update_time_range(start_time, end_time, flow, 
-                            selected_spines, rem, usage, 
+                            selected_spines, link_state, 
                             src_leaf, dst_leaf)       
         
     return min_affected_time, max_affected_time, [] 
@@ -7,16 +7,20 @@ import math
 import time 
 import sys 
 import copy 
-from algo.routing import route_flows
+from algo.routing import route_flows, RoutingSession
+from algo.routing_logics.coloring_util import coloring_cache
 import subprocess
+import threading
 import os 
 import pickle as pkl 
 import numpy as np 
 from utils.util import rage_quit
-import matplotlib.pyplot as plt
+from utils.hyperperiod import get_hyperperiod_window, get_periodic_schedule, get_window
+from utils.hyperperiod import get_max_hyperperiod, is_window_enough
 from datetime import datetime
+from collections import OrderedDict
 
-from algo.newtiming import LegoSolver, LegoV2Solver   
+from algo.newtiming import LegoSolver, LegoV2Solver, XCorrSolver, aggregate_link_loads   
 
 
 ####################################################################################
@@ -185,6 +189,31 @@ def evaluate_candidate(job_loads, deltas, throttle_rates, run_context,
         
     
 
+def get_job_signal(job_load, job_deltas, job_throttle_rates, start_iter, end_iter, max_length=None):
+    # the iterations [start_iter, end_iter) of the job back to back, each one after its delta.
+    # the signal is allocated once and filled in, instead of appending every iteration.
+    # with max_length, only the first max_length time steps are made.
+    iter_loads = [job_load["profiles"][job_throttle_rates[iter_id]]["load"]
+                  for iter_id in range(start_iter, end_iter)]
+    iter_deltas = job_deltas[start_iter:end_iter]
+
+    signal_length = sum(iter_deltas) + sum(len(iter_load) for iter_load in iter_loads)
+    if max_length is not None:
+        signal_length = min(signal_length, max_length)
+    job_signal = np.zeros(signal_length)
+
+    current_time = 0
+    for iter_delta, iter_load in zip(iter_deltas, iter_loads):
+        current_time += iter_delta
+        if current_time >= signal_length:
+            break
+        iter_length = min(len(iter_load), signal_length - current_time)
+        job_signal[current_time:current_time + iter_length] = iter_load[:iter_length]
+        current_time += len(iter_load)
+
+    return job_signal
+
+
 def get_full_jobs_signals(this_link_loads, deltas, throttle_rates, pref_iter_count=None):     
     repeated_job_loads = []
     
@@ -196,16 +225,8 @@ def get_full_jobs_signals(this_link_loads, deltas, throttle_rates, pref_iter_cou
         else: 
             job_iter_count = job_load["iter_count"]
         
-        job_total_load = np.zeros(0)
-        
-        for iter_id in range(job_iter_count):
-            iter_time_shift = deltas[job_id][iter_id]
-            iter_throttle_rate = throttle_rates[job_id][iter_id]
-            
-            this_job_load = job_load["profiles"][iter_throttle_rate]["load"] 
-            
-            job_total_load = np.append(job_total_load, np.zeros(iter_time_shift))
-            job_total_load = np.append(job_total_load, this_job_load)
+        job_total_load = get_job_signal(job_load, deltas[job_id], throttle_rates[job_id], 
+                                        0, job_iter_count)
             
         repeated_job_loads.append(job_total_load)
 
@@ -220,6 +241,42 @@ def get_full_jobs_signals(this_link_loads, deltas, throttle_rates, pref_iter_cou
     return padded_job_loads, max_length
 
 
+def get_job_schedule(job_load, deltas, throttle_rates):
+    job_id = job_load["job_id"]
+    job_iter_count = job_load["iter_count"]
+    
+    job_deltas = deltas[job_id][:job_iter_count]
+    job_throttle_rates = throttle_rates[job_id][:job_iter_count]
+    iter_lengths = [len(job_load["profiles"][throttle_rate]["load"]) for throttle_rate in job_throttle_rates]
+    
+    return job_deltas, job_throttle_rates, iter_lengths
+
+
+def get_full_signals_length(this_link_loads, deltas, throttle_rates):
+    # the max_length of get_full_jobs_signals, without making the signals.
+    max_length = 0
+    for job_load in this_link_loads:
+        job_deltas, _, iter_lengths = get_job_schedule(job_load, deltas, throttle_rates)
+        max_length = max(max_length, sum(job_deltas) + sum(iter_lengths))
+    return max_length
+
+
+def get_hyperperiod_jobs_signals(this_link_loads, deltas, throttle_rates, max_hyperperiod):
+    # the signals of get_full_jobs_signals over the hyperperiod window only, or None if there 
+    # is no such window. see utils/hyperperiod.py for when that's enough. 
+    job_schedules = [get_job_schedule(job_load, deltas, throttle_rates) for job_load in this_link_loads]
+    window = get_hyperperiod_window(job_schedules, max_hyperperiod)
+    if window is None:
+        return None
+    
+    window_job_loads = []
+    for job_load, (job_deltas, job_throttle_rates, iter_lengths) in zip(this_link_loads, job_schedules):
+        window_job_loads.append(get_job_signal(job_load, job_deltas, job_throttle_rates, 
+                                               0, len(job_deltas), max_length=window))
+    
+    return window_job_loads, window
+
+
 def evaluate_candidate_python(job_loads, deltas, throttle_rates, 
                               run_context, link_logical_bandwidth, 
                               compat_score_mode, eval_length):
@@ -228,7 +285,15 @@ def evaluate_candidate_python(job_loads, deltas, throttle_rates,
     
     sum_signal = np.zeros(sim_length, dtype=np.float64)
     
-    padded_job_loads, _ = get_full_jobs_signals(job_loads, deltas, throttle_rates) 
+    window_signals = None
+    if is_window_enough(compat_score_mode):
+        window_signals = get_hyperperiod_jobs_signals(job_loads, deltas, throttle_rates, 
+                                                      get_max_hyperperiod(run_context))
+    
+    if window_signals is not None:
+        padded_job_loads, _ = window_signals
+    else:
+        padded_job_loads, _ = get_full_jobs_signals(job_loads, deltas, throttle_rates) 
     job_loads_array = np.array(padded_job_loads)
     sum_signal = np.sum(job_loads_array, axis=0)
         
@@ -261,8 +326,178 @@ def evaluate_candidate_python(job_loads, deltas, throttle_rates,
         compat_score = (link_logical_bandwidth - max_util) / link_logical_bandwidth
 
     return compat_score
-    
-    
+
+
+def get_link_candidate_parts(job_loads, deltas, throttle_rates, starting_iterations, candidates, 
+                             max_hyperperiod, use_window):
+    # a candidate only changes the starting iteration of some of the jobs. so the signal of a
+    # job is the same prefix for every candidate, then the changed iteration and the fixed
+    # ones after it, shifted by the delta of the candidate. the shifted part only depends on
+    # the throttle rate, so it is made once per throttle rate and placed at different offsets.
+    candidate_count = len(candidates)
+    row_lengths = [0] * candidate_count
+    eval_lengths = [0] * candidate_count
+    row_schedules = [[] for candidate_id in range(candidate_count)]
+    job_costs = []
+    job_values = []
+
+    for job_load in job_loads:
+        job_id = job_load["job_id"]
+        job_deltas = deltas[job_id]
+        job_throttle_rates = throttle_rates[job_id]
+        start_iter = starting_iterations[job_id]
+
+        # everything about the job only depends on the value that the candidate picks.
+        value_stats = {}
+        candidate_values = []
+        for candidate_id, candidate in enumerate(candidates):
+            value = candidate.get(job_id)
+            if value not in value_stats:
+                if value is None:
+                    new_deltas = {job_id: job_deltas}
+                    new_throttle_rates = {job_id: job_throttle_rates}
+                else:
+                    new_deltas = {job_id: list(job_deltas)}
+                    new_throttle_rates = {job_id: list(job_throttle_rates)}
+                    new_deltas[job_id][start_iter] = value[0]
+                    new_throttle_rates[job_id][start_iter] = value[1]
+
+                job_schedule = get_job_schedule(job_load, new_deltas, new_throttle_rates)
+                value_stats[value] = (
+                    get_job_load_length(job_load, new_deltas, new_throttle_rates),
+                    get_solution_cost_job_load(job_load, new_deltas, new_throttle_rates),
+                    sum(job_schedule[0]) + sum(job_schedule[2]),
+                    get_periodic_schedule(*job_schedule) if use_window else None,
+                )
+
+            job_length, job_cost, signal_length, periodic_schedule = value_stats[value]
+            eval_lengths[candidate_id] = max(eval_lengths[candidate_id], job_length)
+            row_lengths[candidate_id] = max(row_lengths[candidate_id], signal_length)
+            row_schedules[candidate_id].append(periodic_schedule)
+            candidate_values.append(value)
+
+        job_costs.append([value_stats[value][1] for value in candidate_values])
+        job_values.append(candidate_values)
+
+    # the rows are only made up to the longest window, if every candidate has one.
+    width = max(row_lengths)
+    if use_window:
+        windows = [get_window(schedules, max_hyperperiod) for schedules in row_schedules]
+        if all(window is not None for window in windows):
+            width = max(windows)
+
+    job_parts = []
+    for job_load, candidate_values in zip(job_loads, job_values):
+        job_id = job_load["job_id"]
+        job_iter_count = job_load["iter_count"]
+        job_deltas = deltas[job_id]
+        job_throttle_rates = throttle_rates[job_id]
+        start_iter = starting_iterations[job_id]
+
+        if start_iter >= job_iter_count:
+            prefix = get_job_signal(job_load, job_deltas, job_throttle_rates, 0, job_iter_count, 
+                                    max_length=width)
+            job_parts.append((prefix, []))
+            continue
+
+        prefix = get_job_signal(job_load, job_deltas, job_throttle_rates, 0, start_iter, 
+                                max_length=width)
+
+        offsets_by_rate = {}
+        for candidate_id, value in enumerate(candidate_values):
+            if value is None:
+                value = (job_deltas[start_iter], job_throttle_rates[start_iter])
+            delta, throttle_rate = value
+            offsets_by_rate.setdefault(throttle_rate, ([], []))
+            offsets_by_rate[throttle_rate][0].append(candidate_id)
+            offsets_by_rate[throttle_rate][1].append(len(prefix) + delta)
+
+        shifted_parts = []
+        for throttle_rate, (candidate_ids, offsets) in offsets_by_rate.items():
+            undelayed_deltas = list(job_deltas)
+            undelayed_deltas[start_iter] = 0
+            rate_throttle_rates = list(job_throttle_rates)
+            rate_throttle_rates[start_iter] = throttle_rate
+            suffix = get_job_signal(job_load, undelayed_deltas, rate_throttle_rates,
+                                    start_iter, job_iter_count, 
+                                    max_length=max(0, width - min(offsets)))
+
+            shifted_parts.append((suffix, candidate_ids, offsets))
+
+        job_parts.append((prefix, shifted_parts))
+
+    return job_parts, width, row_lengths, eval_lengths, job_costs
+
+
+def evaluate_link_candidates(job_loads, deltas, throttle_rates, starting_iterations,
+                             candidates, link_logical_bandwidth, compat_score_mode,
+                             max_hyperperiod=0, max_batch_size=1 << 22):
+    # scores all the candidates of a link at once, with a candidates x time matrix of the sum
+    # signals. every candidate is a dict from job_id to the (delta, throttle_rate) of its
+    # starting iteration, the jobs that are not in it keep their current values.
+    # the jobs are added to the rows one by one, in the order of job_loads, so the rows get
+    # the same float additions as summing the full signals, and the scores are the same as
+    # the ones from evaluate_candidate. 
+    use_window = is_window_enough(compat_score_mode) and max_hyperperiod > 0
+    job_parts, width, row_lengths, eval_lengths, job_costs = get_link_candidate_parts(
+        job_loads, deltas, throttle_rates, starting_iterations, candidates, 
+        max_hyperperiod, use_window)
+
+    candidate_count = len(candidates)
+    batch_rows = max(1, max_batch_size // max(width, 1))
+    scores = []
+
+    for batch_start in range(0, candidate_count, batch_rows):
+        batch_end = min(batch_start + batch_rows, candidate_count)
+        sum_signals = np.zeros((batch_end - batch_start, width), dtype=np.float64)
+
+        for prefix, shifted_parts in job_parts:
+            sum_signals[:, :len(prefix)] += prefix
+            # a slice per row is much faster than one fancy indexed add over all of them.
+            for suffix, candidate_ids, offsets in shifted_parts:
+                for candidate_id, offset in zip(candidate_ids, offsets):
+                    if batch_start <= candidate_id < batch_end and offset < width:
+                        part_length = min(len(suffix), width - offset)
+                        sum_signals[candidate_id - batch_start, offset:offset + part_length] += suffix[:part_length]
+
+        max_utils = np.max(sum_signals, axis=1)
+        first_overload_indices = np.argmax(sum_signals > link_logical_bandwidth, axis=1)
+        # the padding after the end of a row is zero, which is never over the capacity.
+        under_cap_counts = np.sum(sum_signals <= link_logical_bandwidth, axis=1)
+
+        for row in range(batch_end - batch_start):
+            candidate_id = batch_start + row
+            max_util = max_utils[row]
+
+            compat_score = 0
+            if compat_score_mode == "under-cap":
+                row_length = row_lengths[candidate_id]
+                under_cap_count = under_cap_counts[row] - (width - row_length)
+                compat_score = np.float64(under_cap_count) / row_length
+
+            elif compat_score_mode == "time-no-coll":
+                if max_util <= link_logical_bandwidth:
+                    compat_score = 1.0
+                else:
+                    compat_score = first_overload_indices[row] / eval_lengths[candidate_id]
+
+                solution_cost = 0
+                for job_load, costs in zip(job_loads, job_costs):
+                    job_length = job_load["profiles"][1.0]["period"] * job_load["iter_count"]
+                    solution_cost += (costs[candidate_id] / job_length)
+
+                solution_cost = solution_cost / len(job_loads)
+
+                compat_score = compat_score - solution_cost
+
+            elif compat_score_mode == "max-util-left":
+                compat_score = (link_logical_bandwidth - max_util) / link_logical_bandwidth
+
+            scores.append(compat_score)
+
+    return scores
+
+
 def solve_for_link(job_loads, link_logical_bandwidth, run_context, 
                    compat_score_mode, starting_iterations, 
                    current_deltas, current_throttle_rates, 
@@ -272,18 +507,14 @@ def solve_for_link(job_loads, link_logical_bandwidth, run_context,
     ls_rand_quantum = run_context["cassini-parameters"]["link-solution-random-quantum"]
     ls_top_candidates = run_context["cassini-parameters"]["link-solution-top-candidates"]    
     
+    # nothing is changed in place, so the current decisions can be returned as they are.
     if len(job_loads) == 0: # or len(job_loads) == 1:
-        same_deltas = copy.deepcopy(current_deltas)
-        same_throttle_rates = copy.deepcopy(current_throttle_rates)
-        return (same_deltas, same_throttle_rates)
+        return (current_deltas, current_throttle_rates)
         
-    solution_scores = [] 
+    candidates = [] 
     involved_jobs = set([job["job_id"] for job in job_loads])
     
     for candidate_id in range(ls_candidates):
-        new_deltas = copy.deepcopy(current_deltas) 
-        new_throttle_rates = copy.deepcopy(current_throttle_rates)  
-        
         # find a bunch of random deltas. 
         random_deltas = [] 
         random_throttle_rates = [] 
@@ -336,43 +567,47 @@ def solve_for_link(job_loads, link_logical_bandwidth, run_context,
                 number_of_fixed_decisions += 1
                 iter = starting_iterations[job_id]
         
-                if iter < len(new_deltas[job_id]):
+                if iter < len(current_deltas[job_id]):
                     set_value_for_job_in_decisions(random_deltas, job_id, 
-                                                   new_deltas[job_id][iter])
+                                                   current_deltas[job_id][iter])
                     
                     set_value_for_job_in_decisions(random_throttle_rates, job_id, 
-                                                   new_throttle_rates[job_id][iter])
+                                                   current_throttle_rates[job_id][iter])
                     
         if number_of_fixed_decisions == len(involved_jobs):
-            same_deltas = copy.deepcopy(current_deltas)
-            same_throttle_rates = copy.deepcopy(current_throttle_rates) 
-            return (same_deltas, same_throttle_rates) # no need to evaluate this.
+            return (current_deltas, current_throttle_rates) # no need to evaluate this.
         
+        # the candidate only keeps the starting iteration of each job, the rest of the 
+        # decisions are shared with the current ones.
+        candidate = {} 
+        random_throttle_rates = dict(random_throttle_rates)
         for job_id, delta in random_deltas:
             iter = starting_iterations[job_id]
-            if iter < len(new_deltas[job_id]):
-                new_deltas[job_id][iter] = delta
+            if iter < len(current_deltas[job_id]):
+                candidate[job_id] = (delta, random_throttle_rates[job_id])
         
-        for job_id, throttle_rate in random_throttle_rates: 
-            iter = starting_iterations[job_id]
-            if iter < len(new_throttle_rates[job_id]):
-                new_throttle_rates[job_id][iter] = throttle_rate
-        
-        compat_score = evaluate_candidate(job_loads, new_deltas, new_throttle_rates, 
-                                          run_context, link_logical_bandwidth, 
-                                          compat_score_mode)
-        
-        # print("new_deltas: ", new_deltas, "compat_score: ", compat_score, file=sys.stderr)
+        candidates.append(candidate)
 
-        # print("new_deltas: ", new_deltas, "compat_score: ", compat_score)   
-        solution_scores.append((new_deltas, new_throttle_rates, compat_score))
+    scores = evaluate_link_candidates(job_loads, current_deltas, current_throttle_rates, 
+                                      starting_iterations, candidates, 
+                                      link_logical_bandwidth, compat_score_mode, 
+                                      max_hyperperiod=get_max_hyperperiod(run_context))
 
-    good_solutions = sorted(solution_scores, key=lambda x: x[2], reverse=True)
-    top_candidates = good_solutions[:ls_top_candidates]
+    good_candidates = sorted(range(len(candidates)), key=lambda x: scores[x], reverse=True)
+    top_candidates = good_candidates[:ls_top_candidates]
     r = random.randint(0, len(top_candidates) - 1)
-    top_solution = top_candidates[r]
+    top_candidate = candidates[top_candidates[r]]
+    
+    new_deltas = dict(current_deltas)
+    new_throttle_rates = dict(current_throttle_rates)
+    for job_id, (delta, throttle_rate) in top_candidate.items():
+        iter = starting_iterations[job_id]
+        new_deltas[job_id] = list(current_deltas[job_id])
+        new_deltas[job_id][iter] = delta
+        new_throttle_rates[job_id] = list(current_throttle_rates[job_id])
+        new_throttle_rates[job_id][iter] = throttle_rate
     
-    return top_solution[0], top_solution[1]
+    return new_deltas, new_throttle_rates
 
 
 
@@ -386,89 +621,11 @@ def get_link_loads(jobs, options, run_context, job_profiles):
     rack_count = options["machine-count"] // servers_per_rack   
     link_bandwidth = options["link-bandwidth"]  
     
-    link_loads = [] 
-    cross_rack_jobs_set = set() 
-    cross_rack_jobs = []    
+    job_entries = [(job["job_id"], job["iter_count"], job_profiles.get(job["job_id"])) 
+                   for job in jobs]
     
-    def add_signal_to_sum(signal, sum_signal):
-        for i in range(len(signal)):
-            if i >= len(sum_signal):
-                sum_signal.append(0)
-            sum_signal[i] += signal[i]
-            
-    for i in range(rack_count):
-        this_rack = {"up": [], "down": []}
-        link_loads.append(this_rack)
-
-        for dir in ["up", "down"]:
-            
-            for job in jobs:
-                job_id = job["job_id"]
-                throttled_job_profiles = {}
-                any_flow_added = False
-                
-                for throttle_factor in run_context["profiled-throttle-factors"]:
-                    if job_id not in job_profiles:
-                        continue    
-                    
-                    job_profile = job_profiles[job_id][throttle_factor]
-                    if len(job_profile["flows"]) == 0:
-                        continue 
-
-                    job_period = job_profile["period"]  
-                    # for flow in job_profile["flows"]:   
-                    #     for i in range(len(flow["progress_history"])):
-                    #         flow["progress_history"][i] /= link_bandwidth
-                    
-                    # this job will add some load to each of the links. 
-                    # all the flows for this job will be added up. 
-                    link_job_load_combined = [] 
-                    
-                    for flow in job_profile["flows"]:
-                        flow_src_rack = flow["srcrack"]
-                        flow_dst_rack = flow["dstrack"]
-                        
-                        flow_progress_history = flow["progress_history"].copy()    
-                        
-                        for t in range(len(flow_progress_history)): 
-                            flow_progress_history[t] /= link_bandwidth
-
-                        # print flow start and end and src and dst 
-                        if ((dir == "up" and flow_src_rack == i) or 
-                            (dir == "down" and flow_dst_rack == i)):    
-                            
-                            any_flow_added = True 
-                            if len(link_job_load_combined) > 0:
-                                assert len(link_job_load_combined) == len(flow_progress_history)
-                                
-                            # this is a flow that goes through this link
-                            add_signal_to_sum(flow_progress_history,
-                                              link_job_load_combined)
-                            
-                    if any_flow_added:
-                        throttled_job_profiles[throttle_factor] = {
-                            "load": link_job_load_combined, 
-                            "period": job_period,
-                            "max": max(link_job_load_combined),
-                        }
-                    else:                         
-                        # if there were no flows for this throttle factor, 
-                        # there won't be any flows for the other throttle factors.
-                        # so we can break out of the loop.
-                        break 
-                    
-                if any_flow_added:
-                    cross_rack_jobs_set.add(job_id)
-                    
-                    link_loads[i][dir].append({
-                        "link_id": i * 2 + (1 if dir == "up" else 0),   
-                        "job_id": job_id,
-                        "iter_count": job["iter_count"],  
-                        "profiles": throttled_job_profiles
-                    })
-    
-    cross_rack_jobs = list(cross_rack_jobs_set) 
-    return link_loads, cross_rack_jobs
+    return aggregate_link_loads(job_entries, rack_count, link_bandwidth, 
+                                run_context["profiled-throttle-factors"])
 
 ####################################################################################################
 ####################################################################################################
@@ -695,6 +852,7 @@ def visualize_link_loads_runtime(link_loads, run_context,
 ####################################################################################################
     
 def get_job_color(job_id): 
+    import matplotlib.pyplot as plt
     return plt.cm.tab20.colors[job_id % 20] 
 
     
@@ -826,7 +984,13 @@ def get_good_until(jobs, link_loads_list, run_context,
         if len(link_load) == 0:
             continue
           
-        padded_job_loads, max_length = get_full_jobs_signals(link_load, deltas, throttle_rates)
+        window_signals = get_hyperperiod_jobs_signals(link_load, deltas, throttle_rates, 
+                                                      get_max_hyperperiod(run_context))
+        if window_signals is not None:
+            padded_job_loads, _ = window_signals
+            max_length = get_full_signals_length(link_load, deltas, throttle_rates)
+        else:
+            padded_job_loads, max_length = get_full_jobs_signals(link_load, deltas, throttle_rates)
         max_length_across_links = max(max_length_across_links, max_length)
         # Convert the padded job loads to a 2D array
         job_loads_array = np.array(padded_job_loads)
@@ -1037,8 +1201,9 @@ def get_timeshifts(jobs, options, run_context, job_profiles,
                 if starting_iterations[job_id] == job["iter_count"]:
                     resolved_deltas_set.add(job_id)
         
-        current_deltas = copy.deepcopy(base_deltas)
-        current_throttle_rates = copy.deepcopy(base_throttle_rates)   
+        # solve_for_link doesn't change the lists in place, copying them once is enough.
+        current_deltas = {job_id: list(d) for job_id, d in base_deltas.items()}
+        current_throttle_rates = {job_id: list(t) for job_id, t in base_throttle_rates.items()}   
 
         # shuffle the link_solutions. No real difference beetwen the links.
         random.shuffle(link_loads_list)
@@ -1125,6 +1290,34 @@ def get_timeshifts(jobs, options, run_context, job_profiles,
         
     return job_timings, best_candidate_good_until  
 
+# the bytes of the profile files that were already read, by (path, mtime, size). the long-lived 
+# timing workers see the same profiles again and again. they are unpickled for every call, so 
+# the callers never share the objects.
+profile_file_cache = OrderedDict() 
+profile_file_cache_size = 4096 
+profile_file_cache_lock = threading.Lock()
+
+
+def read_profile_file(path): 
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    
+    with profile_file_cache_lock: 
+        if key in profile_file_cache: 
+            profile_file_cache.move_to_end(key)
+            return profile_file_cache[key]
+        
+    with open(path, "rb") as f:  
+        data = f.read()
+        
+    with profile_file_cache_lock: 
+        profile_file_cache[key] = data
+        while len(profile_file_cache) > profile_file_cache_size:
+            profile_file_cache.popitem(last=False)
+            
+    return data
+    
+
 def load_job_profiles(jobs, run_context): 
     job_profiles = {} 
     
@@ -1141,8 +1334,7 @@ def load_job_profiles(jobs, run_context):
                 job_profiles[job_id][throttle_factor] = None
                 continue 
                     
-            with open(path, "rb") as f:  
-                job_profiles[job_id][throttle_factor] = pkl.load(f)
+            job_profiles[job_id][throttle_factor] = pkl.loads(read_profile_file(path))
     
     return job_profiles
         
@@ -1263,6 +1455,14 @@ def farid_timing_v2(jobs, options, run_context, timing_scheme, job_profiles):
     return job_timings
 
 
+def xcorr_timing(jobs, options, run_context, timing_scheme, job_profiles):
+    
+    solver = XCorrSolver(jobs, run_context, options, job_profiles, timing_scheme)
+    job_timings, solution = solver.solve()
+    
+    return job_timings
+
+
 # doing the timing and routing together.    
 # general idea is to do the timing first, then do the routing.
 # the check which time_ranges are problematic in the routing process
@@ -1352,13 +1552,15 @@ def faridv3_scheduling(jobs, options, run_context, job_profiles):
 
 
     solver = LegoSolver(jobs, run_context, options, job_profiles, timing_scheme)
+    routing_session = RoutingSession()
     current_round = 0
     # step 1: do the timing first.
     job_timings, solution = solver.solve()
     lb_decisions, new_bad_ranges = route_flows(jobs, options, run_context, 
                                                    job_profiles, job_timings, 
                                                    current_round, highlighted_ranges=[], 
-                                                   early_return=False)
+                                                   early_return=False, 
+                                                   session=routing_session)
     
     log_bad_ranges(run_context, current_round, new_bad_ranges, [])
 
@@ -1388,7 +1590,8 @@ def faridv3_scheduling(jobs, options, run_context, job_profiles):
                                                    job_profiles, job_timings, 
                                                    current_round, 
                                                    highlighted_ranges=prev_bad_ranges, 
-                                                   early_return=early_return)   
+                                                   early_return=early_return, 
+                                                   session=routing_session)
 
         log_bad_ranges(run_context, current_round, new_bad_ranges, prev_bad_ranges)
             
@@ -1400,12 +1603,27 @@ def faridv3_scheduling(jobs, options, run_context, job_profiles):
        
        
 
+def add_solver_stats(add_to_context, solver):
+    # the stats of the timing solver, summed over all the rounds. 
+    for key, value in solver.solve_stats.items():
+        context_key = f"timing_solver_{key}"
+        add_to_context[context_key] = add_to_context.get(context_key, 0) + value
+
+
+def add_routing_stats(add_to_context, routing_session):
+    # the reuse counters of the routing session, summed over all the rounds. 
+    for key, value in routing_session.stats.items():
+        context_key = f"routing_session_{key}"
+        add_to_context[context_key] = add_to_context.get(context_key, 0) + value
+
+
 def faridv4_scheduling(jobs, options, run_context, job_profiles):
     # the only supported mode for now 
     timing_scheme = run_context["timing-scheme"]
     assert timing_scheme == "faridv4" 
 
     solver = LegoV2Solver(jobs, run_context, options, job_profiles, timing_scheme)
+    routing_session = RoutingSession()
     current_round = 0
     add_to_context = {
         "fixing_rounds": 0
@@ -1415,10 +1633,13 @@ def faridv4_scheduling(jobs, options, run_context, job_profiles):
     log_progress(run_context, "starting vanilla timing")    
     
     job_timings, solution = solver.solve()
+    add_solver_stats(add_to_context, solver)
     lb_decisions, new_bad_ranges = route_flows(jobs, options, run_context, 
                                                job_profiles, job_timings, 
                                                suffix=current_round, 
-                                               highlighted_ranges=[])
+                                               highlighted_ranges=[], 
+                                               session=routing_session)
+    add_routing_stats(add_to_context, routing_session)
     
     log_bad_ranges(run_context, "1.0_vanilla", new_bad_ranges, [])
 
@@ -1445,11 +1666,14 @@ def faridv4_scheduling(jobs, options, run_context, job_profiles):
             log_progress(run_context, "starting timing fix, round {}".format(current_round))    
             
             job_timings, solution = solver.solve_with_bad_ranges_and_inflation(prev_bad_ranges, inflate)
+            add_solver_stats(add_to_context, solver)
             # step 2.2: do the routing again.
             lb_decisions, new_bad_ranges = route_flows(jobs, options, run_context, 
                                                        job_profiles, job_timings, 
                                                        suffix=f"{inflate}_{current_round}", 
-                                                       highlighted_ranges=prev_bad_ranges)   
+                                                       highlighted_ranges=prev_bad_ranges, 
+                                                       session=routing_session)
+            add_routing_stats(add_to_context, routing_session)
 
             log_bad_ranges(run_context, f"inflation_{inflate}_round_{current_round}", 
                            new_bad_ranges, prev_bad_ranges)
@@ -1480,7 +1704,9 @@ def faridv4_scheduling(jobs, options, run_context, job_profiles):
                                                 suffix=current_round, 
                                                 highlighted_ranges=[], 
                                                 early_return=False, 
-                                                override_routing_strategy="graph-coloring-v3")
+                                                override_routing_strategy="graph-coloring-v3", 
+                                                session=routing_session)
+    add_routing_stats(add_to_context, routing_session)
     
     add_to_context["fixing_rounds"] += 1000
     return job_timings, lb_decisions, add_to_context
@@ -1508,6 +1734,7 @@ def faridv5_scheduling(jobs, options, run_context, job_profiles):
 
 
     solver = LegoV2Solver(jobs, run_context, options, job_profiles, timing_scheme)
+    routing_session = RoutingSession()
 
     # step 1: do the vanilla timing first.
     log_progress(run_context, "starting vanilla timing")    
@@ -1518,11 +1745,14 @@ def faridv5_scheduling(jobs, options, run_context, job_profiles):
     early_return = should_early_return(current_round, max_attempts)
         
     job_timings, solution = solver.solve()
+    add_solver_stats(add_to_context, solver)
     lb_decisions, new_bad_ranges = route_flows(jobs, options, run_context, 
                                                job_profiles, job_timings, 
                                                suffix=current_round, 
                                                highlighted_ranges=[], 
-                                               early_return=early_return)
+                                               early_return=early_return, 
+                                               session=routing_session)
+    add_routing_stats(add_to_context, routing_session)
 
     log_bad_ranges(run_context, "1.0_vanilla", new_bad_ranges, [])
     bad_range_ratio = get_bad_range_ratio(new_bad_ranges, [], run_context["sim-length"])
@@ -1550,6 +1780,7 @@ def faridv5_scheduling(jobs, options, run_context, job_profiles):
         log_progress(run_context, "starting timing fix, round {}".format(current_round))    
         
         job_timings, solution = solver.solve_with_bad_ranges_and_inflation(prev_bad_ranges, 1)
+        add_solver_stats(add_to_context, solver)
         # step 2.2: do the routing again.
         
         early_return = should_early_return(current_round, max_attempts)
@@ -1557,7 +1788,9 @@ def faridv5_scheduling(jobs, options, run_context, job_profiles):
         lb_decisions, new_bad_ranges = route_flows(jobs, options, run_context, 
                                                     job_profiles, job_timings, 
                                                     suffix=f"1_{current_round}", 
-                                                    highlighted_ranges=prev_bad_ranges)   
+                                                    highlighted_ranges=prev_bad_ranges, 
+                                                    session=routing_session)
+        add_routing_stats(add_to_context, routing_session)
 
         log_bad_ranges(run_context, f"inflation_1_round_{current_round}", 
                         new_bad_ranges, prev_bad_ranges)
@@ -1611,6 +1844,7 @@ def faridv6_scheduling(jobs, options, run_context, job_profiles):
     is_inflation_enabled = run_context.get("use_inflation", False)
     
     solver = LegoV2Solver(jobs, run_context, options, job_profiles, timing_scheme)
+    routing_session = RoutingSession()
 
 
     # step 1: do the vanilla timing first.
@@ -1622,6 +1856,7 @@ def faridv6_scheduling(jobs, options, run_context, job_profiles):
     early_return = should_early_return(current_round, max_attempts)
         
     job_timings, solution = solver.solve()
+    add_solver_stats(add_to_context, solver)
     
     if run_context["plot-intermediate-timing"]: 
         visualize_workload_timing(jobs, options, run_context, job_timings, job_profiles, 
@@ -1632,7 +1867,9 @@ def faridv6_scheduling(jobs, options, run_context, job_profiles):
                                                      job_profiles, job_timings, 
                                                      suffix=current_round, 
                                                      highlighted_ranges=[], 
-                                                     early_return=early_return)
+                                                     early_return=early_return, 
+                                                     session=routing_session)
+    add_routing_stats(add_to_context, routing_session)
 
     remaining_bad_ranges = summarize_bad_ranges(remaining_bad_ranges)
 
@@ -1680,6 +1917,7 @@ def faridv6_scheduling(jobs, options, run_context, job_profiles):
         log_progress(run_context, "starting timing fix, round {}".format(current_round))    
 
         job_timings, solution = solver.solve_with_bad_ranges_and_inflation(fixed_bad_ranges, inflate_factor)
+        add_solver_stats(add_to_context, solver)
         # step 2.2: do the routing again.
         
         if run_context["plot-intermediate-timing"]: 
@@ -1692,7 +1930,9 @@ def faridv6_scheduling(jobs, options, run_context, job_profiles):
         lb_decisions, remaining_bad_ranges = route_flows(jobs, options, run_context,
                                                          job_profiles, job_timings,
                                                          suffix=f"{inflate_factor}_{current_round}",
-                                                         highlighted_ranges=fixed_bad_ranges)
+                                                         highlighted_ranges=fixed_bad_ranges, 
+                                                         session=routing_session)
+        add_routing_stats(add_to_context, routing_session)
 
         remaining_bad_ranges = summarize_bad_ranges(remaining_bad_ranges)
 
@@ -1726,7 +1966,9 @@ def faridv6_scheduling(jobs, options, run_context, job_profiles):
                                                          suffix=current_round, 
                                                          highlighted_ranges=[], 
                                                          early_return=False, 
-                                                         override_routing_strategy="graph-coloring-v3")
+                                                         override_routing_strategy="graph-coloring-v3", 
+                                                         session=routing_session)
+        add_routing_stats(add_to_context, routing_session)
         
         remaining_bad_range_ratio, fixed_bad_range_ratio = get_bad_range_ratio_v6(remaining_bad_ranges, [],
                                                                                   run_context["sim-length"])
@@ -1761,6 +2003,7 @@ def get_job_timings(jobs, options, run_context, job_profiles, ):
         "cassini": cassini_timing, 
         "farid": farid_timing, 
         "faridv2": farid_timing_v2, 
+        "xcorr": xcorr_timing, 
     }
     
     if timing_scheme.split("_")[0] not in timing_funcions:
@@ -1815,6 +2058,12 @@ def generate_timing_file(timing_file_path, routing_file_path, placement_seed,
     
     add_to_context = {}
     
+    # the colorings can be shared with the other runs through a file.  
+    coloring_cache_path = run_context.get("coloring-cache-path", None)
+    if coloring_cache_path is not None:
+        coloring_cache.load(coloring_cache_path)
+    coloring_cache_stats = coloring_cache.get_stats()
+    
     if timing_scheme == "faridv3":
         job_timings, lb_decisions = faridv3_scheduling(jobs, options, 
                                                        run_context, job_profiles)
@@ -1839,6 +2088,10 @@ def generate_timing_file(timing_file_path, routing_file_path, placement_seed,
         lb_decisions = get_job_routings(jobs, options, run_context, 
                                         job_profiles, job_timings)   
             
+    add_to_context.update(coloring_cache.get_stats(since=coloring_cache_stats))
+    if coloring_cache_path is not None:
+        coloring_cache.save(coloring_cache_path)
+            
     if run_context["plot-final-timing"]: 
         visualize_workload_timing(jobs, options, run_context, job_timings, 
                                   job_profiles, None, mode="final") 
@@ -0,0 +1,96 @@
+import sys
+import time
+import random
+
+from algo.routing_logics.coloring_util import color_bipartite_multigraph_helper
+from algo.routing_logics.coloring_util import color_bipartite_multigraph_konig
+
+# compares the exact edge coloring against the old matching-per-color helper, on the
+# rack traffic of synthetic ring jobs, with every flow split into subflows as in coloring_v7.
+# usage: python bench-edge-coloring.py [rack counts ...]
+
+racks_per_job = 8
+max_subflows = 4
+repeats = 3
+
+
+def make_edges(rack_count):
+    # every job is a ring over some random racks, in both directions.
+    # each hop needs a random number of subflows.
+    random.seed(rack_count)
+    edges = []
+    subflow_counter = 0
+
+    for job in range(rack_count // racks_per_job * 2):
+        racks = random.sample(range(rack_count), racks_per_job)
+        for i in range(racks_per_job):
+            for src, dst in [(racks[i], racks[(i + 1) % racks_per_job]),
+                             (racks[(i + 1) % racks_per_job], racks[i])]:
+                for subflow in range(random.randint(1, max_subflows)):
+                    subflow_counter += 1
+                    edges.append((f"{src}_l", f"{dst}_r", subflow_counter))
+
+    return edges
+
+
+def color_with_retries(edges):
+    # the previous color_bipartite_multigraph, kept here as the reference.
+    edge_color_map, max_degree = color_bipartite_multigraph_helper(edges)
+    colors_used_count = len(set(edge_color_map.values()))
+
+    round = 1
+    while colors_used_count > max_degree and round < 10:
+        edge_color_map, max_degree = color_bipartite_multigraph_helper(edges)
+        colors_used_count = len(set(edge_color_map.values()))
+        round += 1
+
+    return edge_color_map, max_degree
+
+
+def check_coloring(edges, edge_color_map):
+    seen = set()
+    for i, (u, v, _) in enumerate(edges):
+        color = edge_color_map[i + 1]
+        if (u, color) in seen or (v, color) in seen:
+            return False
+        seen.add((u, color))
+        seen.add((v, color))
+    return True
+
+
+def time_function(func, *args):
+    best = None
+    for r in range(repeats):
+        s = time.time()
+        result = func(*args)
+        elapsed = time.time() - s
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        rack_counts = [int(arg) for arg in sys.argv[1:]]
+    else:
+        rack_counts = [64, 256, 1024]
+
+    print("{:>8} {:>8} {:>6} {:>12} {:>8} {:>12} {:>8} {:>10}".format(
+        "racks", "edges", "degree", "helper (s)", "colors", "konig (s)", "colors", "speedup"))
+
+    for rack_count in rack_counts:
+        edges = make_edges(rack_count)
+
+        konig_time, (konig_map, max_degree) = time_function(color_bipartite_multigraph_konig, edges)
+        if not check_coloring(edges, konig_map):
+            print("invalid coloring for {} racks".format(rack_count))
+            sys.exit(1)
+        konig_colors = len(set(konig_map.values()))
+
+        random.seed(rack_count)
+        helper_time, (helper_map, _) = time_function(color_with_retries, edges)
+        helper_colors = len(set(helper_map.values()))
+
+        print("{:>8} {:>8} {:>6} {:>12.3f} {:>8} {:>12.3f} {:>8} {:>9.1f}x".format(
+            rack_count, len(edges), max_degree, helper_time, helper_colors,
+            konig_time, konig_colors, helper_time / konig_time))
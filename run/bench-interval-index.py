@@ -0,0 +1,111 @@
+import sys
+import time
+import random
+
+import numpy as np
+
+from utils.interval_index import IntervalIndex, tolerance
+
+# compares IntervalIndex against numpy scans over a plain array, on the two ways it's used:
+# - lego: find the earliest fit of a window, then take its load off the rem (LegoSolver).
+# - routing: the min of the rem over a few runs, then take the load off them (simple routing).
+# usage: python bench-interval-index.py [series lengths ...]
+
+capacity = 100.0
+window_fraction = 0.02
+lego_steps = 500
+routing_steps = 4000
+runs_per_flow = 4
+repeats = 3
+
+
+class NumpyScan():
+    def __init__(self, values):
+        self.values = np.array(values, dtype=float)
+        self.length = len(values)
+
+    def add(self, start, end, value):
+        self.values[start:end] += value
+
+    def range_min(self, start, end):
+        return self.values[start:end].min()
+
+    def find_earliest_fit(self, start, end, threshold):
+        delay = 0
+        while True:
+            below = np.flatnonzero(self.values[start + delay:end + delay] < threshold - tolerance)
+            if len(below) == 0:
+                return delay
+            delay += int(below[0]) + 1
+
+
+def run_lego(index_class, length, seed):
+    rng = random.Random(seed)
+    window = max(1, int(length * window_fraction))
+    # a free tail as long as a window, so that every window fits somewhere.
+    rem = index_class([capacity] * length + [float("inf")] * window)
+    delays = []
+
+    for step in range(lego_steps):
+        start = rng.randrange(0, length // 2)
+        end = start + rng.randint(1, window)
+        load = rng.choice([5.0, 10.0, 20.0])
+        delay = rem.find_earliest_fit(start, end, load)
+        rem.add(start + delay, end + delay, -load)
+        delays.append(delay)
+
+    return delays
+
+
+def run_routing(index_class, length, seed):
+    rng = random.Random(seed)
+    rem = index_class([capacity] * length)
+    window = max(1, int(length * window_fraction))
+    mins = []
+
+    for step in range(routing_steps):
+        start = rng.randrange(0, length - window)
+        bounds = sorted(rng.sample(range(start + 1, start + window + 1), runs_per_flow))
+        runs = list(zip([start] + bounds[:-1], bounds))
+        mins.append(min(rem.range_min(run_start, run_end) for run_start, run_end in runs))
+        for run_start, run_end in runs:
+            rem.add(run_start, run_end, -rng.choice([0.5, 1.0, 2.5]))
+
+    return mins
+
+
+def time_function(function, *args):
+    best = None
+    for r in range(repeats):
+        start = time.time()
+        result = function(*args)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        lengths = [int(arg) for arg in sys.argv[1:]]
+    else:
+        lengths = [2000, 20000]
+
+    print("{:>8} {:>8} {:>12} {:>12} {:>10}".format(
+        "workload", "length", "numpy (s)", "index (s)", "speedup"))
+
+    for workload, function in [("lego", run_lego), ("routing", run_routing)]:
+        for length in lengths:
+            numpy_time, numpy_result = time_function(function, NumpyScan, length, length)
+            index_time, index_result = time_function(function, IntervalIndex, length, length)
+
+            # the values can differ by a few ulps, the answers shouldn't.
+            if workload == "lego" and numpy_result != index_result:
+                print("delays differ for {} at length {}".format(workload, length))
+                sys.exit(1)
+            if workload == "routing" and not np.allclose(numpy_result, index_result, rtol=0, atol=1e-6):
+                print("mins differ for {} at length {}".format(workload, length))
+                sys.exit(1)
+
+            print("{:>8} {:>8} {:>12.3f} {:>12.3f} {:>9.1f}x".format(
+                workload, length, numpy_time, index_time, numpy_time / index_time))
@@ -0,0 +1,138 @@
+import sys
+import time
+import json
+
+import numpy as np
+
+from algo.newtiming import aggregate_link_loads
+from utils.rle import rle_expand, get_flow_progress_rle
+from utils.synthetic_jobs import make_ring_profile, make_ring_workload
+
+# compares the per-link load aggregation against the old loop over
+# racks x directions x jobs x throttle factors x flows, on synthetic ring jobs.
+# usage: python bench-link-loads.py [machine counts ...]
+
+servers_per_rack = 8
+job_size = 16
+layer_count = 4
+history_length = 4000
+link_bandwidth = 100
+throttle_factors = [1.0, 0.5]
+repeats = 3
+
+
+def make_profiles(job_id, machines, rng):
+    # every layer sends one flow along each edge of the ring, forward and backward, including
+    # the edges inside a rack. the histories are kept run-length encoded, as they come out of
+    # the profiling.
+    return {tf: make_ring_profile(job_id, machines, servers_per_rack, link_bandwidth * tf,
+                                  int(200 / tf), 100, layer_count=layer_count * 2,
+                                  history_length=history_length, skip_intra_rack=False)
+            for tf in throttle_factors}
+
+
+def make_workload(machine_count):
+    jobs, job_profiles, _ = make_ring_workload(machine_count, job_size, 10, servers_per_rack,
+                                               link_bandwidth, make_profiles, machine_count)
+    return [(job["job_id"], job["iter_count"], job_profiles[job["job_id"]]) for job in jobs]
+
+
+def get_link_loads_loop(job_entries, rack_count, link_bandwidth, throttle_factors):
+    # the previous implementation, kept here as the reference.
+    link_loads = []
+    cross_rack_jobs_set = set()
+
+    for i in range(rack_count):
+        this_rack = {"up": [], "down": []}
+        link_loads.append(this_rack)
+
+        for dir in ["up", "down"]:
+            for job_id, iter_count, profiles in job_entries:
+                throttled_job_profiles = {}
+                any_flow_added = False
+
+                for throttle_factor in throttle_factors:
+                    if profiles is None:
+                        continue
+
+                    job_profile = profiles[throttle_factor]
+                    if len(job_profile["flows"]) == 0:
+                        continue
+
+                    link_job_load_combined = np.zeros(0)
+
+                    for flow in job_profile["flows"]:
+                        if ((dir == "up" and flow["srcrack"] == i) or
+                            (dir == "down" and flow["dstrack"] == i)):
+                            any_flow_added = True
+                            flow_progress_history = rle_expand(get_flow_progress_rle(flow)) / link_bandwidth
+
+                            if len(link_job_load_combined) == 0:
+                                link_job_load_combined = flow_progress_history
+                            else:
+                                link_job_load_combined = link_job_load_combined + flow_progress_history
+
+                    link_job_load_combined = link_job_load_combined.tolist()
+
+                    if any_flow_added:
+                        throttled_job_profiles[throttle_factor] = {
+                            "load": link_job_load_combined,
+                            "period": job_profile["period"],
+                            "max": max(link_job_load_combined),
+                        }
+                    else:
+                        break
+
+                if any_flow_added:
+                    cross_rack_jobs_set.add(job_id)
+                    link_loads[i][dir].append({
+                        "link_id": i * 2 + (1 if dir == "up" else 0),
+                        "job_id": job_id,
+                        "iter_count": iter_count,
+                        "profiles": throttled_job_profiles
+                    })
+
+    return link_loads, list(cross_rack_jobs_set)
+
+
+def time_function(func, *args):
+    best = None
+    for r in range(repeats):
+        s = time.time()
+        result = func(*args)
+        elapsed = time.time() - s
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        machine_counts = [int(arg) for arg in sys.argv[1:]]
+    else:
+        machine_counts = [48, 256, 1024]
+
+    print("{:>10} {:>6} {:>8} {:>12} {:>12} {:>10}".format(
+        "machines", "jobs", "flows", "loop (s)", "numpy (s)", "speedup"))
+
+    for machine_count in machine_counts:
+        rack_count = machine_count // servers_per_rack
+        job_entries = make_workload(machine_count)
+        flow_count = sum(len(profiles[tf]["flows"])
+                         for _, _, profiles in job_entries for tf in throttle_factors)
+
+        loop_time, loop_result = time_function(get_link_loads_loop, job_entries, rack_count,
+                                               link_bandwidth, throttle_factors)
+        numpy_time, numpy_result = time_function(aggregate_link_loads, job_entries, rack_count,
+                                                 link_bandwidth, throttle_factors)
+
+        # the two should agree exactly, not just approximately.
+        loop_dump = json.dumps([loop_result[0], sorted(loop_result[1])], sort_keys=True)
+        numpy_dump = json.dumps([numpy_result[0], sorted(numpy_result[1])], sort_keys=True)
+        if loop_dump != numpy_dump:
+            print("results differ for {} machines".format(machine_count))
+            sys.exit(1)
+
+        print("{:>10} {:>6} {:>8} {:>12.3f} {:>12.3f} {:>9.1f}x".format(
+            machine_count, len(job_entries), flow_count,
+            loop_time, numpy_time, loop_time / numpy_time))
@@ -0,0 +1,84 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+
+from utils.synthetic_jobs import make_ring_profile, make_ring_workload, make_timing_task
+
+# measures how long "python -m algo.timing" takes to start: the import of the scheduling
+# modules, and a whole small task through stdin and stdout, the way calc_timing used to run it.
+# it also lists the plotting and graph libraries that got loaded without any plot-* option,
+# there should be none.
+# usage: python bench-timing-startup.py [repeats]
+
+servers_per_rack = 4
+machine_count = 16
+job_size = 4
+iter_count = 5
+link_bandwidth = 100
+plotting_modules = ["matplotlib", "seaborn", "networkx"]
+
+
+def make_profiles(job_id, machines, rng):
+    flow_time = rng.choice([50, 100])
+    idle_time = rng.choice([100, 200])
+    return {1.0: make_ring_profile(job_id, machines, servers_per_rack, link_bandwidth * 0.9,
+                                   flow_time, idle_time, full_history=True)}
+
+
+def make_task(work_dir):
+    # a few ring jobs with the zero timing, so the task itself is short.
+    jobs, job_profiles, options = make_ring_workload(machine_count, job_size, iter_count,
+                                                     servers_per_rack, link_bandwidth,
+                                                     make_profiles, 0)
+    options["lb-scheme"] = "random"
+    return make_timing_task(work_dir, jobs, job_profiles, options, {})
+
+
+def run_python(args, input_data=None):
+    env = os.environ.copy()
+    env["PYTHONHASHSEED"] = "12345"
+
+    s = time.time()
+    process = subprocess.run([sys.executable] + args, input=input_data, env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    elapsed = time.time() - s
+
+    if process.returncode != 0:
+        print(process.stderr.decode("utf-8"))
+        sys.exit(1)
+
+    return elapsed, process.stdout
+
+
+def get_loaded_plotting_modules():
+    check = "import sys, algo.timing; print(' '.join(m for m in {} if m in sys.modules))".format(
+        plotting_modules)
+    _, stdout = run_python(["-c", check])
+    return stdout.decode("utf-8").split()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        repeats = int(sys.argv[1])
+    else:
+        repeats = 5
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        task_data = json.dumps(make_task(work_dir)).encode("utf-8")
+
+        bare_times = [run_python(["-c", "pass"])[0] for r in range(repeats)]
+        import_times = [run_python(["-c", "import algo.timing"])[0] for r in range(repeats)]
+        task_times = [run_python(["-m", "algo.timing"], task_data)[0] for r in range(repeats)]
+
+    print("{:>24} {:>10} {:>10}".format("", "min (s)", "median (s)"))
+    for label, times in [("python startup", bare_times),
+                         ("import algo.timing", import_times),
+                         ("first task", task_times)]:
+        times.sort()
+        print("{:>24} {:>10.3f} {:>10.3f}".format(label, times[0], times[len(times) // 2]))
+
+    loaded = get_loaded_plotting_modules()
+    print("plotting modules loaded: {}".format(", ".join(loaded) if len(loaded) > 0 else "none"))
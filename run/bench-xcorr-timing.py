@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+import random
+import contextlib
+
+import numpy as np
+
+from algo.timing import get_job_timings, get_link_loads, get_full_jobs_signals
+from algo.timing import get_bad_range_ratio
+from algo.routing import get_routing_lower_bound_bad_ranges
+from utils.synthetic_jobs import make_ring_profile, make_ring_workload
+
+# compares the xcorr timing against cassini on synthetic ring jobs with different periods,
+# for the solve time, the share of time that some rack link is over its capacity, and the
+# bad range ratio of the routing lower bound.
+# usage: python bench-xcorr-timing.py [machine counts ...]
+
+servers_per_rack = 4
+job_size = 8
+iter_count = 10
+link_bandwidth = 100
+core_count = 2
+throttle_factors = [1.0]
+cassini_parameters = {
+    "link-solution-candidate-count": 100,
+    "link-solution-random-quantum": 10,
+    "link-solution-top-candidates": 3,
+    "overall-solution-candidate-count": 10,
+}
+
+
+def make_profiles(job_id, machines, rng):
+    # every layer sends one flow along each edge of the ring, then the job computes for a while.
+    layer_count = rng.randint(1, 3)
+    flow_time = rng.choice([50, 100])
+    idle_time = rng.choice([100, 200, 300])
+    return {1.0: make_ring_profile(job_id, machines, servers_per_rack, link_bandwidth * 0.9,
+                                   flow_time, idle_time, layer_count=layer_count)}
+
+
+def make_workload(machine_count):
+    return make_ring_workload(machine_count, job_size, iter_count, servers_per_rack,
+                              link_bandwidth, make_profiles, machine_count, core_count)
+
+
+def get_overload_ratio(jobs, options, run_context, job_profiles, job_timings):
+    link_loads, _ = get_link_loads(jobs, options, run_context, job_profiles)
+    capacity = options["ft-core-count"] * options["ft-agg-core-link-capacity-mult"]
+    deltas = {job_timing["job_id"]: job_timing["deltas"] for job_timing in job_timings}
+    throttle_rates = {job_timing["job_id"]: job_timing["throttle_rates"] for job_timing in job_timings}
+
+    overloaded = np.zeros(0, dtype=bool)
+    for rack_loads in link_loads:
+        for direction in ["up", "down"]:
+            if len(rack_loads[direction]) == 0:
+                continue
+            signals, length = get_full_jobs_signals(rack_loads[direction], deltas, throttle_rates)
+            link_overloaded = np.sum(signals, axis=0) > capacity
+            if length > len(overloaded):
+                overloaded = np.pad(overloaded, (0, length - len(overloaded)))
+            overloaded[:length] |= link_overloaded
+
+    return np.mean(overloaded)
+
+
+def run_timing(jobs, options, job_profiles, timing_scheme):
+    run_context = {
+        "timing-scheme": timing_scheme,
+        "compat-score-mode": "time-no-coll",
+        "profiled-throttle-factors": throttle_factors,
+        "throttle-search": False,
+        "cassini-parameters": cassini_parameters,
+        "plot-intermediate-timing": False,
+        "plot-link-empty-times": False,
+        "output-file": "/dev/null",
+    }
+
+    random.seed(0)
+    s = time.time()
+    # cassini logs its results on stderr.
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+        job_timings = get_job_timings(jobs, options, run_context, job_profiles)
+    elapsed = time.time() - s
+
+    overload_ratio = get_overload_ratio(jobs, options, run_context, job_profiles, job_timings)
+
+    bad_ranges = get_routing_lower_bound_bad_ranges(jobs, options, job_profiles, job_timings)
+    sim_length = max(sum(job_timing["deltas"]) + iter_count * job["base_period"]
+                     for job, job_timing in zip(jobs, job_timings))
+    bad_range_ratio = get_bad_range_ratio(bad_ranges, [], sim_length)
+
+    return elapsed, overload_ratio, bad_range_ratio
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        machine_counts = [int(arg) for arg in sys.argv[1:]]
+    else:
+        machine_counts = [32, 64, 128]
+
+    print("{:>10} {:>6} {:>8} {:>12} {:>10} {:>10}".format(
+        "machines", "jobs", "scheme", "solve (s)", "overload", "bad range"))
+
+    for machine_count in machine_counts:
+        jobs, job_profiles, options = make_workload(machine_count)
+
+        for timing_scheme in ["zero", "cassini", "xcorr"]:
+            elapsed, overload_ratio, bad_range_ratio = run_timing(jobs, options, job_profiles,
+                                                                  timing_scheme)
+            print("{:>10} {:>6} {:>8} {:>12.3f} {:>10.3f} {:>10.3f}".format(
+                machine_count, len(jobs), timing_scheme, elapsed, overload_ratio, bad_range_ratio))
@@ -0,0 +1,84 @@
+import sys
+import json
+import tempfile
+
+from utils.timing_pool import TimingWorkerPool
+from utils.synthetic_jobs import make_ring_profile, make_ring_workload, make_timing_task
+
+# checks that a timing worker gives a task the same output no matter what it ran before:
+# the same routed task goes to a fresh worker, and to workers that first ran different
+# tasks (other jobs, other routing strategies), and the outputs are compared.
+# usage: python check-timing-pool.py [routing strategies ...]
+
+servers_per_rack = 4
+machine_count = 32
+job_size = 8
+iter_count = 4
+link_bandwidth = 100
+
+
+def make_profiles(job_id, machines, rng):
+    flow_time = rng.choice([50, 100])
+    idle_time = rng.choice([100, 200])
+    return {1.0: make_ring_profile(job_id, machines, servers_per_rack, link_bandwidth * 0.9,
+                                   flow_time, idle_time, full_history=True)}
+
+
+def make_task(work_dir, seed, fit_strategy):
+    # ring jobs on shuffled machines, with the zero timing and the routing of fit_strategy.
+    jobs, job_profiles, options = make_ring_workload(machine_count, job_size, iter_count,
+                                                     servers_per_rack, link_bandwidth,
+                                                     make_profiles, seed)
+    options["lb-scheme"] = "readprotocol"
+    options["subflows"] = 2
+
+    task_dir = tempfile.mkdtemp(dir=work_dir)
+    run_context = {
+        "routing-fit-strategy": fit_strategy,
+        "experiment-seed": seed,
+        "output-file": f"{task_dir}/output.txt",
+    }
+    return make_timing_task(task_dir, jobs, job_profiles, options, run_context, placement_seed=seed)
+
+
+def run_after(earlier_tasks, task):
+    # the output of task on a fresh worker that ran the earlier tasks first.
+    pool = TimingWorkerPool(len(earlier_tasks) + 1, 1)
+    try:
+        for earlier_task in earlier_tasks + [task]:
+            output, log = pool.run_task(earlier_task)
+            if output is None:
+                print(log)
+                sys.exit(1)
+    finally:
+        pool.close()
+
+    return json.dumps(output, sort_keys=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        fit_strategies = sys.argv[1:]
+    else:
+        fit_strategies = ["graph-coloring-v5", "graph-coloring-v7", "graph-coloring-v8", "best"]
+
+    different = 0
+    with tempfile.TemporaryDirectory() as work_dir:
+        for fit_strategy in fit_strategies:
+            task = make_task(work_dir, 1, fit_strategy)
+            alone = run_after([], task)
+
+            histories = [
+                [make_task(work_dir, 2, fit_strategy)],
+                [make_task(work_dir, seed, other) for seed in [3, 4] for other in fit_strategies],
+                [task, make_task(work_dir, 5, fit_strategy)],
+            ]
+
+            for earlier_tasks in histories:
+                same = run_after(earlier_tasks, task) == alone
+                if not same:
+                    different += 1
+                print("{:>20} after {:>2} tasks: {}".format(
+                    fit_strategy, len(earlier_tasks), "same" if same else "DIFFERENT"))
+
+    sys.exit(1 if different > 0 else 0)
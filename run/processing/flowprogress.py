@@ -1,17 +1,31 @@
 import re
+import os
 import sys 
-import matplotlib.pyplot as plt
 from pprint import pprint 
 import json 
+import numpy as np 
+from utils.rle import rle_encode
 
 CORES = 0
 JOBS = 0
 RACKS = 0 
 
-def parse_line(line, limit_flow_label=None):
-    
+def update_flow_dims(flow_info):
+    # the number of cores, jobs and racks seen so far, for the plots.
     global CORES, JOBS, RACKS
     
+    if flow_info["core"] + 1 > CORES:
+        CORES = flow_info["core"] + 1 
+    if flow_info["job_id"] > JOBS:
+        JOBS = flow_info["job_id"]
+    if flow_info["dstrack"] + 1 > RACKS:
+        RACKS = flow_info["dstrack"] + 1
+    if flow_info["srcrack"] + 1 > RACKS:
+        RACKS = flow_info["srcrack"] + 1
+
+
+def parse_line(line, limit_flow_label=None):
+    
     s = line.split("[warning]")
     if len(s) == 2: 
         critical_info = s[1].strip()
@@ -70,14 +84,7 @@ def parse_line(line, limit_flow_label=None):
                 "flow_size": sum(progress_history)
             }
             
-            if core + 1 > CORES:
-                CORES = core + 1 
-            if job_id > JOBS:
-                JOBS = job_id
-            if dstrack + 1 > RACKS:
-                RACKS = dstrack + 1
-            if srcrack + 1 > RACKS:
-                RACKS = srcrack + 1
+            update_flow_dims(flow_info)
                 
             assert len(progress_history) == fct, f"Expected progress history length to be {fct}, got {len(progress_history)}"
 
@@ -101,51 +108,237 @@ def parse_flow_progress(file_path, limit_flow_label):
     core_flows_incoming = {} 
     core_flows_outgoing = {}
     
-    with open(file_path, 'r') as file:
-        for line in file:
-            # print("line: ", line)   
-            
-            flow_info = parse_line(line, limit_flow_label)
-            if flow_info is None:
-                continue
-            
-            m = None 
-            if flow_info["dir"] == "outgoing": 
-                m = core_flows_outgoing
-            else:
-                m = core_flows_incoming
-            
-            if flow_info["core"] not in m:
-                m[flow_info["core"]] = []
-                
-            m[flow_info["core"]].append(flow_info)
+    for flow_info in read_flow_infos(file_path, limit_flow_label):
+        update_flow_dims(flow_info)
+        
+        m = None 
+        if flow_info["dir"] == "outgoing": 
+            m = core_flows_outgoing
+        else:
+            m = core_flows_incoming
+        
+        if flow_info["core"] not in m:
+            m[flow_info["core"]] = []
             
-            if flow_info["start_time"] < min_time:
-                min_time = flow_info["start_time"]
-            if flow_info["end_time"] > max_time:
-                max_time = flow_info["end_time"]
+        m[flow_info["core"]].append(flow_info)
+        
+        if flow_info["start_time"] < min_time:
+            min_time = flow_info["start_time"]
+        if flow_info["end_time"] > max_time:
+            max_time = flow_info["end_time"]
             
     return core_flows_incoming, core_flows_outgoing, min_time, max_time
  
 def get_summarized_progress(progress_history):  
     # summarize the progress into tuples, each with a value and the number of times that value appears consecutively
-    summarized_progress = []
-    prev = progress_history[0]
-    count = 1
+    return rle_encode(progress_history)
 
-    for i in range(1, len(progress_history)):
-        if progress_history[i] == prev:
-            count += 1
-        else:
-            summarized_progress.append((prev, count))
-            prev = progress_history[i]
-            count = 1
-            
-    summarized_progress.append((prev, count))
+def read_flow_infos(file_path, limit_flow_label=None):
+    # the flows of a flow info file, flow-info.bin or flow-info.txt, as flow dicts. 
+    if file_path.endswith(".bin"):
+        flow_infos = [] 
+        for block in read_flow_info_blocks(file_path):
+            flow_infos.extend(get_block_flow_infos(block, limit_flow_label))
+        return flow_infos
     
-    return summarized_progress
+    flow_infos = [] 
+    with open(file_path, 'r') as file:
+        for line in file:
+            flow_info = parse_line(line, limit_flow_label)
+            if flow_info is not None:
+                flow_infos.append(flow_info)
+    return flow_infos
+
 
 def get_job_profiles(file_path, json_output_path=None, limit_flow_label=None, only_summary=False):
+    return collect_job_profiles(read_flow_infos(file_path, limit_flow_label), only_summary)
+
+
+def parse_batch_profile_header(line): 
+    # [04:55:33.914] [critical] profile: jobid: 2 throttle: 0.5 psim time: 520
+    pattern = re.compile(r'\[.*\] \[critical\] profile: jobid: (\d+) throttle: (\S+) psim time: (\d+)')
+    match = pattern.match(line)
+    
+    if match is not None:
+        return int(match.group(1)), float(match.group(2)), int(match.group(3))
+    
+    return None 
+
+
+def get_batch_job_profiles(file_path, limit_flow_label=None, only_summary=False):
+    # the output of a batch profiling run (profiles.txt or profiles.bin) has one section per 
+    # (job id, throttle factor) pair, in the order they were given to psim. 
+    batch_profiles = [] 
+
+    if file_path.endswith(".bin"):
+        # in the binary format, each section is a block with its own header.  
+        for block in read_flow_info_blocks(file_path):
+            flow_infos = get_block_flow_infos(block, limit_flow_label)
+            job_profiles, _, _ = collect_job_profiles(flow_infos, only_summary)
+            batch_profiles.append({
+                "job_id": block["isolate_job_id"],
+                "throttle_factor": block["throttle_factor"],
+                "psim_time": round(block["psim_time"]),
+                "job_profiles": job_profiles,
+            })
+        return batch_profiles
+    
+    # in the text format, each section starts with a "profile:" header line. 
+    sections = [] 
+    
+    with open(file_path, 'r') as file:
+        for line in file:
+            header = parse_batch_profile_header(line)
+            if header is not None:
+                sections.append((header, []))
+            elif len(sections) > 0:
+                sections[-1][1].append(line)
+    
+    for (job_id, throttle_factor, psim_time), lines in sections:
+        job_profiles, _, _ = get_job_profiles_from_lines(lines, limit_flow_label, only_summary)
+        batch_profiles.append({
+            "job_id": job_id,
+            "throttle_factor": throttle_factor,
+            "psim_time": psim_time,
+            "job_profiles": job_profiles,
+        })
+        
+    return batch_profiles
+    
+
+# the binary flow info format, written by PSim::log_flow_info_binary. 
+# a sequence of blocks: header, flow records, labels, progress histories.
+flow_info_magic = b"PSIMFLW1"
+
+flow_info_header_dtype = np.dtype([
+    ("magic", "S8"),
+    ("flow_count", "<i8"),
+    ("history_length", "<i8"),
+    ("labels_length", "<i8"),
+    ("isolate_job_id", "<i8"),
+    ("throttle_factor", "<f8"),
+    ("psim_time", "<f8"),
+    ("step_size", "<f8"),
+])
+
+flow_info_record_dtype = np.dtype([
+    ("flow_id", "<i8"),
+    ("job_id", "<i8"),
+    ("iteration", "<i8"),
+    ("subflow", "<i8"),
+    ("srcrack", "<i8"),
+    ("dstrack", "<i8"),
+    ("core", "<i8"),
+    ("history_offset", "<i8"),
+    ("history_length", "<i8"),
+    ("label_offset", "<i8"),
+    ("label_length", "<i8"),
+    ("start_time", "<f8"),
+    ("end_time", "<f8"),
+    ("fct", "<f8"),
+])
+
+
+def read_flow_info_blocks(file_path):
+    # memory maps the file, nothing is copied until the flows are actually used.
+    if os.path.getsize(file_path) == 0:
+        return [] 
+    
+    data = np.memmap(file_path, dtype=np.uint8, mode="r")
+    
+    blocks = [] 
+    offset = 0 
+    while offset < len(data):
+        header = np.frombuffer(data, dtype=flow_info_header_dtype, count=1, offset=offset)[0]
+        assert header["magic"] == flow_info_magic, f"Expected magic {flow_info_magic}, got {header['magic']}"
+        offset += flow_info_header_dtype.itemsize
+        
+        flow_count = int(header["flow_count"]) 
+        records = np.frombuffer(data, dtype=flow_info_record_dtype, count=flow_count, offset=offset)
+        offset += flow_count * flow_info_record_dtype.itemsize
+        
+        labels_length = int(header["labels_length"])
+        labels = data[offset:offset + labels_length].tobytes()
+        offset += labels_length
+        
+        history_length = int(header["history_length"])
+        history = np.frombuffer(data, dtype="<f8", count=history_length, offset=offset)
+        offset += history_length * 8 
+        
+        blocks.append({
+            "isolate_job_id": int(header["isolate_job_id"]),
+            "throttle_factor": float(header["throttle_factor"]),
+            "psim_time": float(header["psim_time"]),
+            "step_size": float(header["step_size"]),
+            "records": records,
+            "labels": labels,
+            "history": history,
+        })
+        
+    return blocks 
+
+
+def get_block_flow_infos(block, limit_flow_label=None):
+    # same flow dicts as parse_line would make from the text format, except that the 
+    # progress history stays a numpy view into the file, it's only made a list if needed.
+    records = block["records"]
+    history = block["history"]
+    labels = block["labels"]
+    stepsize = block["step_size"]
+    
+    start_times = np.round(records["start_time"] / stepsize).astype(int).tolist()
+    end_times = np.round(records["end_time"] / stepsize).astype(int).tolist()
+    fcts = np.round(records["fct"] / stepsize).astype(int).tolist()
+    
+    flow_infos = [] 
+    for i, record in enumerate(records.tolist()):
+        (flow_id, job_id, iteration, subflow, srcrack, dstrack, core, 
+         history_offset, history_length, label_offset, label_length, _, _, _) = record
+        
+        label = labels[label_offset:label_offset + label_length].decode()
+        if limit_flow_label is not None and limit_flow_label not in label:
+            continue
+        
+        progress_history = history[history_offset:history_offset + history_length]
+        
+        # summed left to right, like sum() on the list.
+        flow_size = float(np.cumsum(progress_history)[-1]) if history_length > 0 else 0
+        
+        assert history_length == fcts[i], f"Expected progress history length to be {fcts[i]}, got {history_length}"
+        
+        flow_infos.append({
+            "flow_id": flow_id,
+            "job_id": job_id,
+            "iteration": iteration,
+            "subflow": subflow,
+            "start_time": start_times[i],
+            "end_time": end_times[i],
+            "srcrack": srcrack,
+            "dstrack": dstrack,
+            "dir": "outgoing" if srcrack == 0 else "incoming",
+            "fct": fcts[i],
+            "core": core,
+            "label": label, 
+            "progress_history": progress_history, 
+            "flow_size": flow_size,
+        })
+        
+    return flow_infos 
+
+
+def get_job_profiles_from_lines(lines, limit_flow_label=None, only_summary=False):
+    flow_infos = [] 
+    for line in lines:
+        # print("line: ", line)   
+        flow_info = parse_line(line, limit_flow_label)
+        if flow_info is None:
+            continue
+        flow_infos.append(flow_info)
+        
+    return collect_job_profiles(flow_infos, only_summary)
+
+
+def collect_job_profiles(flow_infos, only_summary=False):
     min_time = 1e9 
     max_time = 0
     
@@ -156,25 +349,19 @@ def get_job_profiles(file_path, json_output_path=None, limit_flow_label=None, on
     # the label of the flow, and the progress history of the flow.
     job_profiles = {}
     
-    with open(file_path, 'r') as file:
-        for line in file:
-            # print("line: ", line)   
-            flow_info = parse_line(line, limit_flow_label)
-            if flow_info is None:
-                continue
-            
-            if flow_info["job_id"] not in job_profiles:
-                job_profiles[flow_info["job_id"]] = {
-                    "period": 0, 
-                    "flows": [] 
-                }
-                
-            job_profiles[flow_info["job_id"]]["flows"].append(flow_info)
+    for flow_info in flow_infos:
+        if flow_info["job_id"] not in job_profiles:
+            job_profiles[flow_info["job_id"]] = {
+                "period": 0, 
+                "flows": [] 
+            }
             
-            if flow_info["start_time"] < min_time:
-                min_time = flow_info["start_time"]
-            if flow_info["end_time"] > max_time:
-                max_time = flow_info["end_time"]
+        job_profiles[flow_info["job_id"]]["flows"].append(flow_info)
+        
+        if flow_info["start_time"] < min_time:
+            min_time = flow_info["start_time"]
+        if flow_info["end_time"] > max_time:
+            max_time = flow_info["end_time"]
 
     expected_len = max_time + 1  
     
@@ -185,9 +372,13 @@ def get_job_profiles(file_path, json_output_path=None, limit_flow_label=None, on
     for job_id, job in job_profiles.items():
         for flow in job["flows"]:
             if only_summary is False:
+                progress_history = flow["progress_history"]
+                if isinstance(progress_history, np.ndarray):
+                    progress_history = progress_history.tolist()
+                    
                 leading_zeros = [0] * (flow["start_time"])
                 tailing_zeros = [0] * (max_time - flow["end_time"])
-                flow["progress_history"] = leading_zeros + flow["progress_history"] + tailing_zeros
+                flow["progress_history"] = leading_zeros + progress_history + tailing_zeros
                 flow["progress_history_summarized"] = get_summarized_progress(flow["progress_history"])
                 assert len(flow["progress_history"]) == expected_len, f"Expected length: {expected_len}, got {len(flow['progress_history'])}"
 
@@ -219,6 +410,7 @@ def get_color(min_time, max_time, time, jobid):
         
     
 def main(file_path, limit_flow_label=None):
+    import matplotlib.pyplot as plt
     import seaborn as sns 
     
     
@@ -347,7 +539,7 @@ def main(file_path, limit_flow_label=None):
     
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        path = "/tmp2/workers/worker-0/run-1/flow-info.txt"
+        path = "/tmp2/workers/worker-0/run-1/flow-info.bin"
         print("using the default path: ", path)    
     else:
         path = sys.argv[1]
@@ -3,6 +3,8 @@ import sys
 import matplotlib.pyplot as plt
 from pprint import pprint 
 import json 
+import numpy as np 
+from processing.flowprogress import read_flow_infos
 
 CORES = 0
 JOBS = 0
@@ -10,91 +12,6 @@ RACKS = 0
 
 target_time = 700 
 
-def parse_line(line, limit_flow_label=None):
-    
-    global CORES, JOBS, RACKS
-    
-    s = line.split("[warning]")
-    if len(s) == 2: 
-        critical_info = s[1].strip()
-        if critical_info.startswith("flow:"):
-            
-            # [00:22:33.725] [warning] flow: 161 jobid: 1 srcrack: 1 dstrack: 0 start: 2100 end: 2149 fct: 50 core: 0 stepsize: 1 label: chain_6_hop_3_subflow_1 progress_history: 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 100.00 
- 
-            # parse the numbers: 
-            flow_info = critical_info.split(" ")
-            
-            assert flow_info[0] == "flow:", f"Expected 'flow:', got {flow_info[0]}"
-            flow_id = int(flow_info[1])
-            assert flow_info[2] == "jobid:", f"Expected 'jobid:', got {flow_info[2]}"
-            job_id = int(flow_info[3])
-            assert flow_info[4] == "iter:", f"Expected 'iter:', got {flow_info[4]}"
-            iteration = int(flow_info[5])
-            assert flow_info[6] == "subflow:", f"Expected 'subflow:', got {flow_info[6]}"
-            subflow = int(flow_info[7])
-            assert flow_info[8] == "srcrack:", f"Expected 'srcrack:', got {flow_info[8]}"
-            srcrack = int(flow_info[9])
-            assert flow_info[10] == "dstrack:", f"Expected 'dstrack:', got {flow_info[10]}"
-            dstrack = int(flow_info[11])
-            assert flow_info[12] == "start:", f"Expected 'start:', got {flow_info[12]}"
-            start_time = float(flow_info[13])
-            assert flow_info[14] == "end:", f"Expected 'end:', got {flow_info[14]}"
-            end_time = float(flow_info[15])
-            assert flow_info[16] == "fct:", f"Expected 'fct:', got {flow_info[16]}"
-            fct = float(flow_info[17])
-            assert flow_info[18] == "core:", f"Expected 'core:', got {flow_info[18]}"
-            core = int(flow_info[19])
-            assert flow_info[20] == "stepsize:", f"Expected 'stepsize:', got {flow_info[20]}"
-            stepsize = float(flow_info[21])
-            assert flow_info[22] == "label:", f"Expected 'label:', got {flow_info[22]}"
-            label = flow_info[23]
-            assert flow_info[24] == "progress_history:", f"Expected 'progress_history:', got {flow_info[24]}"
-            progress_history = list(map(float, flow_info[25:]))
-            
-            start_time = round(start_time / stepsize)
-            end_time = round(end_time / stepsize)
-            fct = round(fct / stepsize)
-            
-            flow_info = {
-                "flow_id": flow_id,
-                "job_id": job_id,
-                "iteration": iteration,
-                "subflow": subflow,
-                "start_time": start_time,
-                "end_time": end_time,
-                "srcrack": srcrack,
-                "dstrack": dstrack,
-                "dir": "outgoing" if srcrack == 0 else "incoming",
-                "fct": fct,
-                "core": core,
-                "label": label, 
-                "progress_history": progress_history, 
-                "flow_size": sum(progress_history)
-            }
-            
-            if core + 1 > CORES:
-                CORES = core + 1 
-            if job_id > JOBS:
-                JOBS = job_id
-            if dstrack + 1 > RACKS:
-                RACKS = dstrack + 1
-            if srcrack + 1 > RACKS:
-                RACKS = srcrack + 1
-                
-            assert len(progress_history) == fct, f"Expected progress history length to be {fct}, got {len(progress_history)}"
-
-            if limit_flow_label is not None: 
-                # if label contains the limit_flow_label, return the flow_info
-                if limit_flow_label in label:
-                    return flow_info
-                else: 
-                    return None
-            else: 
-                return flow_info
-        
-    return None
-            
-
 def parse_flow_progress(file_path, limit_flow_label):
     min_time = 1e9 
     max_time = 0
@@ -102,31 +19,28 @@ def parse_flow_progress(file_path, limit_flow_label):
     core_flows_incoming = {} 
     core_flows_outgoing = {}
     
-    with open(file_path, 'r') as file:
-        for line in file:
-            # print("line: ", line)   
-            
-            flow_info = parse_line(line, limit_flow_label)
-            if flow_info is None:
-                continue
-            
-            m = None 
-            if flow_info["dir"] == "outgoing": 
-                m = core_flows_outgoing
-            else:
-                m = core_flows_incoming
-            
-            if flow_info["core"] not in m:
-                m[flow_info["core"]] = []
-                
-            m[flow_info["core"]].append(flow_info)
+    global CORES, JOBS, RACKS
+    
+    for flow_info in read_flow_infos(file_path, limit_flow_label):
+        CORES = max(CORES, flow_info["core"] + 1)
+        JOBS = max(JOBS, flow_info["job_id"])
+        RACKS = max(RACKS, flow_info["srcrack"] + 1, flow_info["dstrack"] + 1)
+        
+        m = None 
+        if flow_info["dir"] == "outgoing": 
+            m = core_flows_outgoing
+        else:
+            m = core_flows_incoming
+        
+        if flow_info["core"] not in m:
+            m[flow_info["core"]] = []
             
-
-                
-            if flow_info["start_time"] < min_time:
-                min_time = flow_info["start_time"]
-            if flow_info["end_time"] > max_time:
-                max_time = flow_info["end_time"]
+        m[flow_info["core"]].append(flow_info)
+        
+        if flow_info["start_time"] < min_time:
+            min_time = flow_info["start_time"]
+        if flow_info["end_time"] > max_time:
+            max_time = flow_info["end_time"]
             
     return core_flows_incoming, core_flows_outgoing, min_time, max_time
  
@@ -159,30 +73,24 @@ def get_job_profiles(file_path, json_output_path=None, limit_flow_label=None, on
     # the label of the flow, and the progress history of the flow.
     job_profiles = {}
     
-    with open(file_path, 'r') as file:
-        for line in file:
-            # print("line: ", line)   
-            flow_info = parse_line(line, limit_flow_label)
-            if flow_info is None:
-                continue
-            
-            if flow_info["job_id"] not in job_profiles:
-                job_profiles[flow_info["job_id"]] = {
-                    "period": 0, 
-                    "flows": [] 
-                }
-                
-            job_profiles[flow_info["job_id"]]["flows"].append(flow_info)
-            
-            if flow_info["start_time"] <= target_time and flow_info["end_time"] >= target_time and flow_info["srcrack"] == 0:
-                # get the rate of the flow at the target time
-                rate = flow_info["progress_history"][target_time - flow_info["start_time"]]
-                print("job_id: {}, flow: {}, subflow: {}, rate: {}".format(flow_info["job_id"], flow_info["flow_id"], flow_info["subflow"], rate)) 
+    for flow_info in read_flow_infos(file_path, limit_flow_label):
+        if flow_info["job_id"] not in job_profiles:
+            job_profiles[flow_info["job_id"]] = {
+                "period": 0, 
+                "flows": [] 
+            }
             
-            if flow_info["start_time"] < min_time:
-                min_time = flow_info["start_time"]
-            if flow_info["end_time"] > max_time:
-                max_time = flow_info["end_time"]
+        job_profiles[flow_info["job_id"]]["flows"].append(flow_info)
+        
+        if flow_info["start_time"] <= target_time and flow_info["end_time"] >= target_time and flow_info["srcrack"] == 0:
+            # get the rate of the flow at the target time
+            rate = flow_info["progress_history"][target_time - flow_info["start_time"]]
+            print("job_id: {}, flow: {}, subflow: {}, rate: {}".format(flow_info["job_id"], flow_info["flow_id"], flow_info["subflow"], rate)) 
+        
+        if flow_info["start_time"] < min_time:
+            min_time = flow_info["start_time"]
+        if flow_info["end_time"] > max_time:
+            max_time = flow_info["end_time"]
 
     expected_len = max_time + 1  
     
@@ -193,9 +101,13 @@ def get_job_profiles(file_path, json_output_path=None, limit_flow_label=None, on
     for job_id, job in job_profiles.items():
         for flow in job["flows"]:
             if only_summary is False:
+                progress_history = flow["progress_history"]
+                if isinstance(progress_history, np.ndarray):
+                    progress_history = progress_history.tolist()
+                    
                 leading_zeros = [0] * (flow["start_time"])
                 tailing_zeros = [0] * (max_time - flow["end_time"])
-                flow["progress_history"] = leading_zeros + flow["progress_history"] + tailing_zeros
+                flow["progress_history"] = leading_zeros + progress_history + tailing_zeros
                 flow["progress_history_summarized"] = get_summarized_progress(flow["progress_history"])
                 assert len(flow["progress_history"]) == expected_len, f"Expected length: {expected_len}, got {len(flow['progress_history'])}"
 
@@ -355,7 +267,7 @@ def main(file_path, limit_flow_label=None):
     
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        path = "/tmp2/workers/worker-0/run-1/flow-info.txt"
+        path = "/tmp2/workers/worker-0/run-1/flow-info.bin"
         print("using the default path: ", path)    
     else:
         path = sys.argv[1]
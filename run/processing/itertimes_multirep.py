@@ -3,244 +3,203 @@ import sys
 from pprint import pprint 
 from utils.util import * 
 
-def parse_line_iteration(line):
-    """Parse a line to extract simulation time, job ID, and iteration ID."""
-    # pattern like below, but instead of the first int, it should accept a floating point number 
-    # so the ([0-9]+)\ part should be changed
-    # pattern = r'\[([0-9]+)\]: job (\d+) iter (\d+) finished'
-    pattern = r'\[([+-]?(?:\d+(\.\d*)?|\.\d+))\]: job (\d+) iter (\d+) finished'
-    
-    match = re.search(pattern, line)
-    if match:
-        time = float((match.group(1)))    
-        time = round(time, rounding_precision)
-        return time, int(match.group(3)), int(match.group(4)), "iterfinish"
-    else: 
-        pattern = r'\[([+-]?(?:\d+(\.\d*)?|\.\d+))\]: job (\d+) started'
-        match = re.search(pattern, line)
-        if match:
-            time = float((match.group(1)))
-            time = round(time, rounding_precision)           
-            return time, int(match.group(3)), 0, "jobstart"
-        else:
-            return None
-        
-def parse_line_all_reduce(line):
-    start_pattern = r'\[([+-]?(?:\d+(\.\d*)?|\.\d+))\]: job (\d+) iter (\d+) layer (\d+) all-reduce started'
-    finish_pattern = r'\[([+-]?(?:\d+(\.\d*)?|\.\d+))\]: job (\d+) iter (\d+) layer (\d+) all-reduce finished'
-    
-    match = re.search(start_pattern, line)
-    if match:
-        time = float((match.group(1)))    
-        time = round(time, rounding_precision)
-        job_id = int(match.group(3))
-        iter_id = int(match.group(4))
-        layer_id = int(match.group(5))
-        return time, job_id, iter_id, layer_id, "allreducestart"
-    
-    else:
-        match = re.search(finish_pattern, line)
-        if match:
-            time = float((match.group(1)))    
-            time = round(time, rounding_precision)
-            job_id = int(match.group(3))
-            iter_id = int(match.group(4))
-            layer_id = int(match.group(5))
-            return time, job_id, iter_id, layer_id, "allreducefinish"
-        else:
-            return None
+# the job start, iteration finish and all-reduce start and finish lines, in one pattern, 
+# so a line is matched once.
+event_pattern = re.compile(r'\[([+-]?(?:\d+(?:\.\d*)?|\.\d+))\]: job (\d+) '
+                           r'(?:iter (\d+) (?:layer (\d+) all-reduce (started|finished)|finished)|started)')
+
+def parse_line_event(line): 
+    """Parse a line into a (time, job_id, iter_id, layer_id, type) event, layer_id is None 
+    for the job and iteration events."""
+    match = event_pattern.search(line)
+    if not match:
+        return None
     
-def get_iter_lengths(output_lines, all_jobs_running=False): 
+    time = round(float(match.group(1)), rounding_precision)
+    job_id = int(match.group(2))
     
-    iteration_times = {} 
+    if match.group(3) is None:
+        return time, job_id, 0, None, "jobstart"
     
-    job_start_times = {}
-    job_finish_times = {} 
+    iter_id = int(match.group(3))
+    if match.group(4) is None:
+        return time, job_id, iter_id, None, "iterfinish"
     
-    # job_iteration_times = {}
-    # job_iteration_starts = {}
+    if match.group(5) == "started":
+        return time, job_id, iter_id, int(match.group(4)), "allreducestart"
+    else:
+        return time, job_id, iter_id, int(match.group(4)), "allreducefinish"
+
 
+def get_rep_events(output_lines): 
+    # the events of every rep, in the order they were printed. 
+    # the lines after the last "done with rep" are not part of any rep.
+    rep_events = [] 
+    
     for line in output_lines:
         line = line.strip()
         
         if "done with rep" in line:
-            job_iteration_lengths = {}
-
-            latest_job_start = max(job_start_times.values())
-            earliest_job_finish = min(job_finish_times.values())
-            
+            yield rep_events 
+            rep_events = [] 
+            continue
+        
+        event = parse_line_event(line)
+        if event:
+            rep_events.append(event) 
             
-            for job_id in iteration_times:
-                for iter_id in iteration_times[job_id]:
-                    if "finish" not in iteration_times[job_id][iter_id]:
-                        # this must be the last iteration that doesn't have a finish time
-                        continue 
-                    else: 
-                        start_time = iteration_times[job_id][iter_id]["start"]
-                        finish_time = iteration_times[job_id][iter_id]["finish"]
-                        iteration_length = round(finish_time - start_time, rounding_precision)
-                        
-                        if job_id not in job_iteration_lengths:
-                            job_iteration_lengths[job_id] = []
-                        
-                        if all_jobs_running:
-                            if start_time >= latest_job_start and finish_time <= earliest_job_finish:
-                                job_iteration_lengths[job_id].append(iteration_length)
-                                iteration_times[job_id][iter_id]["accepted"] = "Yes"
-                            else: 
-                                iteration_times[job_id][iter_id]["accepted"] = "No"
-                        else: 
-                            job_iteration_lengths[job_id].append(iteration_length)
-                            iteration_times[job_id][iter_id]["accepted"] = "X"
 
-            yield job_iteration_lengths, iteration_times 
-            
-            iteration_times = {}            
-            job_start_times = {}
-            job_finish_times = {}
-            
-            continue
+def get_rep_iter_lengths(rep_events, all_jobs_running=False):
+    iteration_times = {} 
+    
+    job_start_times = {}
+    job_finish_times = {} 
+    
+    for sim_time, job_id, iter_id, layer_id, type in rep_events:
+        if type == "jobstart":
+            job_start_times[job_id] = sim_time
+            iteration_times[job_id] = {1 : {"start": sim_time}}
+                            
         
-        parsed_data = parse_line_iteration(line)
+        elif type == "iterfinish":
+            if job_id not in iteration_times: 
+                print("job_id {} not found in iteration_times".format(job_id))
+            if iter_id not in iteration_times[job_id]:
+                print("iter_id {} not found in iteration_times[{}]".format(iter_id, job_id))
             
-        if parsed_data:
-            sim_time, job_id, iter_id, type = parsed_data
+            iteration_times[job_id][iter_id]["finish"] = sim_time 
+            next_iter_id = iter_id + 1 
             
-            if type == "jobstart":
-                job_start_times[job_id] = sim_time
-                iteration_times[job_id] = {1 : {"start": sim_time}}
-                                
+            if next_iter_id not in iteration_times[job_id]:
+                # the last iteration will also create one more entry in the dictionary
+                # which has to be considered later. There will always be one entry at the end 
+                # that doesn't have a finish time.
+                iteration_times[job_id][next_iter_id] = {"start": sim_time}
             
-            elif type == "iterfinish":
-                # if iter_id == 1: 
-                #     iteration_length = sim_time - job_start_times[job_id]
-                #     iteration_length = round(iteration_length, rounding_precision)
-                # else:
-                #     iteration_length = sim_time - (sum(job_iteration_times[job_id]) + job_start_times[job_id])
-                #     iteration_length = round(iteration_length, rounding_precision)
-                    
-                # job_iteration_starts[job_id].append(sim_time)
-                # job_iteration_times[job_id].append(iteration_length)
-                
-                if job_id not in iteration_times: 
-                    print("job_id {} not found in iteration_times".format(job_id))
-                if iter_id not in iteration_times[job_id]:
-                    print("iter_id {} not found in iteration_times[{}]".format(iter_id, job_id))
-                
-                iteration_times[job_id][iter_id]["finish"] = sim_time 
-                next_iter_id = iter_id + 1 
-                
-                if next_iter_id not in iteration_times[job_id]:
-                    # the last iteration will also create one more entry in the dictionary
-                    # which has to be considered later. There will always be one entry at the end 
-                    # that doesn't have a finish time.
-                    iteration_times[job_id][next_iter_id] = {"start": sim_time}
+            
+            # handle the job_finish_times 
+            if job_id not in job_finish_times:
+                job_finish_times[job_id] = sim_time
+            else:
+                job_finish_times[job_id] = max(job_finish_times[job_id], sim_time)
+    
+    job_iteration_lengths = {}
+
+    latest_job_start = max(job_start_times.values())
+    earliest_job_finish = min(job_finish_times.values())
+    
+    
+    for job_id in iteration_times:
+        for iter_id in iteration_times[job_id]:
+            if "finish" not in iteration_times[job_id][iter_id]:
+                # this must be the last iteration that doesn't have a finish time
+                continue 
+            else: 
+                start_time = iteration_times[job_id][iter_id]["start"]
+                finish_time = iteration_times[job_id][iter_id]["finish"]
+                iteration_length = round(finish_time - start_time, rounding_precision)
                 
+                if job_id not in job_iteration_lengths:
+                    job_iteration_lengths[job_id] = []
                 
-                # handle the job_finish_times 
-                if job_id not in job_finish_times:
-                    job_finish_times[job_id] = sim_time
-                else:
-                    job_finish_times[job_id] = max(job_finish_times[job_id], sim_time)
+                if all_jobs_running:
+                    if start_time >= latest_job_start and finish_time <= earliest_job_finish:
+                        job_iteration_lengths[job_id].append(iteration_length)
+                        iteration_times[job_id][iter_id]["accepted"] = "Yes"
+                    else: 
+                        iteration_times[job_id][iter_id]["accepted"] = "No"
+                else: 
+                    job_iteration_lengths[job_id].append(iteration_length)
+                    iteration_times[job_id][iter_id]["accepted"] = "X"
+
+    return job_iteration_lengths, iteration_times 
+
+
+def get_iter_lengths(output_lines, all_jobs_running=False): 
+    for rep_events in get_rep_events(output_lines):
+        yield get_rep_iter_lengths(rep_events, all_jobs_running)
                     
     print("we shouldn't get here!")
     exit(0)
     
 
-def get_all_reduce_times(output_lines, all_jobs_running=False):
+def get_rep_all_reduce_times(rep_events, current_rep, all_jobs_running=False):
     all_reduce_times = {} 
     job_start_times = {} 
     job_finish_times = {} 
     
-    current_rep = 1 
-        
-    for line in output_lines:
-        line = line.strip()
-        
-        if "done with rep" in line: 
+    for sim_time, job_id, iter_id, layer_id, type in rep_events:
+        if type == "allreducestart":
+            if job_id not in all_reduce_times:
+                all_reduce_times[job_id] = {}
+                
+            if iter_id not in all_reduce_times[job_id]:
+                all_reduce_times[job_id][iter_id] = {}
             
-            all_reduce_lengths = {} 
+            if layer_id not in all_reduce_times[job_id][iter_id]:
+                all_reduce_times[job_id][iter_id][layer_id] = {}
             
-            latest_job_start = max(job_start_times.values())
-            earliest_job_finish = min(job_finish_times.values())
-
+            all_reduce_times[job_id][iter_id][layer_id]["start"] = sim_time
+                            
+        elif type == "allreducefinish":
+            if job_id not in all_reduce_times:
+                print("job_id {} not found in all_reduce_times for rep {}".format(job_id, current_rep))
+            if iter_id not in all_reduce_times[job_id]:
+                print("iter_id {} not found in all_reduce_times[] for rep {}".format(iter_id, job_id, current_rep))
+            if layer_id not in all_reduce_times[job_id][iter_id]:
+                print("layer_id {} not found in all_reduce_times[{}][{}] for rep {}".format(layer_id, job_id, iter_id, current_rep))
+            if "start" not in all_reduce_times[job_id][iter_id][layer_id]:
+                print("start not found in all_reduce_times[{}][{}][{}] for rep {}".format(job_id, iter_id, layer_id, current_rep))                   
+                
+            all_reduce_times[job_id][iter_id][layer_id]["finish"] = sim_time
+            
+        elif type == "jobstart":
+            job_start_times[job_id] = sim_time
+        
+        elif type == "iterfinish":
+            if job_id not in job_finish_times:
+                job_finish_times[job_id] = sim_time 
+            else:
+                job_finish_times[job_id] = max(job_finish_times[job_id], sim_time)
 
-            for job_id in all_reduce_times:
-                for iter_id in all_reduce_times[job_id]:
-                    for layer_id in all_reduce_times[job_id][iter_id]:
-                        
-                        start_time = all_reduce_times[job_id][iter_id][layer_id]["start"]
-                        finish_time = all_reduce_times[job_id][iter_id][layer_id]["finish"]
-                        
-                        duration = round(finish_time - start_time, rounding_precision)
-                        
-                        if job_id not in all_reduce_lengths:
-                            all_reduce_lengths[job_id] = []
-                        
-                        if all_jobs_running:
-                            if start_time >= latest_job_start and finish_time <= earliest_job_finish:
-                                all_reduce_lengths[job_id].append(duration)
-                                all_reduce_times[job_id][iter_id][layer_id]["accepted"] = "Yes"
-                            else: 
-                                all_reduce_times[job_id][iter_id][layer_id]["accepted"] = "No"
-                        else: 
-                            all_reduce_lengths[job_id].append(duration)
-                            all_reduce_times[job_id][iter_id][layer_id]["accepted"] = "X"
+    all_reduce_lengths = {} 
+    
+    latest_job_start = max(job_start_times.values())
+    earliest_job_finish = min(job_finish_times.values())
 
-            yield all_reduce_lengths, all_reduce_times
-            
-            all_reduce_times = {}
-            job_start_times = {}
-            job_finish_times = {}        
 
-            current_rep += 1 
-            continue
-        
-        parsed_data = parse_line_all_reduce(line)
-        
-        if parsed_data:
-            sim_time, job_id, iter_id, layer_id, type = parsed_data
-            
-            if type == "allreducestart":
-                if job_id not in all_reduce_times:
-                    all_reduce_times[job_id] = {}
-                    
-                if iter_id not in all_reduce_times[job_id]:
-                    all_reduce_times[job_id][iter_id] = {}
+    for job_id in all_reduce_times:
+        for iter_id in all_reduce_times[job_id]:
+            for layer_id in all_reduce_times[job_id][iter_id]:
                 
-                if layer_id not in all_reduce_times[job_id][iter_id]:
-                    all_reduce_times[job_id][iter_id][layer_id] = {}
+                start_time = all_reduce_times[job_id][iter_id][layer_id]["start"]
+                finish_time = all_reduce_times[job_id][iter_id][layer_id]["finish"]
                 
-                all_reduce_times[job_id][iter_id][layer_id]["start"] = sim_time
-                                
-            elif type == "allreducefinish":
-                if job_id not in all_reduce_times:
-                    print("job_id {} not found in all_reduce_times for rep {}".format(job_id, current_rep))
-                if iter_id not in all_reduce_times[job_id]:
-                    print("iter_id {} not found in all_reduce_times[] for rep {}".format(iter_id, job_id, current_rep))
-                if layer_id not in all_reduce_times[job_id][iter_id]:
-                    print("layer_id {} not found in all_reduce_times[{}][{}] for rep {}".format(layer_id, job_id, iter_id, current_rep))
-                if "start" not in all_reduce_times[job_id][iter_id][layer_id]:
-                    print("start not found in all_reduce_times[{}][{}][{}] for rep {}".format(job_id, iter_id, layer_id, current_rep))                   
-                    
-                all_reduce_times[job_id][iter_id][layer_id]["finish"] = sim_time
+                duration = round(finish_time - start_time, rounding_precision)
                 
-        
-        iter_parse_data = parse_line_iteration(line)    
-        
-        if iter_parse_data: 
-            sim_time, job_id, iter_id, type = iter_parse_data
-            
-            if type == "jobstart":
-                job_start_times[job_id] = sim_time
-            
-            if type == "iterfinish":
-                if job_id not in job_finish_times:
-                    job_finish_times[job_id] = sim_time 
-                else:
-                    job_finish_times[job_id] = max(job_finish_times[job_id], sim_time)
+                if job_id not in all_reduce_lengths:
+                    all_reduce_lengths[job_id] = []
+                
+                if all_jobs_running:
+                    if start_time >= latest_job_start and finish_time <= earliest_job_finish:
+                        all_reduce_lengths[job_id].append(duration)
+                        all_reduce_times[job_id][iter_id][layer_id]["accepted"] = "Yes"
+                    else: 
+                        all_reduce_times[job_id][iter_id][layer_id]["accepted"] = "No"
+                else: 
+                    all_reduce_lengths[job_id].append(duration)
+                    all_reduce_times[job_id][iter_id][layer_id]["accepted"] = "X"
+
+    return all_reduce_lengths, all_reduce_times
 
 
+def get_all_reduce_times(output_lines, all_jobs_running=False):
+    current_rep = 1 
+        
+    for rep_events in get_rep_events(output_lines):
+        yield get_rep_all_reduce_times(rep_events, current_rep, all_jobs_running)
+        current_rep += 1 
+
     print("we shouldn't get here!")
     exit(0)    
 
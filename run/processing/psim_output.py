@@ -0,0 +1,157 @@
+import numpy as np 
+
+from utils.util import rage_quit, rounding_precision
+from processing.itertimes_multirep import parse_line_event
+from processing.itertimes_multirep import get_rep_iter_lengths, get_rep_all_reduce_times
+
+# the results of a psim run, parsed once while its output is read. every line is looked at
+# once, and only the events and the scalar results are kept, not the text.
+# - the events of every rep: (time, job_id, iter_id, layer_id, type) in the order they were
+#   printed, for the job starts, the iteration finishes and the all-reduce starts and finishes.
+# - the first value printed for each of the scalar results.
+# the metrics are then computed from the events the same way get_all_rep_iter_lengths and
+# get_all_rep_all_reduce_times do from the lines.
+# with --event-log-file, psim writes the same events and results to a binary file, which is
+# read with read_event_log instead of parsing the lines. see include/event_log.h.
+
+# the scalar results, indexed by their ResultType value in include/event_log.h.
+scalar_keys = [
+    "psim time",
+    "Total congested time",
+    "average_fct",
+    "average_flow_bw",
+    "total machine utilization rate",
+]
+
+
+class PsimOutput:
+    def __init__(self):
+        self.rep_events = []
+        self.current_rep_events = []
+        self.scalars = {}
+
+    def add_line(self, line):
+        line = line.strip()
+
+        if "done with rep" in line:
+            self.rep_events.append(self.current_rep_events)
+            self.current_rep_events = []
+            return
+
+        # the events all look like "[time]: job ...", the rest is skipped without a regex.
+        if "]: job " in line:
+            event = parse_line_event(line)
+            if event:
+                self.current_rep_events.append(event)
+                return
+
+        if ":" in line:
+            for key in scalar_keys:
+                if key not in self.scalars and "{}:".format(key) in line:
+                    self.scalars[key] = line.split("{}:".format(key))[1]
+
+    def add_lines(self, lines):
+        for line in lines:
+            self.add_line(line)
+
+    def get_scalar(self, key, message):
+        if key not in self.scalars:
+            rage_quit(message)
+        return float(self.scalars[key])
+
+    def get_psim_time(self):
+        return self.get_scalar("psim time", "no psim times found, simulation probably failed")
+
+    def get_psim_total_congested_time(self):
+        return self.get_scalar("Total congested time",
+                               "no congested times found, simulation probably failed")
+
+    def get_psim_metric(self, metric):
+        return self.get_scalar(metric, "no {} found, simulation probably failed".format(metric))
+
+    def get_reps(self, rep_count):
+        if len(self.rep_events) < rep_count:
+            print("we shouldn't get here!")
+            exit(0)
+
+        return self.rep_events[:rep_count]
+
+    def get_all_rep_iter_lengths(self, rep_count, all_jobs_running=False):
+        results = []
+        for rep_events in self.get_reps(rep_count):
+            iteration_lengths, _ = get_rep_iter_lengths(rep_events, all_jobs_running)
+            results.append(iteration_lengths)
+
+        return results
+
+    def get_all_rep_all_reduce_times(self, rep_count, all_jobs_running=False):
+        results = []
+        for rep, rep_events in enumerate(self.get_reps(rep_count)):
+            all_reduce_lengths, _ = get_rep_all_reduce_times(rep_events, rep + 1, all_jobs_running)
+            results.append(all_reduce_lengths)
+
+        return results
+
+
+def parse_psim_output(output_lines):
+    psim_output = PsimOutput()
+    psim_output.add_lines(output_lines)
+    return psim_output
+
+
+event_log_magic = b"PSIMEVT1"
+
+event_dtype = np.dtype([
+    ("type", "<i8"),
+    ("job_id", "<i8"),
+    ("iter", "<i8"),
+    ("layer", "<i8"),
+    ("time", "<f8"),
+])
+
+# the EventType values in include/event_log.h.
+event_type_names = {
+    1: "jobstart",
+    2: "iterfinish",
+    3: "allreducestart",
+    4: "allreducefinish",
+}
+rep_end_event_type = 5
+result_event_type = 6
+
+
+def read_event_log(path):
+    # the same PsimOutput that parsing the lines would give.
+    with open(path, "rb") as f:
+        if f.read(len(event_log_magic)) != event_log_magic:
+            rage_quit("not a psim event log: {}".format(path))
+
+    records = np.fromfile(path, dtype=event_dtype, offset=len(event_log_magic))
+
+    psim_output = PsimOutput()
+    
+    for event_type, job_id, iter_id, layer_id, time in zip(records["type"].tolist(), 
+                                                           records["job_id"].tolist(),
+                                                           records["iter"].tolist(), 
+                                                           records["layer"].tolist(), 
+                                                           records["time"].tolist()):
+        if event_type in event_type_names:
+            type = event_type_names[event_type]
+            if type == "jobstart":
+                iter_id = 0
+            if type == "jobstart" or type == "iterfinish":
+                layer_id = None
+                
+            time = round(time, rounding_precision)
+            psim_output.current_rep_events.append((time, job_id, iter_id, layer_id, type))
+
+        elif event_type == rep_end_event_type:
+            psim_output.rep_events.append(psim_output.current_rep_events)
+            psim_output.current_rep_events = []
+
+        elif event_type == result_event_type:
+            key = scalar_keys[job_id]
+            if key not in psim_output.scalars:
+                psim_output.scalars[key] = time
+
+    return psim_output
@@ -264,6 +264,7 @@ def do_experiment(seed_range=1,
 
         "simulation-seed": experiment_seed, 
         "print-flow-progress-history": True,
+        "flow-info-format": "binary",
         "placement-mode": placement_mode,   
         "ring-mode": ring_mode,  
     }
@@ -669,6 +670,23 @@ def do_experiment(seed_range=1,
                                 "lb-scheme": "readprotocol"
                             }))
         
+    # the timing schemes against each other, only when asked for by name.
+    if "TS-cassini" in added_comparisons:
+        comparisons.append(("TS-cassini", {
+                                "timing-scheme": "cassini",
+                                "subflows": 1,
+                                "throttle-search": False,
+                                "lb-scheme": "random"
+                            }))
+
+    if "TS-xcorr" in added_comparisons:
+        comparisons.append(("TS-xcorr", {
+                                "timing-scheme": "xcorr",
+                                "subflows": 1,
+                                "throttle-search": False,
+                                "lb-scheme": "random"
+                            }))
+
     ######################
     
     
@@ -695,6 +713,8 @@ def do_experiment(seed_range=1,
         "all-placement-modes": [placement_mode],
         "experiment-seed": experiment_seed,
         "oversub": oversub,
+        "psim-event-log": False,
+        "psim-server": False,
         
         "cassini-parameters": {  
             "link-solution-candidate-count": 100,   
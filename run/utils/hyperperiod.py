@@ -0,0 +1,92 @@
+from math import gcd
+
+# the hyperperiod window of a set of jobs sharing a link.
+# once a job runs its iterations back to back, with no delays and the same throttle rate,
+# its signal repeats with the length of one iteration. after the last job has settled
+# into that, the sum of the signals repeats with the lcm of those lengths, until the
+# first job finishes. after that jobs only drop out, and the loads are never negative,
+# so the sum never goes above what it was one hyperperiod before. so the first time the
+# sum goes over any value, and its max, are the same on [0, window) as on the whole thing,
+# as long as no job finishes before the end of the window.
+# that's all the scores need, except the under-cap score, which looks at every time step.
+
+# hyperperiods longer than this aren't worth a window. 0 turns the windows off.
+default_max_hyperperiod = 100000
+
+
+def get_max_hyperperiod(run_context):
+    return run_context.get("timing-max-hyperperiod", default_max_hyperperiod)
+
+
+def is_window_enough(compat_score_mode):
+    # whether the score over the window is the score over the whole signal.
+    return compat_score_mode != "under-cap"
+
+
+def lcm(numbers):
+    numbers = list(numbers)
+    result = numbers[0]
+    for number in numbers[1:]:
+        result = result * number // gcd(result, number)
+    return result
+
+
+def get_periodic_start(deltas, throttle_rates):
+    # the first iteration from which on the job runs back to back at the same rate.
+    periodic_iter = len(deltas) - 1
+    while (periodic_iter > 0 and deltas[periodic_iter] == 0 and
+           throttle_rates[periodic_iter - 1] == throttle_rates[periodic_iter]):
+        periodic_iter -= 1
+    return periodic_iter
+
+
+def get_periodic_schedule(deltas, throttle_rates, iter_lengths):
+    # (the time the job starts repeating, the period it repeats with, the time it ends).
+    periodic_iter = get_periodic_start(deltas, throttle_rates)
+    periodic_start = sum(deltas[:periodic_iter + 1]) + sum(iter_lengths[:periodic_iter])
+    period = iter_lengths[periodic_iter]
+    end = periodic_start + period * (len(deltas) - periodic_iter)
+
+    return periodic_start, period, end
+
+
+def get_window(periodic_schedules, max_hyperperiod):
+    # the window for the jobs with these periodic schedules, or None.
+    if len(periodic_schedules) == 0:
+        return None
+
+    periodic_starts, periods, ends = zip(*periodic_schedules)
+    if min(periods) <= 0:
+        return None
+
+    hyperperiod = lcm(periods)
+    if hyperperiod > max_hyperperiod:
+        return None
+
+    window = max(periodic_starts) + hyperperiod
+    if window > min(ends) or window >= max(ends):
+        return None
+
+    return window
+
+
+def get_hyperperiod_window(job_schedules, max_hyperperiod):
+    """
+    job_schedules: a (deltas, throttle_rates, iter_lengths) tuple for every job, for the
+    iterations that it runs. returns the length of the window, or None if the periods
+    are too far from each other, or if the window wouldn't be shorter than the signals.
+    """
+    periodic_schedules = [get_periodic_schedule(deltas, throttle_rates, iter_lengths)
+                          for deltas, throttle_rates, iter_lengths in job_schedules]
+
+    return get_window(periodic_schedules, max_hyperperiod)
+
+
+def get_window_iter_count(deltas, iter_lengths, window):
+    # the number of iterations that cover [0, window).
+    current_time = 0
+    for iter_id in range(len(deltas)):
+        current_time += deltas[iter_id] + iter_lengths[iter_id]
+        if current_time >= window:
+            return iter_id + 1
+    return len(deltas)
@@ -0,0 +1,156 @@
+import numpy as np
+
+# a segment tree over a time series, with range add, range min and first fit queries.
+# every node keeps the min of its range and one lazy tag, the sum of the adds that are not
+# pushed down to its children yet. everything is done with loops over the levels, no
+# recursion, so an add or a query is O(log T) no matter how many adds came before.
+# the tag sums the adds before they reach a value, so a value can be off by a few ulps
+# from adding them one by one. the fit tests allow for that with a small tolerance.
+
+tolerance = 1e-9
+
+
+class IntervalIndex():
+    def __init__(self, values):
+        self.length = len(values)
+
+        self.log = 0
+        while (1 << self.log) < self.length:
+            self.log += 1
+        self.size = 1 << self.log
+
+        # the tree is built level by level with numpy, node i has the children 2i and 2i+1.
+        # the padding is never below any threshold.
+        mins = np.full(2 * self.size, np.inf)
+        mins[self.size:self.size + self.length] = values
+        level_start = self.size
+        while level_start > 1:
+            level = mins[level_start:2 * level_start]
+            mins[level_start // 2:level_start] = np.minimum(level[0::2], level[1::2])
+            level_start //= 2
+        self.mins = mins.tolist()
+
+        self.tags = [0.0] * self.size
+
+    def apply(self, node, value):
+        self.mins[node] += value
+        if node < self.size:
+            self.tags[node] += value
+
+    def push(self, node):
+        tag = self.tags[node]
+        if tag != 0.0:
+            self.apply(2 * node, tag)
+            self.apply(2 * node + 1, tag)
+            self.tags[node] = 0.0
+
+    def pull(self, node):
+        # only called on nodes that were just pushed, their tags are 0.
+        left = self.mins[2 * node]
+        right = self.mins[2 * node + 1]
+        self.mins[node] = left if left < right else right
+
+    def push_boundaries(self, start, end):
+        # push the tags down on the paths to the two ends of [start, end), the only
+        # partially covered nodes.
+        for i in range(self.log, 0, -1):
+            if ((start >> i) << i) != start:
+                self.push(start >> i)
+            if ((end >> i) << i) != end:
+                self.push((end - 1) >> i)
+
+    def add(self, start, end, value):
+        # add value to every element in [start, end)
+        assert 0 <= start and end <= self.length, f"range [{start}, {end}) out of [0, {self.length})"
+        if start >= end:
+            return
+
+        start += self.size
+        end += self.size
+        self.push_boundaries(start, end)
+
+        left, right = start, end
+        while left < right:
+            if left & 1:
+                self.apply(left, value)
+                left += 1
+            if right & 1:
+                right -= 1
+                self.apply(right, value)
+            left >>= 1
+            right >>= 1
+
+        for i in range(1, self.log + 1):
+            if ((start >> i) << i) != start:
+                self.pull(start >> i)
+            if ((end >> i) << i) != end:
+                self.pull((end - 1) >> i)
+
+    def range_min(self, start, end):
+        # the min over [start, end)
+        assert 0 <= start and end <= self.length, f"range [{start}, {end}) out of [0, {self.length})"
+        if start >= end:
+            return float("inf")
+
+        start += self.size
+        end += self.size
+        self.push_boundaries(start, end)
+
+        result = float("inf")
+        while start < end:
+            if start & 1:
+                result = min(result, self.mins[start])
+                start += 1
+            if end & 1:
+                end -= 1
+                result = min(result, self.mins[end])
+            start >>= 1
+            end >>= 1
+        return result
+
+    def first_below(self, start, end, threshold):
+        # the first index in [start, end) with a value below the threshold, or None.
+        # the nodes are visited left to right from start, and only the one that has such
+        # a value in it is descended into.
+        assert 0 <= start and end <= self.length, f"range [{start}, {end}) out of [0, {self.length})"
+        if start >= end:
+            return None
+
+        threshold -= tolerance
+        mins = self.mins
+
+        node = start + self.size
+        for i in range(self.log, 0, -1):
+            self.push(node >> i)
+
+        while True:
+            while node & 1 == 0:
+                node >>= 1
+            if mins[node] < threshold:
+                while node < self.size:
+                    self.push(node)
+                    node *= 2
+                    if mins[node] >= threshold:
+                        node += 1
+                index = node - self.size
+                return index if index < end else None
+
+            node += 1
+            if node & -node == node:
+                return None
+
+    def find_earliest_fit(self, start, end, threshold):
+        # the smallest delay such that no value in [start + delay, end + delay)
+        # is below the threshold. every probe jumps past the first value that is.
+        delay = 0
+        while True:
+            index = self.first_below(start + delay, end + delay, threshold)
+            if index is None:
+                return delay
+            delay = index + 1 - start
+
+    def get_values(self):
+        # the current values, with all the tags pushed down.
+        for node in range(1, self.size):
+            self.push(node)
+        return self.mins[self.size:self.size + self.length]
@@ -0,0 +1,161 @@
+import os
+import json
+import hashlib
+import threading
+import pickle as pkl
+
+# a persistent, content-addressed store for the job profiles.
+# profiling a job means running psim on that job in isolation, which only depends on
+# the shape of the job and the simulation parameters, not on where exactly the job is placed.
+# two jobs that are the same up to a relabelling of the racks will have the same profile,
+# so we key the profiles by a canonical signature of the job and keep them across sweeps.
+
+# bump this if the format of the stored profiles changes.
+profile_store_version = 2
+
+# these options don't change what the isolated job looks like in the simulator.
+# they are either paths, ids, or only affect the parts of the network that the job doesn't touch.
+ignored_profiling_options = [
+    "worker-id",
+    "workers-dir",
+    "placement-file",
+    "timing-file",
+    "routing-file",
+    "isolate-job-id",
+    "throttle_factor",
+    "machine-count",
+    "ft-pod-count",
+    "console-log-level",
+    "file-log-level",
+    "core-status-profiling-interval",
+    "flow-info-format",
+]
+
+binary_hashes = {}
+binary_hashes_lock = threading.Lock()
+
+
+def get_binary_hash(executable_path):
+    # the binary is hashed once per (path, mtime, size), since it's rebuilt for every sweep.
+    stat = os.stat(executable_path)
+    key = (os.path.abspath(executable_path), stat.st_mtime, stat.st_size)
+
+    with binary_hashes_lock:
+        if key not in binary_hashes:
+            h = hashlib.md5()
+            with open(executable_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+            binary_hashes[key] = h.hexdigest()
+
+        return binary_hashes[key]
+
+
+def get_rack_relabeling(machines, server_per_rack):
+    # the racks are relabelled in the order they first appear in the ring.
+    rack_map = {}
+    for machine in machines:
+        rack = machine // server_per_rack
+        if rack not in rack_map:
+            rack_map[rack] = len(rack_map)
+    return rack_map
+
+
+def get_job_signature(job, profiling_job_options, run_context, throttle_factor, binary_hash):
+    server_per_rack = profiling_job_options["ft-server-per-rack"]
+    rack_map = get_rack_relabeling(job["machines"], server_per_rack)
+
+    sim_options = {}
+    for key, value in profiling_job_options.items():
+        if key not in ignored_profiling_options:
+            sim_options[key] = value
+
+    signature = {
+        "version": profile_store_version,
+        "layout": [rack_map[machine // server_per_rack] for machine in job["machines"]],
+        "comm_size": job["comm_size"],
+        "comp_size": job["comp_size"],
+        "layer_count": job["layer_count"],
+        "throttle_factor": float(throttle_factor),
+        "link_bandwidth": profiling_job_options["link-bandwidth"],
+        "profiling_core_count": run_context["profiling-core-count"],
+        "binary_hash": binary_hash,
+        "sim_options": sim_options,
+    }
+
+    signature_str = json.dumps(signature, sort_keys=True)
+    signature_hash = hashlib.md5(signature_str.encode()).hexdigest()
+
+    return signature_hash, signature, rack_map
+
+
+def relabel_profile(profile, rack_map, job_id):
+    # returns a copy of the profile with the racks (and the job id) replaced.
+    # the progress histories are shared with the original profile, they are not modified.
+    relabeled_flows = []
+    for flow in profile["flows"]:
+        new_flow = flow.copy()
+        new_flow["job_id"] = job_id
+        new_flow["srcrack"] = rack_map[flow["srcrack"]]
+        new_flow["dstrack"] = rack_map[flow["dstrack"]]
+        new_flow["dir"] = "outgoing" if new_flow["srcrack"] == 0 else "incoming"
+        relabeled_flows.append(new_flow)
+
+    return {
+        "period": profile["period"],
+        "flows": relabeled_flows,
+    }
+
+
+class ProfileStore:
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def get_path(self, signature_hash):
+        return "{}/{}/{}.pkl".format(self.store_dir, signature_hash[:2], signature_hash)
+
+    def get(self, signature_hash, signature, rack_map, job_id):
+        path = self.get_path(signature_hash)
+
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+
+        try:
+            with open(path, "rb") as f:
+                entry = pkl.load(f)
+        except Exception:
+            # a broken entry is treated as a miss, it will be overwritten.
+            self.misses += 1
+            return None
+
+        # just in case of a hash collision.
+        if entry["signature"] != signature:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+
+        # the stored profile is in the canonical rack labels, map it back to the real racks.
+        inverse_rack_map = {canonical: rack for rack, canonical in rack_map.items()}
+        return relabel_profile(entry["profile"], inverse_rack_map, job_id)
+
+    def put(self, signature_hash, signature, rack_map, profile):
+        path = self.get_path(signature_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        entry = {
+            "signature": signature,
+            "profile": relabel_profile(profile, rack_map, job_id=None),
+        }
+
+        # write to a temp file and rename, so that the other sweeps reading
+        # the store never see a half-written profile.
+        tmp_path = "{}.tmp-{}-{}".format(path, os.getpid(), threading.get_ident())
+        with open(tmp_path, "wb") as f:
+            pkl.dump(entry, f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,63 @@
+import json
+import subprocess
+
+# a psim that stays alive and runs one experiment after another, instead of a new psim for
+# every experiment. the experiment goes in on stdin as one json line: the same arguments
+# the command line would get, and optionally the placement, timing or routing json to use
+# instead of the files. psim resets all of its state before each experiment and prints the
+# output as usual, followed by the done line. see run_server in main.cc.
+# a server that dies (psim exits on errors) or is left in the middle of an experiment is
+# thrown away, the next experiment gets a fresh one.
+
+done_line = "psim server: done"
+
+
+class PsimServer:
+    def __init__(self, executable):
+        self.executable = executable
+        self.process = subprocess.Popen([executable, "--server"],
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE)
+        self.run_count = 0
+        self.busy = False
+
+    def run(self, args, inputs=None):
+        # the lines psim prints for the experiment, as it prints them.
+        # raises CalledProcessError if the server dies before it's done.
+        request = {"args": args}
+        if inputs is not None:
+            request["inputs"] = inputs
+
+        self.busy = True
+        self.run_count += 1
+        try:
+            self.process.stdin.write(json.dumps(request).encode("utf-8") + b"\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            pass
+
+        for line in self.process.stdout:
+            line = line.decode("utf-8").rstrip("\n")
+            if line == done_line:
+                self.busy = False
+                return
+            yield line
+
+        return_code = self.process.wait()
+        raise subprocess.CalledProcessError(return_code, " ".join([self.executable] + args))
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+
+        # a server that's busy won't read its stdin until it's done, no need to wait.
+        if self.busy:
+            self.process.kill()
+
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
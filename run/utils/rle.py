@@ -0,0 +1,76 @@
+import numpy as np
+
+# run-length encoded progress histories.
+# a history is a list of (value, count) tuples, each for a value and the number of
+# times that value appears consecutively. the profiles only keep this summary,
+# the dense signals are only made inside the numpy kernels that need them.
+
+
+def rle_encode(values):
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return []
+
+    # the positions where the value changes.
+    change_points = np.flatnonzero(values[1:] != values[:-1]) + 1
+    starts = np.concatenate(([0], change_points))
+    counts = np.diff(np.concatenate((starts, [len(values)])))
+
+    return list(zip(values[starts].tolist(), counts.tolist()))
+
+
+def rle_length(rle):
+    return sum(count for _, count in rle)
+
+
+def rle_max(rle):
+    return max(value for value, count in rle if count > 0)
+
+
+def rle_expand(rle):
+    if len(rle) == 0:
+        return np.zeros(0)
+
+    values, counts = zip(*rle)
+    return np.repeat(np.array(values, dtype=float), np.array(counts, dtype=int))
+
+
+def rle_slice(rle, start, end):
+    # the dense values for [start, end], both ends included.
+    # only the runs that overlap the range are expanded.
+    values, counts = zip(*rle)
+    counts = np.array(counts, dtype=int)
+    run_ends = np.cumsum(counts)
+
+    first_run = np.searchsorted(run_ends, start, side="right")
+    last_run = np.searchsorted(run_ends, end, side="right")
+
+    run_counts = counts[first_run:last_run + 1].copy()
+    run_counts[0] -= start - (run_ends[first_run] - counts[first_run])
+    run_counts[-1] -= run_ends[last_run] - 1 - end
+
+    return np.repeat(np.array(values[first_run:last_run + 1], dtype=float), run_counts)
+
+
+def rle_runs(rle, start, end):
+    # the runs that overlap [start, end], cut to the range, as (value, run_start, run_end)
+    # tuples with both ends included. 
+    runs = [] 
+    run_start = 0 
+    for value, count in rle:
+        run_end = run_start + count - 1
+        if count > 0 and run_end >= start and run_start <= end:
+            runs.append((value, max(run_start, start), min(run_end, end)))
+        run_start += count
+        if run_start > end:
+            break
+    return runs
+
+
+def get_flow_progress_rle(flow):
+    # the summarized history of a profiled flow.
+    # older profiles might only have the dense history.
+    rle = flow.get("progress_history_summarized")
+    if rle is None:
+        rle = rle_encode(flow["progress_history"])
+    return rle
@@ -1,4 +1,5 @@
 import os
+import json
 from pprint import pprint
 import itertools
 import subprocess
@@ -7,6 +8,8 @@ import queue
 import threading
 import datetime
 from utils.util import *
+from processing.psim_output import PsimOutput, read_event_log
+from utils.psim_server import PsimServer
 import copy 
 import traceback
 import time 
@@ -39,6 +42,7 @@ class ConfigSweeper:
         self.thread_states = {i: "idle" for i in range(worker_thread_count)}
         self.worker_id_counter = 0
         self.global_exp_id = 0
+        self.psim_servers = {}
 
         self.exp_q = queue.Queue()
         self.thread_lock = threading.Lock()  
@@ -250,6 +254,7 @@ class ConfigSweeper:
                 with open(thread_output_path, "a+") as f:
                     f.write("queue is empty\n")
                     f.write("\n")
+                self.close_psim_server(worker_id)
                 return
             
             except Exception as e:
@@ -266,6 +271,86 @@ class ConfigSweeper:
                 pprint(data, stream=f)
                 f.write("\n")
     
+    def run_command_and_parse_output(self, cmd, options, run_context):
+        # the output is parsed line by line while the command runs, and stored in a file 
+        # if needed, so the whole output is never held in memory.
+        # with an event log, psim writes the events to a file and the lines aren't parsed.
+        use_event_log = "event-log-file" in options
+        output = PsimOutput() 
+        
+        output_file = None 
+        if self.do_store_outputs:
+            output_file = open(run_context["output-file"], "a+")
+            pprint(options, stream=output_file)
+            output_file.write("\n" + "-"*50 + "\n")
+        
+        if run_context.get("psim-server", False):
+            lines = self.run_on_psim_server(options, run_context)
+        else:
+            lines = self.run_command(cmd)
+            
+        try: 
+            for line in lines:
+                if not use_event_log:
+                    output.add_line(line)
+                if output_file is not None:
+                    output_file.write(line + "\n")
+        finally: 
+            if output_file is not None:
+                output_file.close()
+        
+        if use_event_log:
+            output = read_event_log(options["event-log-file"])
+            
+        return output
+    
+    def run_command(self, cmd):
+        # the lines the command prints, as it prints them.
+        process = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE)
+        for line in process.stdout:
+            yield line.decode("utf-8").rstrip("\n")
+        
+        return_code = process.wait()
+        if return_code != 0:
+            raise subprocess.CalledProcessError(return_code, cmd)
+    
+    def run_on_psim_server(self, options, run_context):
+        # the same lines, from the psim server of this worker. the server is replaced after 
+        # some experiments, and whenever it fails or is left in the middle of one. 
+        worker_id = options["worker-id"]
+        server = self.psim_servers.get(worker_id, None)
+        
+        if server is not None:
+            if server.busy or server.run_count >= run_context.get("psim-server-max-runs", 100):
+                self.close_psim_server(worker_id)
+                server = None 
+                
+        if server is None:
+            server = PsimServer(self.run_executable)
+            self.psim_servers[worker_id] = server
+        
+        try: 
+            yield from server.run(make_args(options), self.get_psim_inputs(options))
+        except subprocess.CalledProcessError:
+            self.close_psim_server(worker_id)
+            raise 
+    
+    def get_psim_inputs(self, options):
+        # the placement, timing and routing files go to the server with the experiment, so 
+        # psim doesn't read them again. the ones that don't exist are left to psim, as before.
+        inputs = {} 
+        for option in ["placement-file", "timing-file", "routing-file"]:
+            path = options.get(option, None)
+            if path is not None and os.path.exists(path):
+                with open(path, "r") as f:
+                    inputs[option] = json.load(f)
+        return inputs
+    
+    def close_psim_server(self, worker_id):
+        server = self.psim_servers.pop(worker_id, None)
+        if server is not None:
+            server.close()
+    
     def only_run_command_with_options(self, run_context, options):
         cmd = make_cmd(self.run_executable, options, use_gdb=False, print_cmd=False)
         
@@ -351,6 +436,8 @@ class ConfigSweeper:
         print("[{}] {}: after command modification".format(get_time_string(), this_exp_uuid), flush=True)
 
         options["worker-id"] = worker_id
+        if run_context.get("psim-event-log", False):
+            options["event-log-file"] = "{}/events-{}.bin".format(self.workers_dir, worker_id)
         self.thread_states[worker_id] = "exp-{}-running-{}".format(this_exp_uuid, run_context["runtime-dir"])     
                 
         cmd = make_cmd(self.run_executable, options, use_gdb=False, print_cmd=False)
@@ -364,17 +451,9 @@ class ConfigSweeper:
                 f.write("-"*50 + "\n")
             
             print("[{}] {}: running the command ...".format(get_time_string(), this_exp_uuid), flush=True)
-            output = subprocess.check_output(cmd, shell=True)
-            output = output.decode("utf-8").splitlines()
+            output = self.run_command_and_parse_output(cmd, options, run_context)
             print("[{}] {}: done running the command ...".format(get_time_string(), this_exp_uuid), flush=True)
             
-            if self.do_store_outputs:
-                # store the output in a file.
-                with open(run_context["output-file"], "a+") as f:
-                    pprint(options, stream=f)
-                    f.write("\n" + "-"*50 + "\n")
-                    f.writelines("\n".join(output))
-            
             # get the duration of the experiment.
             end_time = datetime.datetime.now()
             duration = end_time - start_time
@@ -2,7 +2,6 @@ from utils.util import *
 from utils.util import default_load_metric_map
 import pandas as pd 
 import numpy as np  
-from processing.itertimes_multirep import get_all_rep_iter_lengths, get_all_rep_all_reduce_times
 from pprint import pprint 
 import copy
 import json
@@ -13,8 +12,8 @@ from hashlib import md5
 from algo import timing
 from algo.placement import generate_placement_file
 import time
-import subprocess
 from utils.cache import NonBlockingCache
+from utils.timing_pool import get_timing_pool
 
 import shutil   
 
@@ -172,7 +171,7 @@ def summarize_key_ids(key):
 
 
 def calc_timing(timing_file_path, routing_file_path, placement_seed,
-                jobs, options, run_context, run_cassini_timing_in_subprocess): 
+                jobs, options, run_context, run_cassini_timing_in_subprocess, config_sweeper): 
     import json 
     
     timing_scheme = run_context["timing-scheme"]
@@ -185,7 +184,7 @@ def calc_timing(timing_file_path, routing_file_path, placement_seed,
                                                                 options, 
                                                                 run_context)
     else: 
-        # create a subprocess to run the cassini timing. 
+        # run the cassini timing on one of the timing workers. 
         args = {
             "timing_file_path": timing_file_path,
             "routing_file_path": routing_file_path, 
@@ -195,32 +194,16 @@ def calc_timing(timing_file_path, routing_file_path, placement_seed,
             "run_context": run_context,
         }
         
-        env = os.environ.copy()
-        env["PYTHONHASHSEED"] = "12345"  # any fixed int as a string (0..4294967295)
-        exe = "algo.timing"
-        # exe = "cppsch.timing"
-        # create a python subprocess, feed the json dump of the args to the subprocess.
-        process = subprocess.Popen([current_executable, "-m", exe], 
-                                    stdin=subprocess.PIPE, 
-                                    stdout=subprocess.PIPE, 
-                                    stderr=subprocess.PIPE, 
-                                    env=env)
+        output, log = get_timing_pool(run_context, config_sweeper).run_task(args)
         
-        input_data = json.dumps(args).encode("utf-8")
-        stdout, stderr = process.communicate(input=input_data)
-
-        try:
-            output = json.loads(stdout.decode("utf-8")) 
-            err_output = stderr.decode("utf-8") 
-            with open(run_context["output-file"], "a") as f:
-                f.write(err_output) 
-                
-        except json.JSONDecodeError as e:
-            print("Error in the subprocess: ", e)
-            print("stdout: ", stdout.decode("utf-8"))
-            print("stderr: ", stderr.decode("utf-8"))   
-            print("input_data: ", input_data.decode("utf-8"))   
+        if output is None: 
+            print("Error in the timing worker")
+            print("log: ", log)
+            print("input_data: ", json.dumps(args))
             rage_quit("Error in the subprocess")    
+            
+        with open(run_context["output-file"], "a") as f:
+            f.write(log) 
         
         job_timings = output["job_timings"] 
         lb_decisions = output["lb_decisions"]
@@ -444,7 +427,7 @@ def run_command_options_modifier(options, config_sweeper, run_context,
     
     calc_func_args = (timing_file_path, routing_file_path,
                       placement_seed, jobs, options, 
-                      run_context, run_cassini_timing_in_subprocess)
+                      run_context, run_cassini_timing_in_subprocess, config_sweeper)
     
     # job_timings, lb_decisions, add_to_context = timing_cache.get(key=timing_file_path, 
     #                                              lock=config_sweeper.timing_lock, 
@@ -509,8 +492,12 @@ def plot_runtime(output, options, this_exp_results, run_context, config_sweeper)
     # where are the flow files? Make a backup for easy access.
     run_path = "{}/worker-{}/run-1".format(config_sweeper.workers_dir,
                                            run_context["worker-id-for-profiling"])
-    flow_files_path = "{}/flow-info.txt".format(run_path)   
-    shutil.copy(flow_files_path, run_context["runtime-dir"] + "/flow-info.txt") 
+    if options.get("flow-info-format", "text") == "binary":
+        flow_files_name = "flow-info.bin"
+    else:
+        flow_files_name = "flow-info.txt"
+    flow_files_path = "{}/{}".format(run_path, flow_files_name)   
+    shutil.copy(flow_files_path, run_context["runtime-dir"] + "/" + flow_files_name) 
 
     # the stupid matplotlib doesn't work in a thread.
     if run_context["plot-runtime-timing"]:   
@@ -634,28 +621,28 @@ def result_extractor_function(output, options, this_exp_results, run_context, co
             job_numbers = get_rolling_costs(output, options, this_exp_results, run_context, config_sweeper)  
 
         elif metric == "avg_ar_time":
-            job_numbers = get_all_rep_all_reduce_times(output, options["rep-count"], 
-                                                       all_jobs_running=all_jobs_running)
+            job_numbers = output.get_all_rep_all_reduce_times(options["rep-count"], 
+                                                              all_jobs_running=all_jobs_running)
         
         elif metric == "rolling_ar_time":   
-            ar_times = get_all_rep_all_reduce_times(output, options["rep-count"], 
-                                                    all_jobs_running=all_jobs_running)
+            ar_times = output.get_all_rep_all_reduce_times(options["rep-count"], 
+                                                           all_jobs_running=all_jobs_running)
             
             job_numbers = get_rolling_numbers(ar_times, options)  
             
         elif metric == "avg_iter_time": 
-            job_numbers = get_all_rep_iter_lengths(output, options["rep-count"], 
-                                                   all_jobs_running=all_jobs_running)
+            job_numbers = output.get_all_rep_iter_lengths(options["rep-count"], 
+                                                          all_jobs_running=all_jobs_running)
 
         elif metric == "rolling_iter_time":
-            iter_times = get_all_rep_iter_lengths(output, options["rep-count"],
-                                                  all_jobs_running=all_jobs_running)
+            iter_times = output.get_all_rep_iter_lengths(options["rep-count"],
+                                                         all_jobs_running=all_jobs_running)
 
             job_numbers = get_rolling_numbers(iter_times, options)   
             
         elif metric == "rolling_ar_plus_cost":
-            ar_times = get_all_rep_all_reduce_times(output, options["rep-count"], 
-                                                    all_jobs_running=all_jobs_running)
+            ar_times = output.get_all_rep_all_reduce_times(options["rep-count"], 
+                                                           all_jobs_running=all_jobs_running)
 
             rollied_ar_times = get_rolling_numbers(ar_times, options)   
             
@@ -671,15 +658,15 @@ def result_extractor_function(output, options, this_exp_results, run_context, co
         # [16:30:57.644] [critical] average_flow_bw: 90.45
         
         elif metric == "total_time":
-            job_numbers = int(get_psim_time(output))   
+            job_numbers = int(output.get_psim_time())   
         elif metric == "total_congested_time":
-            job_numbers = int(get_psim_total_congested_time(output))
+            job_numbers = int(output.get_psim_total_congested_time())
         elif metric == "average_fct":
-            job_numbers = float(get_psim_metric(output, "average_fct"))
+            job_numbers = float(output.get_psim_metric("average_fct"))
         elif metric == "average_flow_bw":   
-            job_numbers = float(get_psim_metric(output, "average_flow_bw"))
+            job_numbers = float(output.get_psim_metric("average_flow_bw"))
         elif metric == "accel_util_rate":
-            job_numbers = float(get_psim_metric(output, "total machine utilization rate"))
+            job_numbers = float(output.get_psim_metric("total machine utilization rate"))
         elif metric == "job_costs":
             job_numbers = run_context["job_costs"]
         elif metric == "fixing_rounds":
@@ -702,8 +689,8 @@ def result_extractor_function(output, options, this_exp_results, run_context, co
                 job_numbers.append(job["base_period"])
         elif metric == "job_slowdown_fairness":
             jobs = run_context["jobs"]
-            iter_lengths = get_all_rep_iter_lengths(output, options["rep-count"], 
-                                                   all_jobs_running=True)
+            iter_lengths = output.get_all_rep_iter_lengths(options["rep-count"], 
+                                                           all_jobs_running=True)
         
             iter_lengths = iter_lengths[0]  
             slowdown_rates = []
@@ -724,8 +711,8 @@ def result_extractor_function(output, options, this_exp_results, run_context, co
             # job_numbers = sum(slowdown_rates) ** 2 / (len(slowdown_rates) * sum([x ** 2 for x in slowdown_rates]))
         elif metric == "job_slowdowns":
             jobs = run_context["jobs"]
-            iter_lengths = get_all_rep_iter_lengths(output, options["rep-count"], 
-                                                   all_jobs_running=True)
+            iter_lengths = output.get_all_rep_iter_lengths(options["rep-count"], 
+                                                           all_jobs_running=True)
         
             iter_lengths = iter_lengths[0]  
             slowdown_rates = []
@@ -742,8 +729,8 @@ def result_extractor_function(output, options, this_exp_results, run_context, co
             job_numbers = slowdown_rates
         elif metric == "job_times": 
             jobs = run_context["jobs"]
-            iter_lengths = get_all_rep_iter_lengths(output, options["rep-count"], 
-                                                   all_jobs_running=True)
+            iter_lengths = output.get_all_rep_iter_lengths(options["rep-count"], 
+                                                           all_jobs_running=True)
         
             iter_lengths = iter_lengths[0]  
             job_times = []
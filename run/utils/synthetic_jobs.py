@@ -0,0 +1,114 @@
+import os
+import random
+import pickle as pkl
+
+from utils.rle import rle_expand
+
+# synthetic ring jobs for the benchmarks and the checks. the machines are shuffled and split
+# into jobs. in every layer of a job, each machine sends one flow at a fixed rate to the next
+# machine of its ring, then the job computes for a while before the next iteration.
+
+
+def make_ring_profile(job_id, machines, servers_per_rack, rate, flow_time, idle_time,
+                      layer_count=1, history_length=None, skip_intra_rack=True, full_history=False):
+    # the profile of one job at one throttle factor. the histories are run-length encoded
+    # over history_length steps (the period by default), and only expanded if full_history.
+    flows = []
+    period = layer_count * flow_time + idle_time
+    if history_length is None:
+        history_length = period
+
+    for layer in range(layer_count):
+        start = layer * flow_time
+        for i in range(len(machines)):
+            src = machines[i]
+            dst = machines[(i + 1) % len(machines)]
+            if skip_intra_rack and src // servers_per_rack == dst // servers_per_rack:
+                continue
+
+            runs = [(0.0, start), (rate, flow_time), (0.0, history_length - start - flow_time)]
+            summarized = [(value, count) for value, count in runs if count > 0]
+
+            flows.append({
+                "job_id": job_id,
+                "flow_id": len(flows),
+                "srcrack": src // servers_per_rack,
+                "dstrack": dst // servers_per_rack,
+                "start_time": start,
+                "end_time": start + flow_time - 1,
+                "progress_history": rle_expand(summarized).tolist() if full_history else None,
+                "progress_history_summarized": summarized,
+            })
+
+    return {"period": period, "flows": flows}
+
+
+def make_ring_workload(machine_count, job_size, iter_count, servers_per_rack, link_bandwidth,
+                       make_profiles, seed, core_count=2):
+    # the jobs, their profiles and the options, for machine_count machines. make_profiles
+    # gets (job_id, machines, rng) and returns the profiles of the job by throttle factor.
+    rng = random.Random(seed)
+    machines = list(range(machine_count))
+    rng.shuffle(machines)
+
+    jobs = []
+    job_profiles = {}
+    for job_id in range(1, machine_count // job_size + 1):
+        job_machines = machines[(job_id - 1) * job_size: job_id * job_size]
+        job_profiles[job_id] = make_profiles(job_id, job_machines, rng)
+        base_period = job_profiles[job_id][1.0]["period"]
+
+        jobs.append({
+            "job_id": job_id,
+            "iter_count": iter_count,
+            "machines": job_machines,
+            "period": {str(tf): profile["period"] for tf, profile in job_profiles[job_id].items()},
+            "base_period": base_period,
+        })
+
+    options = {
+        "ft-server-per-rack": servers_per_rack,
+        "machine-count": machine_count,
+        "link-bandwidth": link_bandwidth,
+        "ft-core-count": core_count,
+        "ft-agg-core-link-capacity-mult": 1,
+        "subflows": 1,
+    }
+
+    return jobs, job_profiles, options
+
+
+def make_timing_task(task_dir, jobs, job_profiles, options, run_context, placement_seed=0):
+    # the arguments of generate_timing_file, the way calc_timing sends them to the timing
+    # workers. the profiles are written to task_dir, the run context gets the keys that the
+    # timing reads, with the plots off, unless they are given.
+    for job_id, profiles in job_profiles.items():
+        for throttle_factor, profile in profiles.items():
+            with open(f"{task_dir}/{job_id}_{throttle_factor}.pkl", "wb") as f:
+                pkl.dump(profile, f)
+
+    task_run_context = {
+        "timing-scheme": "zero",
+        "compat-score-mode": "time-no-coll",
+        "profiled-throttle-factors": sorted(next(iter(job_profiles.values())).keys()),
+        "profiles-dir": task_dir,
+        "routings-dir": task_dir,
+        "experiment-seed": 0,
+        "plot-initial-timing": False,
+        "plot-final-timing": False,
+        "plot-intermediate-timing": False,
+        "plot-link-empty-times": False,
+        "plot-merged-ranges": False,
+        "plot-routing-assignment": False,
+        "output-file": os.devnull,
+    }
+    task_run_context.update(run_context)
+
+    return {
+        "timing_file_path": f"{task_dir}/timing.txt",
+        "routing_file_path": f"{task_dir}/routing.txt",
+        "placement_seed": placement_seed,
+        "jobs": jobs,
+        "options": options,
+        "run_context": task_run_context,
+    }
@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import atexit
+import random
+import tempfile
+import threading
+import traceback
+import subprocess
+
+# a pool of long-lived timing workers, instead of a new "python -m algo.timing" for every
+# experiment. a worker imports everything once, then takes tasks over its stdin and answers
+# on its stdout, one json line each. the tasks go through json as before, so a worker gets
+# exactly what the subprocess used to get, and the results come back the same way.
+# the things that made the subprocess safe are kept:
+# - the workers run with the same fixed PYTHONHASHSEED.
+# - every task is seeded from the experiment and placement seeds.
+# - the module-level caches of the solvers are emptied before every task, so a task's
+#   output doesn't depend on the tasks the worker ran before it.
+# - a worker that fails a task or dies is replaced by a fresh one.
+# - a worker is retired after some tasks, so whatever state leaks between tasks is bounded.
+
+worker_hash_seed = "12345"  # any fixed int as a string (0..4294967295)
+
+
+class TimingWorker:
+    def __init__(self):
+        # everything the worker prints while on a task goes to this file.
+        log_fd, self.log_path = tempfile.mkstemp(prefix="timing-worker-", suffix=".log")
+        os.close(log_fd)
+
+        env = os.environ.copy()
+        env["PYTHONHASHSEED"] = worker_hash_seed
+        self.process = subprocess.Popen([sys.executable, "-m", "utils.timing_pool", self.log_path],
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE,
+                                        env=env)
+        self.task_count = 0
+
+    def run_task(self, args):
+        # returns (output, log), output is None if the worker failed or died.
+        self.task_count += 1
+        try:
+            self.process.stdin.write(json.dumps(args).encode("utf-8") + b"\n")
+            self.process.stdin.flush()
+            response = self.process.stdout.readline()
+        except (BrokenPipeError, OSError):
+            response = b""
+
+        with open(self.log_path, "r", errors="replace") as f:
+            log = f.read()
+
+        if len(response) == 0:
+            return None, log
+
+        output = json.loads(response.decode("utf-8"))
+        if "error" in output:
+            return None, log
+
+        return output, log
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+
+
+class TimingWorkerPool:
+    def __init__(self, max_tasks_per_worker, worker_count):
+        # all the workers start right away, so they import while the sweep is still placing
+        # and profiling, and no task has to wait for that.
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.idle_workers = [TimingWorker() for i in range(worker_count)]
+        self.all_workers = set(self.idle_workers)
+        self.lock = threading.Lock()
+        self.worker_ready = threading.Condition(self.lock)
+
+    def get_worker(self):
+        # waits for an idle worker. there is one per sweep thread by default, and each thread
+        # runs one task at a time, so there's usually no wait.
+        with self.worker_ready:
+            while len(self.idle_workers) == 0:
+                self.worker_ready.wait()
+            return self.idle_workers.pop()
+
+    def replace_worker(self, worker):
+        # the replacement starts importing right away, so the next task doesn't wait for it.
+        with self.lock:
+            self.all_workers.discard(worker)
+        worker.close()
+
+        replacement = TimingWorker()
+        with self.worker_ready:
+            self.all_workers.add(replacement)
+            self.idle_workers.append(replacement)
+            self.worker_ready.notify()
+
+    def return_worker(self, worker):
+        if worker.task_count >= self.max_tasks_per_worker:
+            self.replace_worker(worker)
+            return
+
+        with self.worker_ready:
+            self.idle_workers.append(worker)
+            self.worker_ready.notify()
+
+    def run_task(self, args):
+        # returns (output, log). output is None if the task failed, the worker is replaced then.
+        worker = self.get_worker()
+        output, log = worker.run_task(args)
+
+        if output is None:
+            self.replace_worker(worker)
+        else:
+            self.return_worker(worker)
+
+        return output, log
+
+    def close(self):
+        with self.lock:
+            workers = list(self.all_workers)
+            self.all_workers.clear()
+            self.idle_workers.clear()
+
+        for worker in workers:
+            worker.close()
+
+
+# one pool for the whole process, shared between all the sweep threads. created on first use.
+timing_pool = None
+timing_pool_lock = threading.Lock()
+
+
+def get_timing_pool(run_context, config_sweeper):
+    # by default there are as many workers as sweep threads.
+    global timing_pool
+
+    with timing_pool_lock:
+        if timing_pool is None:
+            worker_count = run_context.get("timing-worker-count", config_sweeper.worker_thread_count)
+            timing_pool = TimingWorkerPool(run_context.get("timing-worker-max-tasks", 20), worker_count)
+            atexit.register(timing_pool.close)
+
+        return timing_pool
+
+
+def redirect_output(log_path):
+    # empties the log file and sends stdout and stderr there, including what C code prints.
+    sys.stdout.flush()
+    sys.stderr.flush()
+    with open(log_path, "w") as log_file:
+        os.dup2(log_file.fileno(), 1)
+        os.dup2(log_file.fileno(), 2)
+
+
+def serve_timing_tasks(log_path):
+    # the worker side. the answers go out on a copy of the original stdout, and stdout and
+    # stderr both go to the log file, so nothing the task prints can break the answers.
+    response_file = os.fdopen(os.dup(1), "w")
+    redirect_output(log_path)
+
+    import numpy as np
+    from algo.timing import generate_timing_file
+    from algo.newtiming import Job
+    from algo.routing_logics.coloring_util import coloring_cache
+
+    for line in sys.stdin:
+        redirect_output(log_path)
+
+        args = json.loads(line)
+        run_context = args["run_context"]
+        task_seed = run_context["experiment-seed"] + args["placement_seed"]
+        random.seed(task_seed)
+        np.random.seed(task_seed % (1 << 32))
+        # the profile file cache of algo.timing is kept, it's keyed by the path, mtime and
+        # size of the file, and unpickled again for every task.
+        coloring_cache.clear()
+        Job.get_base_signal.cache_clear()
+
+        try:
+            job_timings, lb_decisions, add_to_context = generate_timing_file(**args)
+            output = {
+                "job_timings": job_timings,
+                "lb_decisions": lb_decisions,
+                "add_to_context": add_to_context,
+            }
+        except BaseException as e:
+            traceback.print_exc()
+            output = {"error": str(e)}
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        response_file.write(json.dumps(output) + "\n")
+        response_file.flush()
+
+        # whatever the failed task left behind shouldn't reach the next one.
+        if "error" in output:
+            return
+
+
+if __name__ == "__main__":
+    serve_timing_tasks(sys.argv[1])
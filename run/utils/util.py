@@ -98,16 +98,25 @@ def set_memory_limit(limit):
     resource.setrlimit(resource.RLIMIT_AS, (memory_limit_kb, memory_limit_kb))
     
     
-def make_cmd(executable, options, use_gdb=False, print_cmd=False):
-    cmd = executable
+def make_args(options):
+    args = [] 
     
     for option in options.items():
         if option[1] is False:
             continue
         elif option[1] is True:
-            cmd += " --" + option[0]
+            args.append("--" + option[0])
         else: 
-            cmd += " --" + option[0] + "=" + str(option[1])
+            args.append("--" + option[0] + "=" + str(option[1]))
+            
+    return args 
+
+
+def make_cmd(executable, options, use_gdb=False, print_cmd=False):
+    cmd = executable
+    
+    for arg in make_args(options):
+        cmd += " " + arg
 
     if use_gdb:
         cmd = "gdb -ex run --args " + cmd
@@ -99,3 +99,11 @@ int GContext::get_device_shuffle_map(int device_id){
 int GContext::run_number() {
     return inst().run_info_list.back().run_number;
 }
+
+void GContext::reset() {
+    inst().cut_off_time = 0;
+    inst().cut_off_decrease_step = 0;
+    inst().run_info_list.clear();
+    inst().device_shuffle_map.clear();
+    inst().run_counter = 0;
+}
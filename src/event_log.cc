@@ -0,0 +1,47 @@
+#include "event_log.h"
+#include "spdlog/spdlog.h"
+
+using namespace psim;
+
+
+void EventLog::open(std::string path) {
+    ofs.open(path, std::ios::binary | std::ios::trunc);
+
+    if (not ofs.is_open()) {
+        spdlog::error("could not open the event log file: {}", path);
+        exit(1);
+    }
+
+    ofs.write("PSIMEVT1", 8);
+}
+
+void EventLog::close() {
+    if (ofs.is_open()) {
+        ofs.close();
+    }
+}
+
+void EventLog::write(event_record record) {
+    if (not ofs.is_open()) {
+        return;
+    }
+
+    ofs.write((char*)&record, sizeof(record));
+}
+
+void EventLog::log_event(EventType type, int job_id, int iter, int layer, double time) {
+    write(event_record{int64_t(type), job_id, iter, layer, time});
+}
+
+void EventLog::log_rep_end(int rep) {
+    write(event_record{int64_t(EventType::REP_END), rep, 0, 0, 0});
+
+    // a reader can follow the file as it's written, a rep at a time.
+    if (ofs.is_open()) {
+        ofs.flush();
+    }
+}
+
+void EventLog::log_result(ResultType result, double value) {
+    write(event_record{int64_t(EventType::RESULT), int64_t(result), 0, 0, value});
+}
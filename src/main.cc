@@ -9,6 +9,7 @@
 #include <boost/program_options.hpp>
 #include "spdlog/spdlog.h"
 #include "gcontext.h"
+#include "event_log.h"
 #include <iomanip>
 
 namespace po = boost::program_options;
@@ -16,13 +17,33 @@ using namespace psim;
 
 
 // function declarations
-void init(int argc, char** argv);
+void init(po::variables_map vm);
 
 void log_core_status_history(int rep, PSim* psim); 
 
+void run_experiment(); 
+
+void run_batch_profiling(); 
+
+void run_server(); 
+
 // main function
 int main(int argc, char** argv) {
-    init(argc, argv);
+    po::variables_map vm = parse_arguments(argc, argv);
+
+    if (vm.count("server")) {
+        run_server();
+        return 0;
+    }
+
+    init(vm);
+    run_experiment();
+
+    return 0;
+}
+
+
+void run_experiment(){
     std::vector<double> psim_time_list;
     
     GContext::initiate_device_shuffle_map();
@@ -32,6 +53,11 @@ int main(int argc, char** argv) {
     // p->export_graph(ofs);
     // ofs.close();
     // exit(0);
+    if (not GConf::inst().isolate_job_ids.empty()) {
+        run_batch_profiling();
+        return;
+    }
+
     auto workers_dir = GConf::inst().workers_dir;
 
     for (int rep = 1; rep <= GConf::inst().rep_count; rep ++) {
@@ -52,6 +78,7 @@ int main(int argc, char** argv) {
         GContext::this_run().psim_time = psim_time;
         psim_time_list.push_back(psim_time);
         spdlog::critical("done with rep {}", rep);
+        EventLog::inst().log_rep_end(rep);
 
         change_log_path(worker_dir + "run-" + std::to_string(rep), "results.txt");
         psim->log_results(); 
@@ -76,17 +103,103 @@ int main(int argc, char** argv) {
 
         delete psim;
     }
+}
 
-    return 0;
+
+// the server mode: psim stays alive and runs one experiment for every line on stdin. 
+// a line is a json object with "args", the command line options for the experiment, 
+// e.g. ["--rep-count=3", "--lb-scheme=random"], and optionally "inputs", the json of 
+// the placement, timing or routing file keyed by the option name, used instead of the file. 
+// all the global state is reset before each experiment, so the output is the same as 
+// running psim with those options. the output is followed by a "psim server: done" line. 
+// see utils/psim_server.py for the other side. 
+void run_server(){
+    std::string line;
+
+    while (std::getline(std::cin, line)) {
+        if (line.empty()) {
+            continue;
+        }
+
+        nlohmann::json request = nlohmann::json::parse(line, nullptr, false); 
+        if (request.is_discarded() or not request.contains("args")) {
+            spdlog::error("invalid server request: {}", line);
+            exit(1);
+        }
+
+        GConf::reset();
+        GContext::reset();
+
+        std::vector<std::string> args = {"psim"};
+        for (auto& arg : request["args"]) {
+            args.push_back(arg);
+        }
+        std::vector<char*> argv;
+        for (auto& arg : args) {
+            argv.push_back(arg.data());
+        }
+
+        set_inline_inputs(request.value("inputs", nlohmann::json::object()));
+
+        init(parse_arguments(argv.size(), argv.data()));
+        run_experiment();
+
+        EventLog::inst().close();
+        spdlog::default_logger()->flush();
+        fflush(stdout);
+
+        std::cout << "psim server: done" << std::endl;
+    }
 }
 
 
 
-void init(int argc, char** argv){
+// profile a list of (job id, throttle factor) pairs in one go. every pair is simulated 
+// in isolation, just like a run with isolate-job-id and throttle_factor would. 
+// the flow info of all the pairs goes to one file: profiles.txt, each pair starting 
+// with a "profile:" line that has the job id, the throttle factor and the psim time.
+void run_batch_profiling(){
+    auto workers_dir = GConf::inst().workers_dir;
+    std::string worker_id_string = std::to_string(GConf::inst().worker_id);
+    std::string run_dir = workers_dir + "/worker-" + worker_id_string + "/run-1";
+
+    auto job_ids = GConf::inst().isolate_job_ids;
+    auto throttle_factors = GConf::inst().throttle_factors;
+
+    for (int i = 0; i < job_ids.size(); i++) {
+        GConf::inst().isolate_job_id = job_ids[i];
+        GConf::inst().throttle_factor = throttle_factors[i];
+
+        change_log_path(run_dir, "runtime.txt", i == 0);
+        GContext::start_new_run();
+
+        // the placement file is only parsed for the first pair, see build_nethint_test.
+        PSim* psim = new PSim();
+
+        psim->add_protocols_from_input();
+        psim->inform_network_of_protocols();
+
+        srand(GConf::inst().simulation_seed + 1);
+
+        double psim_time = psim->simulate();
+        GContext::this_run().psim_time = psim_time;
+        spdlog::critical("done with job {} throttle factor {}", job_ids[i], throttle_factors[i]);
+
+        // append to the profiles file, except for the first pair.
+        change_log_path(run_dir, "profiles.txt", false, i == 0);
+        spdlog::critical("profile: jobid: {} throttle: {} psim time: {}", 
+                         job_ids[i], throttle_factors[i], psim_time);
+        psim->log_flow_info(i != 0);
+
+        delete psim;
+    }
+}
+
+
+void init(po::variables_map vm){
     // srand(time(NULL));
     srand(0); 
 
-    po::variables_map vm = parse_arguments(argc, argv);
     process_arguments(vm);
 
     // make the workers directory
@@ -101,6 +214,10 @@ void init(int argc, char** argv){
 
     setup_logger(true);
     log_config();
+
+    if (GConf::inst().event_log_file != "") {
+        EventLog::inst().open(GConf::inst().event_log_file);
+    }
 }
 
 
@@ -106,11 +106,8 @@ Bottleneck* Network::create_bottleneck(double bandwidth) {
 
 
 double Network::total_network_bw() {
-    static bool is_cached = false;
-    static double cached_total = 0;
-
-    if (is_cached) {
-        return cached_total;
+    if (is_total_bw_cached) {
+        return cached_total_bw;
     } else {
         double total = 0;
 
@@ -118,8 +115,8 @@ double Network::total_network_bw() {
             total += bn->bandwidth;
         }
 
-        cached_total = total;
-        is_cached = true;
+        cached_total_bw = total;
+        is_total_bw_cached = true;
 
         return total;
     }
@@ -7,6 +7,7 @@
 #include <boost/program_options.hpp>
 #include <boost/algorithm/string.hpp>
 #include "spdlog/spdlog.h"
+#include "spdlog/fmt/ranges.h"
 #include "spdlog/sinks/basic_file_sink.h"
 #include "spdlog/sinks/stdout_color_sinks.h"
 
@@ -63,6 +64,9 @@ po::variables_map psim::parse_arguments(int argc, char** argv) {
         ("adaptive-step-size-min", po::value<double>(), "min adaptive step size")
         ("adaptive-step-size-max", po::value<double>(), "max adaptive step size")
         ("print-flow-progress-history", po::value<int>()->implicit_value(1), "print flow progress history")
+        ("flow-info-format", po::value<std::string>(), "flow info format: text or binary")
+        ("event-log-file", po::value<std::string>(), "write the events and the results to this binary file")
+        ("server", po::value<int>()->implicit_value(1), "stay alive and run the experiments given over stdin")
         ("simulation-seed", po::value<int>(), "simulation seed")  
         ("placement-file", po::value<std::string>(), "placement file")
         ("timing-file", po::value<std::string>(), "timing file")
@@ -84,6 +88,8 @@ po::variables_map psim::parse_arguments(int argc, char** argv) {
         ("isolate-job-id", po::value<int>(), "isolate job id") 
         ("stretch-factor", po::value<double>(), "stretch factor")
         ("throttle_factor", po::value<double>(), "throttle the workload transmission rate")
+        ("isolate-job-ids", po::value<std::string>(), "comma separated job ids for batch profiling")
+        ("throttle-factors", po::value<std::string>(), "comma separated throttle factors for batch profiling")
         ("punish-oversubscribed", po::value<int>()->implicit_value(1), "punish oversubscribed")
         ("punish-oversubscribed-min", po::value<double>(), "punish oversubscribed min")
     ;
@@ -102,16 +108,17 @@ po::variables_map psim::parse_arguments(int argc, char** argv) {
 
 void psim::change_log_path(std::string output_dir, 
                            std::string log_file_name, 
-                           bool recreate_dir) {
+                           bool recreate_dir, 
+                           bool truncate_log_file) {
                             
     GConf::inst().output_dir = output_dir;
     GConf::inst().log_file_name = log_file_name;
 
-    psim::setup_logger(recreate_dir);
+    psim::setup_logger(recreate_dir, truncate_log_file);
     psim::log_config();
 }
 
-void psim::setup_logger(bool recreate_dir) {
+void psim::setup_logger(bool recreate_dir, bool truncate_log_file) {
     // remove and create output directory
 
     struct stat buffer;
@@ -131,7 +138,7 @@ void psim::setup_logger(bool recreate_dir) {
     console_sink->set_level(spdlog::level::level_enum(GConf::inst().console_log_level));
 
     std::string log_path = GConf::inst().output_dir + "/" + GConf::inst().log_file_name;
-    auto file_sink = std::make_shared<spdlog::sinks::basic_file_sink_mt>(log_path, true);
+    auto file_sink = std::make_shared<spdlog::sinks::basic_file_sink_mt>(log_path, truncate_log_file);
     file_sink->set_pattern("[%H:%M:%S.%e] [%^%l%$] %v");
     file_sink->set_level(spdlog::level::level_enum(GConf::inst().file_log_level));
 
@@ -408,6 +415,21 @@ void psim::process_arguments(po::variables_map vm){
     if (vm.count("print-flow-progress-history")) {
         GConf::inst().print_flow_progress_history = true;
     }
+    if (vm.count("flow-info-format")) {
+        std::string flow_info_format_str = vm["flow-info-format"].as<std::string>();
+
+        if (flow_info_format_str == "text") {
+            GConf::inst().flow_info_format = FlowInfoFormat::TEXT;
+        } else if (flow_info_format_str == "binary") {
+            GConf::inst().flow_info_format = FlowInfoFormat::BINARY;
+        } else {
+            spdlog::error("Invalid flow info format: {}", flow_info_format_str);
+            exit(1);
+        }
+    }
+    if (vm.count("event-log-file")) {
+        GConf::inst().event_log_file = vm["event-log-file"].as<std::string>();
+    }
     if (vm.count("simulation-seed")) {
         GConf::inst().simulation_seed = vm["simulation-seed"].as<int>();
     }   
@@ -427,6 +449,26 @@ void psim::process_arguments(po::variables_map vm){
     if (vm.count("throttle_factor")) {
         GConf::inst().throttle_factor = vm["throttle_factor"].as<double>();
     }
+
+    if (vm.count("isolate-job-ids")) {
+        std::vector<std::string> items;
+        boost::split(items, vm["isolate-job-ids"].as<std::string>(), boost::is_any_of(","));
+        for (auto& item : items) {
+            GConf::inst().isolate_job_ids.push_back(std::stoi(item));
+        }
+    }
+    if (vm.count("throttle-factors")) {
+        std::vector<std::string> items;
+        boost::split(items, vm["throttle-factors"].as<std::string>(), boost::is_any_of(","));
+        for (auto& item : items) {
+            GConf::inst().throttle_factors.push_back(std::stod(item));
+        }
+    }
+    if (GConf::inst().isolate_job_ids.size() != GConf::inst().throttle_factors.size()) {
+        spdlog::error("isolate-job-ids and throttle-factors should have the same length: {} vs {}", 
+                      GConf::inst().isolate_job_ids.size(), GConf::inst().throttle_factors.size());
+        exit(1);
+    }
 }
 
 void psim::log_config() {
@@ -478,6 +520,8 @@ void psim::log_config() {
     spdlog::info("==== adaptive_step_size_min: {}", GConf::inst().adaptive_step_size_min);
     spdlog::info("==== adaptive_step_size_max: {}", GConf::inst().adaptive_step_size_max);
     spdlog::info("==== print_flow_progress_history: {}", GConf::inst().print_flow_progress_history);
+    spdlog::info("==== flow_info_format: {}", int(GConf::inst().flow_info_format));
+    spdlog::info("==== event_log_file: {}", GConf::inst().event_log_file);
     spdlog::info("==== simulation_seed: {}", GConf::inst().simulation_seed);
     spdlog::info("==== placement_file: {}", GConf::inst().placement_file);
     spdlog::info("==== timing_file: {}", GConf::inst().timing_file);
@@ -487,6 +531,8 @@ void psim::log_config() {
     spdlog::info("==== isolate_job_id: {}", GConf::inst().isolate_job_id);
     spdlog::info("==== stretch_factor: {}", GConf::inst().stretch_factor);  
     spdlog::info("==== throttle_factor: {}", GConf::inst().throttle_factor);    
+    spdlog::info("==== isolate_job_ids: {}", GConf::inst().isolate_job_ids);
+    spdlog::info("==== throttle_factors: {}", GConf::inst().throttle_factors);
     spdlog::info("==== punish_oversubscribed: {}", GConf::inst().punish_oversubscribed);    
     spdlog::info("==== punish_oversubscribed_min: {}", GConf::inst().punish_oversubscribed_min);
     spdlog::info("==== general_param_1: {}", GConf::inst().general_param_1);
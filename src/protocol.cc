@@ -359,6 +359,18 @@ void EmptyTask::reset(){
     name = "Empty";
     print_message = ""; 
     print_on_exec = false; 
+    
+    event_type = EventType::NONE; 
+    event_job_id = 0; 
+    event_iter = 0; 
+    event_layer = 0; 
+}
+
+void EmptyTask::set_event(EventType type, int job_id, int iter, int layer){
+    event_type = type; 
+    event_job_id = job_id; 
+    event_iter = iter; 
+    event_layer = layer; 
 }
 
 PTask* EmptyTask::make_shallow_copy(){
@@ -425,6 +425,7 @@ EmptyTask* insert_all_reduce_into_protocol(Protocol* protocol, std::vector<PComp
                                          " iter " + std::to_string(iter_num) +
                                          " layer " + std::to_string(layer_num) +
                                          " all-reduce finished";
+    all_reduce_finisher->set_event(EventType::ALLREDUCE_FINISH, jobid, iter_num, layer_num);
 
     int num_replicas = node_ids.size();
     int node_count = last_layer_pcs.size();
@@ -634,6 +635,7 @@ insert_simple_data_parallelism(Protocol* protocol, int jobid,
     last_iter_finisher->name = "protocol start";
     last_iter_finisher->print_on_exec = true;
     last_iter_finisher->print_message = "job " + std::to_string(jobid) + " started";
+    last_iter_finisher->set_event(EventType::JOB_START, jobid, 0, 0);
 
     PTask* prev_dep = last_iter_finisher; 
     // if(initial_wait != 0) {
@@ -688,6 +690,7 @@ insert_simple_data_parallelism(Protocol* protocol, int jobid,
         last_iter_finisher->name = "ITER" + std::to_string(i);
         last_iter_finisher->print_on_exec = true;
         last_iter_finisher->print_message = "job " + std::to_string(jobid) + " iter " + std::to_string(i + 1) + " finished";
+        last_iter_finisher->set_event(EventType::ITER_FINISH, jobid, i + 1, 0);
         prev_dep = last_iter_finisher;
         
         // build the backward pass for the current iteration. the tasks for each machine are connected in a chain.
@@ -728,6 +731,7 @@ insert_simple_data_parallelism(Protocol* protocol, int jobid,
                                                 " iter " + std::to_string(iter_num) +
                                                 " layer " + std::to_string(layer_num) +
                                                 " all-reduce started";
+            all_reduce_starter->set_event(EventType::ALLREDUCE_START, jobid, iter_num, layer_num);
         
             for (int node_index = 0; node_index < job_node_count; node_index++) {
                 last_layer_pcs[node_index]->add_next_task_id(all_reduce_starter->id);
@@ -876,6 +880,7 @@ void insert_simple_periodic(Protocol* protocol, int src_machine,
     last_iter_finisher->name = "protocol start";
     last_iter_finisher->print_on_exec = true;
     last_iter_finisher->print_message = "job " + std::to_string(jobid) + " started";
+    last_iter_finisher->set_event(EventType::JOB_START, jobid, 0, 0);
     
     if (last_pc != nullptr) {
         last_pc->add_next_task_id(last_iter_finisher->id);
@@ -930,6 +935,7 @@ void insert_simple_periodic(Protocol* protocol, int src_machine,
         last_iter_finisher->name = "ITER" + std::to_string(j);
         last_iter_finisher->print_on_exec = true;
         last_iter_finisher->print_message = "job " + std::to_string(jobid) + " iter " + std::to_string(j + 1) + " finished";
+        last_iter_finisher->set_event(EventType::ITER_FINISH, jobid, j + 1, 0);
         
         last_pc->add_next_task_id(last_iter_finisher->id);
     }
@@ -1036,6 +1042,35 @@ int get_config_or_default(int value, int default_value) {
     return value;
 }
 
+// the parsed placement file is kept around, so that multiple runs in the same process 
+// (e.g. batch profiling) don't parse it again. it's re-read if the file changes.
+static std::string cached_placement_file = ""; 
+static std::filesystem::file_time_type cached_placement_mtime; 
+static nlohmann::json cached_placement_jobs; 
+
+static nlohmann::json& read_placement_file(std::string placement_file) {
+    auto mtime = std::filesystem::last_write_time(placement_file);
+
+    if (placement_file != cached_placement_file or mtime != cached_placement_mtime) {
+        std::ifstream placement_stream(placement_file);
+        cached_placement_jobs = nlohmann::json();
+        placement_stream >> cached_placement_jobs;
+
+        cached_placement_file = placement_file;
+        cached_placement_mtime = mtime;
+    }
+
+    return cached_placement_jobs; 
+}
+
+// the placement, timing and routing inputs that came with a server request instead of 
+// as files, keyed by the option name, e.g. "timing-file". see run_server in main.cc. 
+static nlohmann::json inline_inputs = nlohmann::json::object(); 
+
+void psim::set_inline_inputs(nlohmann::json inputs) {
+    inline_inputs = inputs; 
+}
+
 Protocol* 
 psim::build_nethint_test() {
     Protocol *protocol = new Protocol();
@@ -1050,18 +1085,22 @@ psim::build_nethint_test() {
     }
 
     // read the placement file and populate the jobs map.
-    nlohmann::json jobs;
     std::string placement_file = GConf::inst().placement_file;   
-    spdlog::critical("placement file: {}", placement_file);
-    std::ifstream placement_stream(placement_file);
-    placement_stream >> jobs;
+    bool placement_inline = inline_inputs.contains("placement-file");
+    spdlog::critical("placement file: {}", placement_inline ? "inline" : placement_file);
+    nlohmann::json& jobs = placement_inline ? inline_inputs["placement-file"] 
+                                            : read_placement_file(placement_file);
 
     // read the timing file and populate the timings map.
     nlohmann::json timings;
     std::string timing_file = GConf::inst().timing_file; 
 
     bool timing_file_exists = true; 
-    if (not std::filesystem::exists(timing_file)) {
+    if (inline_inputs.contains("timing-file")) {
+        timing_file_exists = true;
+        spdlog::critical("timing file: inline");
+        timings = inline_inputs["timing-file"];
+    } else if (not std::filesystem::exists(timing_file)) {
         timing_file_exists = false; 
         spdlog::critical("timing file not found. all timings will be set to 0.");  
     } else { 
@@ -1069,7 +1108,9 @@ psim::build_nethint_test() {
         spdlog::critical("timing file: {}", timing_file);
         std::ifstream timing_stream(timing_file);
         timing_stream >> timings;
+    }
 
+    if (timing_file_exists) {
         for (const auto& item : timings) {
             int job_id = item["job_id"];
             std::vector<int> deltas = item["deltas"];
@@ -1088,7 +1129,10 @@ psim::build_nethint_test() {
     nlohmann::json routings; 
     std::string routing_file = GConf::inst().routing_file;    
     bool routing_file_exists = true;    
-    if (not std::filesystem::exists(routing_file)) {
+    if (inline_inputs.contains("routing-file")) {
+        spdlog::critical("routing file: inline");
+        routings = inline_inputs["routing-file"];
+    } else if (not std::filesystem::exists(routing_file)) {
         spdlog::critical("routing file not found. exiting.");
         routing_file_exists = false;
     
@@ -1096,7 +1140,9 @@ psim::build_nethint_test() {
         spdlog::critical("routing file: {}", routing_file);
         std::ifstream routing_stream(routing_file);
         routing_stream >> routings;
+    }
 
+    if (routing_file_exists) {
         for (auto& routing : routings) {
             int job_id = routing["job_id"];  
             int per_job_task_id = routing["flow_id"];   
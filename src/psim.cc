@@ -1,4 +1,5 @@
 #include <iostream>
+#include <cstring>
 #include "psim.h"
 #include "network.h"
 #include "protocol.h"
@@ -171,6 +172,12 @@ void PSim::start_task(PTask *task, bool start_in_next_timestep) {
                 }
 
                 spdlog::critical("[{}]: {}", time_to_print, empty_task->print_message);
+
+                if (empty_task->event_type != EventType::NONE) {
+                    EventLog::inst().log_event(empty_task->event_type, empty_task->event_job_id, 
+                                               empty_task->event_iter, empty_task->event_layer, 
+                                               time_to_print);
+                }
             }
 
             handle_task_completion(task);
@@ -337,8 +344,109 @@ double PSim::simulate() {
     return timer;
 }
 
-void PSim::log_flow_info(){
-    if (GConf::inst().print_flow_progress_history) {
+// the binary flow info file is a sequence of blocks, one per call to log_flow_info.
+// each block is: a header, a table of flow records, the labels, and the packed progress histories. 
+// everything is 8 bytes wide and little endian, so it can be memory mapped with numpy directly.
+// see processing/flowprogress.py for the reader.
+struct flow_info_header {
+    char magic[8];
+    int64_t flow_count; 
+    int64_t history_length;  // number of doubles in the history buffer
+    int64_t labels_length;   // number of bytes in the labels buffer, padded to 8 bytes
+    int64_t isolate_job_id; 
+    double throttle_factor; 
+    double psim_time; 
+    double step_size;
+};
+
+struct flow_info_record {
+    int64_t flow_id; 
+    int64_t job_id;
+    int64_t iteration; 
+    int64_t subflow; 
+    int64_t srcrack; 
+    int64_t dstrack; 
+    int64_t core; 
+    int64_t history_offset;
+    int64_t history_length;
+    int64_t label_offset;
+    int64_t label_length;
+    double start_time; 
+    double end_time; 
+    double fct; 
+};
+
+void PSim::log_flow_info_binary(bool append){
+    std::vector<flow_info_record> records; 
+    std::vector<double> history; 
+    std::string labels; 
+
+    for (Flow* flow: finished_flows){
+        if (flow->lb_decision == -1) {
+            continue; 
+        }
+
+        flow_info_record record; 
+        record.flow_id = flow->per_job_task_id;
+        record.job_id = flow->jobid;
+        record.iteration = flow->protocol_defined_iteration;
+        record.subflow = flow->protocol_defined_subflow_id;
+        record.srcrack = ((CoreConnectedNetwork*)network)->server_loc_map[flow->src_dev_id].rack;
+        record.dstrack = ((CoreConnectedNetwork*)network)->server_loc_map[flow->dst_dev_id].rack;
+        record.core = flow->lb_decision;
+        record.start_time = flow->start_time;
+        record.end_time = flow->end_time;
+        record.fct = flow->end_time - flow->start_time + step_size;
+
+        record.history_offset = history.size();
+        record.history_length = flow->progress_history.size();
+        for (double ph: flow->progress_history){
+            // same precision as the text format, 2 digits after the decimal point.
+            history.push_back(std::round(ph * 100) / 100);
+        }
+
+        record.label_offset = labels.size();
+        record.label_length = flow->label_for_progress_graph.size();
+        labels += flow->label_for_progress_graph;
+
+        records.push_back(record);
+    }
+
+    while (labels.size() % 8 != 0) {
+        labels += '\0';
+    }
+
+    flow_info_header header; 
+    std::memcpy(header.magic, "PSIMFLW1", 8);
+    header.flow_count = records.size();
+    header.history_length = history.size();
+    header.labels_length = labels.size();
+    header.isolate_job_id = GConf::inst().isolate_job_id;
+    header.throttle_factor = GConf::inst().throttle_factor;
+    header.psim_time = GContext::this_run().psim_time;
+    header.step_size = step_size;
+
+    // flow-info.txt -> flow-info.bin
+    std::string file_name = GConf::inst().log_file_name;
+    file_name = file_name.substr(0, file_name.find_last_of('.')) + ".bin";
+    std::string path = GConf::inst().output_dir + "/" + file_name;
+
+    auto mode = std::ios::binary | (append ? std::ios::app : std::ios::trunc);
+    std::ofstream ofs(path, mode);
+    ofs.write((char*)&header, sizeof(header));
+    ofs.write((char*)records.data(), records.size() * sizeof(flow_info_record));
+    ofs.write(labels.data(), labels.size());
+    ofs.write((char*)history.data(), history.size() * sizeof(double));
+    ofs.close();
+}
+
+void PSim::log_flow_info(bool append){
+    if (GConf::inst().print_flow_progress_history and 
+        GConf::inst().flow_info_format == FlowInfoFormat::BINARY) {
+
+        log_flow_info_binary(append);
+
+    } else if (GConf::inst().print_flow_progress_history) {
         for (Flow* flow: finished_flows){
             if (flow->lb_decision == -1) {
                 continue; 
@@ -503,10 +611,12 @@ void PSim::log_results() {
     spdlog::critical("run number: {}", GContext::this_run().run_number);
 
     spdlog::critical("psim time: {}", timer);
+    EventLog::inst().log_result(ResultType::PSIM_TIME, timer);
 
     int tier = 2; 
     double congested_time = this->network->get_total_congested_time(tier);
     spdlog::critical("Total congested time: {}", congested_time);   
+    EventLog::inst().log_result(ResultType::CONGESTED_TIME, congested_time);
     
     if (this->protocols.size() != 1) {
         spdlog::error("the rest of log_results is only supported for single protocol runs");
@@ -533,6 +643,9 @@ void PSim::log_results() {
     spdlog::critical("average_fct: {}", average_fct);
     spdlog::critical("average_flow_size: {}", average_flow_size);
     spdlog::critical("average_flow_bw: {:03.2f}", average_flow_bw);
+    EventLog::inst().log_result(ResultType::AVERAGE_FCT, average_fct);
+    // the same value as in the log line, which only has two decimals. 
+    EventLog::inst().log_result(ResultType::AVERAGE_FLOW_BW, std::stod(fmt::format("{:.2f}", average_flow_bw)));
     spdlog::critical("average_flow_path_length: {}", average_flow_path_length);
 
     std::vector<double> average_rates;
@@ -621,6 +734,7 @@ void PSim::log_results() {
     total_machine_utilization /= history.size();
 
     spdlog::critical("total machine utilization rate: {}", total_machine_utilization);
+    EventLog::inst().log_result(ResultType::MACHINE_UTILIZATION, total_machine_utilization);
 
 
     spdlog::critical("-------------------------------------------------------");